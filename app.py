@@ -2,18 +2,67 @@
 import streamlit as st
 from PIL import Image, UnidentifiedImageError
 from io import BytesIO
-import tempfile
 import streamlit.components.v1 as components
+import time
+import hashlib
 
 from backend.image_processor import process_image
-from backend.video_processor import process_video
-from backend.text_processor import extract_text, visualize_ocr_on_image
-from utils.media_utils import detect_media_type, extract_video_thumbnail
+from backend.jobs import job_manager, JobQueueFullError
+from backend.track_log import TrackLog
+from backend.text_processor import run_ocr, extract_text, visualize_ocr_on_image
+from utils.media_utils import detect_media_type
+from utils.media_probe import probe_media, extract_thumbnail
+from utils.media_ingest import spool_upload
+from utils.workspace import workspaces, QuotaExceededError
+from utils.metrics import serve_metrics
 
 st.title("Azure Vision AI - Image & Video Analyzer")
 st.markdown("<div style='text-align: right;'>👤 Built by Abani Behera (s225534832@deakin.edu.au)</div>", unsafe_allow_html=True)
  
 
+# Prometheus scrape endpoint when VISION_METRICS_PORT is set (started once per process)
+serve_metrics()
+
+# Analysis results are memoized by file hash, mode and parameters, so
+# reruns caused by widget changes are served without calling Azure again
+RESULTS_CACHE_ENTRIES = 64
+RESULTS_CACHE_TTL = 3600
+WORKSPACE_STATS_MAX_AGE = 60
+
+
+@st.cache_data(max_entries=RESULTS_CACHE_ENTRIES, ttl=RESULTS_CACHE_TTL, show_spinner=False)
+def analyze_objects(file_hash, _image_bytes, features):
+    return process_image(BytesIO(_image_bytes), features=features)
+
+
+@st.cache_data(max_entries=RESULTS_CACHE_ENTRIES, ttl=RESULTS_CACHE_TTL, show_spinner=False)
+def analyze_text(file_hash, _image_bytes):
+    ocr_result = run_ocr(_image_bytes)
+    if not ocr_result.succeeded:
+        # Raising keeps failures out of the cache so the next rerun retries
+        raise RuntimeError(f"OCR job {ocr_result.status}")
+    return (visualize_ocr_on_image(_image_bytes, ocr_result),
+            extract_text(_image_bytes, ocr_result))
+
+
+def deferred_read(workspace, path):
+    """
+    Returns a download_button data callable that reads `path`, holding its
+    workspace, only when the button is clicked. Streamlit still sends the
+    file from memory then, but reruns no longer load it.
+    """
+    def read():
+        with workspace.in_use(), open(path, "rb") as f:
+            return f.read()
+    return read
+
+
+# Every temporary file of this browser session lives in its own workspace,
+# which the reaper deletes once the session has been idle long enough
+session_workspace = workspaces.workspace(st.session_state.get("workspace"), prefix="session")
+st.session_state["workspace"] = session_workspace.name
+session_workspace.touch()
+
 uploaded_file = st.file_uploader("Upload an image or video", type=["jpg", "jpeg", "png", "mp4", "mov"])
 
 if uploaded_file:
@@ -23,6 +72,7 @@ if uploaded_file:
     if media_type == "image":
         analysis_mode = st.radio("Select Analysis Mode:", ["Objects", "Text (OCR)"])
         image_bytes = uploaded_file.getvalue()
+        image_hash = hashlib.sha256(image_bytes).hexdigest()
 
         try:
             image = Image.open(BytesIO(image_bytes)).convert("RGB")
@@ -30,15 +80,20 @@ if uploaded_file:
 
             if analysis_mode == "Objects":
                 with st.spinner("Analyzing image for objects..."):
-                    result_image, objects, _ = process_image(uploaded_file)
+                    result_image, objects, analysis = analyze_objects(image_hash, image_bytes, ("objects", "tags"))
                 st.success("Object detection complete ✅")
                 st.image(result_image, caption="Detected Objects", use_container_width=True)
                 st.write("Detected Objects:", objects)
+                if analysis.tags:
+                    st.write("Tags:", analysis.tag_labels())
 
             elif analysis_mode == "Text (OCR)":
                 with st.spinner("Extracting text and drawing boxes..."):
-                    annotated_image = visualize_ocr_on_image(image_bytes)
-                    text_lines = extract_text(image_bytes)
+                    try:
+                        annotated_image, text_lines = analyze_text(image_hash, image_bytes)
+                    except RuntimeError as e:
+                        print(e)
+                        annotated_image, text_lines = None, []
 
                 if annotated_image:
                     st.success("OCR complete ✅")
@@ -55,18 +110,54 @@ if uploaded_file:
             st.error("Uploaded file is not a valid image format. Please upload .jpg or .png.")
 
     elif media_type == "video":
-        video_bytes = uploaded_file.getvalue()
-        thumbnail, _ = extract_video_thumbnail(video_bytes)
+        # Spool the upload to disk once per file; reruns reuse the same copy
+        spooled = st.session_state.get("spooled_video")
+        if spooled is None or not spooled.exists() \
+                or st.session_state.get("spooled_video_id") != uploaded_file.file_id:
+            if spooled is not None:
+                spooled.remove()
+            try:
+                spooled = spool_upload(uploaded_file, workspace=session_workspace)
+            except QuotaExceededError as e:
+                st.error(f"Not enough workspace space for this upload: {e}")
+                st.stop()
+            st.session_state["spooled_video"] = spooled
+            st.session_state["spooled_video_id"] = uploaded_file.file_id
+        video_path = spooled.path
+
+        video_info = probe_media(video_path)
+        thumbnail, _ = extract_thumbnail(video_path, info=video_info)
         if thumbnail:
             st.image(thumbnail, caption="🎬 Video Thumbnail", use_container_width=True)
+        if video_info.media_type == "video":
+            st.caption(f"📼 {video_info.summary()}")
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp:
-            tmp.write(video_bytes)
-            video_path = tmp.name
-
-        with st.spinner("Analyzing video... This may take a few seconds..."):
-            annotated_path, log_path, viz_path, gif_path, webm_path = process_video(video_path)
-        st.success("Video analysis complete ✅")
+        # Analysis runs on the worker pool; the same video with the same
+        # settings attaches to the job that is already running or done
+        try:
+            job_id = job_manager.submit(video_path, input_hash=spooled.sha256,
+                                        outputs=("webm",), encoder_preset="realtime")
+        except JobQueueFullError as e:
+            st.warning(f"The server is busy, please try again shortly: {e}")
+            st.stop()
+
+        job = job_manager.status(job_id)
+        if job["status"] in ("queued", "running"):
+            if job["status"] == "queued":
+                st.progress(0.0, text="⏳ Waiting for a free worker...")
+            else:
+                eta = f", about {job['eta']:.0f}s left" if job["eta"] is not None else ""
+                st.progress(job["fraction"], text=f"Analyzing video... frame {job['frames_done']}"
+                                                  f" of {job['total_frames'] or '?'}{eta}")
+            time.sleep(1.0)
+            st.rerun()
+        if job["status"] != "done":
+            st.error(f"Video analysis failed: {job['error']}")
+            st.stop()
+
+        annotated_path, log_path, viz_path, gif_path, webm_path = job["result"]
+        video_workspace = job_manager.get(job_id).workspace
+        st.success(f"Video analysis complete ✅ ({job['elapsed']:.1f}s)")
         print(annotated_path)
         #with open(annotated_path, "rb") as video_file:
         #    st.video(video_file.read())
@@ -76,21 +167,45 @@ if uploaded_file:
 
         
 
-        st.subheader("⚡ Preview (WebM Format)")
-        with open(webm_path, "rb") as f:
-            st.video(f.read(), format="video/webm")
-            st.download_button("⬇️ Download WebM", f, file_name="annotated_preview.webm")
+        # Without ffmpeg only an mp4 is written; show whichever preview exists
+        preview_path, preview_format = (webm_path, "webm") if webm_path else (annotated_path, "mp4")
+
+        # Hold the outputs so the reaper can't remove them while they're served
+        with video_workspace.in_use():
+            st.subheader(f"⚡ Preview ({preview_format.upper()} Format)")
+            st.video(preview_path, format=f"video/{preview_format}")
+            st.download_button(f"⬇️ Download {preview_format.upper()}",
+                               deferred_read(video_workspace, preview_path),
+                               file_name=f"annotated_preview.{preview_format}")
+
+            if viz_path:
+                st.subheader("📊 Object Movement Visualization")
+                if viz_path.endswith(".png"):
+                    st.image(viz_path, caption="Where objects spent time", use_container_width=True)
+                else:
+                    with open(viz_path, "r", encoding="utf-8") as f:
+                        html = f.read()
+                    components.html(html, height=600, scrolling=True)
 
-        if viz_path:
-            st.subheader("📊 Object Movement Visualization")
-            with open(viz_path, "r", encoding="utf-8") as f:
-                html = f.read()
-            components.html(html, height=600, scrolling=True)
+            # The CSV is only rendered from the columnar log when requested,
+            # which may be after this block has released the workspace
+            def position_log_csv():
+                with video_workspace.in_use():
+                    return TrackLog.load(log_path).to_csv()
 
-        st.download_button("Download Position Log", open(log_path, "rb"), file_name="position_log.csv")
+            st.download_button("Download Position Log", position_log_csv,
+                               file_name="position_log.csv", mime="text/csv")
+            st.download_button("Download Track Log (NumPy .npz)", deferred_read(video_workspace, log_path),
+                               file_name="position_log.npz")
 
     else:
         st.error("Unsupported or unrecognized file type. Please upload a valid image or video file.")
 
     if st.button("🔄 Clear Results"):
         st.rerun()
+
+# Sizes are rescanned at most once a minute, not on every (polling) rerun
+workspace_stats = workspaces.stats(max_age=WORKSPACE_STATS_MAX_AGE)
+st.sidebar.caption(f"🗂️ Workspaces: {workspace_stats['workspaces']} using "
+                   f"{workspace_stats['bytes_on_disk'] / 1e6:.1f} MB on disk "
+                   f"({workspace_stats['reaped_bytes'] / 1e6:.1f} MB reclaimed)")
@@ -0,0 +1,189 @@
+# backend/batch_processor.py
+#
+# Headless batch analysis of many images.
+#
+#   python -m backend.batch_processor photos/ -o results.jsonl
+#   python -m backend.batch_processor "dump/**/*.jpg" -o results.jsonl --parquet results.parquet
+#   AZURE_ENDPOINT=http://127.0.0.1:8765/ python -m backend.batch_processor camera.zip -o results.jsonl
+
+import argparse
+import glob
+import json
+import logging
+import os
+import time
+import zipfile
+
+from utils.azure_client import azure_client
+from utils.request_dispatcher import OrderedDispatcher
+from utils.media_utils import DEFAULT_INFERENCE_MAX_EDGE, DEFAULT_JPEG_QUALITY
+from backend.image_processor import analyze_image_bytes
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+# Keys of a result record; failed images only carry "image" and "error"
+RECORD_FIELDS = ("image", "objects", "tags", "captions", "categories", "text", "uploaded_bytes",
+                 "seconds", "error")
+
+
+def iter_images(source):
+    """
+    Yields (image_id, loader) for every image in a directory (recursive), a
+    glob pattern or a .zip archive. `loader()` returns the bytes, so files
+    are only read once they are about to be analyzed; archive members are
+    read as they are yielded, so the archive is closed however iteration
+    ends.
+    """
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for name in sorted(archive.namelist()):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    data = archive.read(name)
+                    yield f"{source}!{name}", (lambda data=data: data)
+        return
+
+    if os.path.isdir(source):
+        paths = glob.glob(os.path.join(source, "**", "*"), recursive=True)
+    else:
+        paths = glob.glob(source, recursive=True)
+
+    for path in sorted(paths):
+        if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS):
+            yield path, (lambda path=path: _read_file(path))
+
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def load_checkpoint(output_path):
+    """
+    Returns: set of image ids already analyzed successfully in `output_path`.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # partial line from an interrupted run
+            if not record.get("error"):
+                done.add(record["image"])
+    return done
+
+
+def _analyze(job, features, inference_max_edge, jpeg_quality):
+    image_id, loader = job
+    start = time.perf_counter()
+    analysis = analyze_image_bytes(loader(), features, inference_max_edge, jpeg_quality)
+    return {
+        "image": image_id,
+        "objects": analysis.objects,
+        "tags": analysis.tags,
+        "captions": analysis.captions,
+        "categories": analysis.categories,
+        "text": analysis.text,
+        "uploaded_bytes": analysis.uploaded_bytes,
+        "seconds": round(time.perf_counter() - start, 4),
+        "error": None,
+    }
+
+
+def run_batch(source, output_path, features=("objects", "tags"), max_in_flight=8,
+              requests_per_second=None,
+              inference_max_edge=DEFAULT_INFERENCE_MAX_EDGE, jpeg_quality=DEFAULT_JPEG_QUALITY,
+              parquet_path=None):
+    """
+    Streams every image in `source` through a concurrent analysis pool and
+    appends one JSON record per image to `output_path`. Images already
+    recorded successfully are skipped, so an interrupted run resumes where
+    it stopped. Optionally converts the results to Parquet.
+
+    The rate limit is applied per Azure call by the shared client, as one
+    image may need both an analyze and a Read call; `requests_per_second`,
+    if given, replaces the client's limit while the batch runs (see
+    AzureClient.rate_limited).
+
+    Returns:
+        dict with "analyzed", "skipped", "failed", "seconds" and "images_per_sec"
+    """
+    done = load_checkpoint(output_path)
+    jobs = ((job, job) for job in iter_images(source) if job[0] not in done)
+    dispatcher = OrderedDispatcher(max_in_flight=max_in_flight, requests_per_second=None)
+
+    analyzed = failed = 0
+    start = time.perf_counter()
+    with azure_client.rate_limited(requests_per_second), open(output_path, "a", encoding="utf-8") as out:
+        for (image_id, _), record, error in dispatcher.map(
+                lambda job: _analyze(job, features, inference_max_edge, jpeg_quality), jobs):
+            if error is not None:
+                logger.warning("Failed to analyze %s: %s", image_id, error)
+                record = {"image": image_id, "error": str(error)}
+                failed += 1
+            else:
+                analyzed += 1
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+    seconds = time.perf_counter() - start
+
+    if parquet_path:
+        write_parquet(output_path, parquet_path)
+
+    return {
+        "analyzed": analyzed,
+        "skipped": len(done),
+        "failed": failed,
+        "seconds": seconds,
+        "images_per_sec": (analyzed + failed) / seconds if seconds else 0.0,
+    }
+
+
+def write_parquet(jsonl_path, parquet_path):
+    """
+    Converts the JSONL results into a Parquet file (requires pyarrow), keeping
+    the latest record per image. Every record is filled out to
+    RECORD_FIELDS, as pyarrow takes the columns from the first record.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Writing Parquet requires pyarrow: pip install pyarrow")
+
+    latest = {}
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            latest[record["image"]] = {field: record.get(field) for field in RECORD_FIELDS}
+    pq.write_table(pa.Table.from_pylist(list(latest.values())), parquet_path)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description="Batch image analysis with Azure Computer Vision")
+    parser.add_argument("source", help="directory, glob pattern or .zip archive")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="JSONL results and checkpoint")
+    parser.add_argument("--parquet", help="also write the results to this Parquet file")
+    parser.add_argument("--features", default="objects,tags",
+                        help="comma-separated: objects, tags, description, categories, read")
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument("--tps", type=float, default=None,
+                        help="Azure calls per second (default: VISION_AZURE_TPS)")
+    parser.add_argument("--max-edge", type=int, default=DEFAULT_INFERENCE_MAX_EDGE)
+    parser.add_argument("--jpeg-quality", type=int, default=DEFAULT_JPEG_QUALITY)
+    args = parser.parse_args()
+
+    stats = run_batch(args.source, args.output, features=tuple(args.features.split(",")),
+                      max_in_flight=args.max_in_flight, requests_per_second=args.tps,
+                      inference_max_edge=args.max_edge, jpeg_quality=args.jpeg_quality,
+                      parquet_path=args.parquet)
+    print(f"Analyzed {stats['analyzed']} images ({stats['skipped']} already done, "
+          f"{stats['failed']} failed) in {stats['seconds']:.1f}s: "
+          f"{stats['images_per_sec']:.2f} images/sec")
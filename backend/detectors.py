@@ -0,0 +1,241 @@
+# backend/detectors.py
+
+import os
+import threading
+from abc import ABC, abstractmethod
+
+import cv2
+import numpy as np
+
+from utils.azure_api import analyze_image
+from backend.tracker import iou_matrix
+
+COCO_LABELS = [
+    "person", "bicycle", "car", "motorcycle", "airplane", "bus", "train", "truck", "boat",
+    "traffic light", "fire hydrant", "stop sign", "parking meter", "bench", "bird", "cat", "dog",
+    "horse", "sheep", "cow", "elephant", "bear", "zebra", "giraffe", "backpack", "umbrella",
+    "handbag", "tie", "suitcase", "frisbee", "skis", "snowboard", "sports ball", "kite",
+    "baseball bat", "baseball glove", "skateboard", "surfboard", "tennis racket", "bottle",
+    "wine glass", "cup", "fork", "knife", "spoon", "bowl", "banana", "apple", "sandwich", "orange",
+    "broccoli", "carrot", "hot dog", "pizza", "donut", "cake", "chair", "couch", "potted plant",
+    "bed", "dining table", "toilet", "tv", "laptop", "mouse", "remote", "keyboard", "cell phone",
+    "microwave", "oven", "toaster", "sink", "refrigerator", "book", "clock", "vase", "scissors",
+    "teddy bear", "hair drier", "toothbrush",
+]
+
+# TensorFlow SSD models use the original 91 COCO ids, which skip these
+_COCO91_GAPS = {12, 26, 29, 30, 45, 66, 68, 69, 71, 83}
+
+
+def _coco91_labels():
+    names = iter(COCO_LABELS)
+    return ["background"] + [None if i in _COCO91_GAPS else next(names) for i in range(1, 91)]
+
+
+class Detector(ABC):
+    """
+    Object detector with the analyze_image interface: called with encoded
+    image bytes, returns a list of {"object", "confidence", "rectangle"}.
+    Calls that reach Azure are rate-limited by the shared client, so
+    callers don't limit detectors themselves.
+    """
+    name = "base"
+
+    @abstractmethod
+    def __call__(self, image_bytes):
+        pass
+
+    def for_job(self):
+        """
+        Returns: the detector to use for one video or stream. Stateless
+        detectors return themselves; ones that count frames return a fresh
+        copy, so concurrent jobs sharing get_detector() don't interfere.
+        """
+        return self
+
+
+class AzureDetector(Detector):
+    name = "azure"
+
+    def __call__(self, image_bytes):
+        return analyze_image(image_bytes)
+
+
+class OpenCVDNNDetector(Detector):
+    """
+    CPU-only detector running through OpenCV DNN.
+
+    model_type "yolov8" expects an ONNX export of a YOLOv8 model (e.g.
+    yolov8n.onnx, output 1 x (4 + classes) x N); "ssd" expects a TensorFlow
+    SSD-MobileNet frozen graph plus its .pbtxt config (output 1 x 1 x N x 7).
+    Each worker thread gets its own network, as cv2.dnn.Net isn't thread-safe.
+    """
+    name = "local"
+
+    def __init__(self, model_path, config_path=None, model_type="yolov8", labels=None,
+                 input_size=None, confidence_threshold=0.4, nms_threshold=0.45):
+        if model_type not in ("yolov8", "ssd"):
+            raise ValueError(f"Unknown local model type: {model_type}")
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Local detector model not found: {model_path}")
+        self.model_path = model_path
+        self.config_path = config_path
+        self.model_type = model_type
+        self.labels = labels or (COCO_LABELS if model_type == "yolov8" else _coco91_labels())
+        self.input_size = input_size or (640 if model_type == "yolov8" else 300)
+        self.confidence_threshold = confidence_threshold
+        self.nms_threshold = nms_threshold
+        self._local = threading.local()
+
+    def _net(self):
+        net = getattr(self._local, "net", None)
+        if net is None:
+            net = cv2.dnn.readNet(self.model_path, self.config_path or "")
+            self._local.net = net
+        return net
+
+    def __call__(self, image_bytes):
+        frame = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError("Could not decode image for local detection.")
+        return self.detect_frame(frame)
+
+    def detect_frame(self, frame):
+        height, width = frame.shape[:2]
+        net = self._net()
+        if self.model_type == "yolov8":
+            blob = cv2.dnn.blobFromImage(frame, 1 / 255.0, (self.input_size, self.input_size), swapRB=True)
+            net.setInput(blob)
+            boxes, scores, class_ids = self._parse_yolov8(net.forward(), width, height)
+        else:
+            blob = cv2.dnn.blobFromImage(frame, size=(self.input_size, self.input_size), swapRB=True)
+            net.setInput(blob)
+            boxes, scores, class_ids = self._parse_ssd(net.forward(), width, height)
+
+        keep = cv2.dnn.NMSBoxes(boxes, scores, self.confidence_threshold, self.nms_threshold)
+        result = []
+        for i in np.array(keep).reshape(-1):
+            label = self.labels[class_ids[i]] if class_ids[i] < len(self.labels) else None
+            if label is None:
+                continue
+            x, y, w, h = boxes[i]
+            result.append({
+                "object": label,
+                "confidence": float(scores[i]),
+                "rectangle": {"x": int(x), "y": int(y), "w": int(w), "h": int(h)}
+            })
+        return result
+
+    def _parse_yolov8(self, output, width, height):
+        predictions = output[0].T  # N x (4 + classes)
+        class_scores = predictions[:, 4:]
+        class_ids = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(class_ids)), class_ids]
+        keep = scores >= self.confidence_threshold
+        predictions, class_ids, scores = predictions[keep], class_ids[keep], scores[keep]
+
+        sx, sy = width / self.input_size, height / self.input_size
+        cx, cy, w, h = predictions[:, 0], predictions[:, 1], predictions[:, 2], predictions[:, 3]
+        boxes = np.stack([(cx - w / 2) * sx, (cy - h / 2) * sy, w * sx, h * sy], axis=1)
+        return boxes.astype(int).tolist(), scores.astype(float).tolist(), class_ids.tolist()
+
+    def _parse_ssd(self, output, width, height):
+        detections = output.reshape(-1, 7)
+        detections = detections[detections[:, 2] >= self.confidence_threshold]
+        x0, y0 = detections[:, 3] * width, detections[:, 4] * height
+        x1, y1 = detections[:, 5] * width, detections[:, 6] * height
+        boxes = np.stack([x0, y0, x1 - x0, y1 - y0], axis=1)
+        return (boxes.astype(int).tolist(), detections[:, 2].astype(float).tolist(),
+                detections[:, 1].astype(int).tolist())
+
+
+class HybridDetector(Detector):
+    """
+    Runs `local` on every call and also `remote` on every
+    `keyframe_interval`-th call. On keyframes the remote detections win and
+    local boxes overlapping them (IoU >= `merge_iou`) are dropped; if the
+    remote call fails, the local result is used alone.
+
+    Calls are counted per instance, so each job uses its own for_job() copy
+    rather than the shared one from get_detector().
+    """
+    name = "hybrid"
+
+    def __init__(self, local, remote, keyframe_interval=10, merge_iou=0.5):
+        self.local = local
+        self.remote = remote
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.merge_iou = merge_iou
+        self._calls = 0
+        self._lock = threading.Lock()
+
+    def for_job(self):
+        return HybridDetector(self.local, self.remote, keyframe_interval=self.keyframe_interval,
+                              merge_iou=self.merge_iou)
+
+    def __call__(self, image_bytes):
+        with self._lock:
+            keyframe = self._calls % self.keyframe_interval == 0
+            self._calls += 1
+
+        local_objects = self.local(image_bytes)
+        if not keyframe:
+            return local_objects
+        try:
+            remote_objects = self.remote(image_bytes)
+        except Exception as e:
+            print(f"Remote detector failed on keyframe, using local result: {e}")
+            return local_objects
+        return merge_detections(remote_objects, local_objects, self.merge_iou)
+
+
+def _boxes(objects):
+    return np.array([(o["rectangle"]["x"], o["rectangle"]["y"], o["rectangle"]["w"], o["rectangle"]["h"])
+                     for o in objects], dtype=np.float64).reshape(-1, 4)
+
+
+def merge_detections(primary, secondary, min_iou=0.5):
+    """
+    Returns `primary` plus the `secondary` detections that don't overlap
+    any primary detection by `min_iou` or more.
+    """
+    if not primary or not secondary:
+        return list(primary) + list(secondary)
+    overlaps = iou_matrix(_boxes(secondary), _boxes(primary)).max(axis=1)
+    return list(primary) + [obj for obj, iou in zip(secondary, overlaps) if iou < min_iou]
+
+
+_detectors = {}
+_detectors_lock = threading.RLock()
+
+
+def get_detector(name=None):
+    """
+    Returns the process-wide detector for `name` ("azure", "local" or
+    "hybrid"), defaulting to VISION_DETECTOR or "azure". The local model is
+    configured with VISION_LOCAL_MODEL, VISION_LOCAL_CONFIG,
+    VISION_LOCAL_MODEL_TYPE and VISION_LOCAL_CONFIDENCE; hybrid keyframes
+    with VISION_HYBRID_KEYFRAME_INTERVAL.
+    """
+    name = name or os.getenv("VISION_DETECTOR", "azure")
+    with _detectors_lock:
+        if name not in _detectors:
+            if name == "azure":
+                _detectors[name] = AzureDetector()
+            elif name == "local":
+                model_path = os.getenv("VISION_LOCAL_MODEL")
+                if not model_path:
+                    raise ValueError("Set VISION_LOCAL_MODEL to use the local detector.")
+                _detectors[name] = OpenCVDNNDetector(
+                    model_path,
+                    config_path=os.getenv("VISION_LOCAL_CONFIG"),
+                    model_type=os.getenv("VISION_LOCAL_MODEL_TYPE", "yolov8"),
+                    confidence_threshold=float(os.getenv("VISION_LOCAL_CONFIDENCE", "0.4")),
+                )
+            elif name == "hybrid":
+                _detectors[name] = HybridDetector(
+                    get_detector("local"), get_detector("azure"),
+                    keyframe_interval=int(os.getenv("VISION_HYBRID_KEYFRAME_INTERVAL", "10")))
+            else:
+                raise ValueError(f"Unknown detector: {name}")
+        return _detectors[name]
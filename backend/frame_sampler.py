@@ -0,0 +1,104 @@
+# backend/frame_sampler.py
+
+import cv2
+import numpy as np
+
+# Default change thresholds per method
+DEFAULT_THRESHOLDS = {
+    "diff": 6.0,        # mean absolute grey-level difference (0-255)
+    "histogram": 0.15,  # Bhattacharyya distance between HSV histograms (0-1)
+    "phash": 8,         # differing bits out of a 64-bit perceptual hash
+}
+
+
+class AdaptiveFrameSampler:
+    """
+    Picks which decoded frames are worth sending to Azure.
+
+    A frame is sampled when its content has changed by more than `threshold`
+    since the last sampled frame, but never sooner than `min_gap` frames and
+    never later than `max_gap` frames after it. Everything runs locally on
+    a small greyscale/HSV thumbnail.
+    """
+
+    def __init__(self, method="diff", threshold=None, min_gap=3, max_gap=30,
+                 frame_interval=10, thumb_size=(64, 36)):
+        if method not in DEFAULT_THRESHOLDS:
+            raise ValueError(f"Unknown sampling method: {method}")
+        if min_gap < 1 or max_gap < min_gap:
+            raise ValueError("Expected 1 <= min_gap <= max_gap.")
+        self.method = method
+        self.threshold = DEFAULT_THRESHOLDS[method] if threshold is None else threshold
+        self.min_gap = min_gap
+        self.max_gap = max_gap
+        self.frame_interval = frame_interval
+        self.thumb_size = thumb_size
+
+        self._reference = None
+        self._gap = 0
+        self.frames_seen = 0
+        self.frames_sampled = 0
+        self.change_triggered = 0
+        self.max_gap_triggered = 0
+
+    def _signature(self, frame):
+        small = cv2.resize(frame, self.thumb_size, interpolation=cv2.INTER_AREA)
+        if self.method == "histogram":
+            hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+            hist = cv2.calcHist([hsv], [0, 1], None, [16, 16], [0, 180, 0, 256])
+            return cv2.normalize(hist, hist).flatten()
+
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        if self.method == "phash":
+            dct = cv2.dct(np.float32(cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA)))
+            low = dct[:8, :8].flatten()
+            return low > np.median(low[1:])
+        return gray.astype(np.int16)
+
+    def _distance(self, a, b):
+        if self.method == "histogram":
+            return cv2.compareHist(a, b, cv2.HISTCMP_BHATTACHARYYA)
+        if self.method == "phash":
+            return int(np.count_nonzero(a != b))
+        return float(np.mean(np.abs(a - b)))
+
+    def should_sample(self, frame):
+        self.frames_seen += 1
+        self._gap += 1
+
+        if self._reference is not None and self._gap < self.min_gap:
+            return False
+
+        signature = self._signature(frame)
+        if self._reference is None:
+            sample = True
+        elif self._gap >= self.max_gap:
+            sample = True
+            self.max_gap_triggered += 1
+        elif self._distance(self._reference, signature) > self.threshold:
+            sample = True
+            self.change_triggered += 1
+        else:
+            sample = False
+
+        if sample:
+            self._reference = signature
+            self._gap = 0
+            self.frames_sampled += 1
+        return sample
+
+    def report(self):
+        """
+        Returns: dict comparing the frames sent with what fixed-interval
+        sampling at `frame_interval` would have sent for the same video.
+        """
+        fixed_calls = self.frames_seen // self.frame_interval
+        return {
+            "method": self.method,
+            "frames_seen": self.frames_seen,
+            "frames_sampled": self.frames_sampled,
+            "change_triggered": self.change_triggered,
+            "max_gap_triggered": self.max_gap_triggered,
+            "fixed_interval_calls": fixed_calls,
+            "api_calls_saved": fixed_calls - self.frames_sampled,
+        }
@@ -0,0 +1,97 @@
+# backend/gap_filler.py
+
+import cv2
+import numpy as np
+
+
+class GapFiller:
+    """
+    Carries tracked boxes across the frames that were not sent to Azure.
+
+    method "hold" repeats the last tracked boxes unchanged. method "flow"
+    seeds corner features inside every box on the last detection frame and
+    follows them with pyramidal Lucas-Kanade optical flow, moving each box by
+    the median displacement of its surviving points. method "predict" asks
+    `tracker` (a CentroidTracker with a Kalman motion model) where each track
+    should be after the elapsed number of frames.
+    """
+
+    def __init__(self, method="flow", max_points=20, tracker=None):
+        if method not in ("hold", "flow", "predict"):
+            raise ValueError(f"Unknown gap filling method: {method}")
+        if method == "predict" and tracker is None:
+            raise ValueError("The predict method needs a tracker.")
+        self.method = method
+        self.max_points = max_points
+        self.tracker = tracker
+        self._tracked = {}
+        self._frames_since_reset = 0
+        self._points = {}  # object_id -> (N, 1, 2) float32 points
+        self._prev_gray = None
+
+    def reset(self, frame, tracked):
+        """
+        Starts a new gap from a frame with fresh detections.
+        tracked: output of CentroidTracker.update for that frame.
+        """
+        self._tracked = {object_id: dict(info) for object_id, info in tracked.items()}
+        self._frames_since_reset = 0
+        self._points = {}
+        if self.method != "flow" or not tracked:
+            self._prev_gray = None
+            return
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        height, width = gray.shape
+        for object_id, info in tracked.items():
+            x, y, w, h = info["bbox"]
+            x0, y0 = max(0, x), max(0, y)
+            x1, y1 = min(width, x + w), min(height, y + h)
+            if x1 <= x0 or y1 <= y0:
+                continue
+            mask = np.zeros_like(gray)
+            mask[y0:y1, x0:x1] = 255
+            points = cv2.goodFeaturesToTrack(gray, maxCorners=self.max_points, qualityLevel=0.01,
+                                             minDistance=5, mask=mask)
+            if points is not None:
+                self._points[object_id] = points.astype(np.float32)
+        self._prev_gray = gray
+
+    def propagate(self, frame):
+        """
+        Returns: dict of object_id -> {"label", "bbox", "centroid"} for `frame`.
+        """
+        self._frames_since_reset += 1
+        if self.method == "predict":
+            predicted = self.tracker.predict(self._frames_since_reset)
+            return {object_id: predicted[object_id] for object_id in self._tracked
+                    if object_id in predicted}
+        if self.method == "flow" and self._points and self._prev_gray is not None:
+            self._follow(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+        return {object_id: dict(info) for object_id, info in self._tracked.items()}
+
+    def _follow(self, gray):
+        object_ids = list(self._points)
+        counts = [len(self._points[object_id]) for object_id in object_ids]
+        old_points = np.concatenate([self._points[object_id] for object_id in object_ids])
+
+        new_points, status, _ = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, old_points, None)
+        status = status.reshape(-1).astype(bool)
+
+        start = 0
+        for object_id, count in zip(object_ids, counts):
+            end = start + count
+            good = status[start:end]
+            if good.any():
+                shift = np.median(new_points[start:end][good] - old_points[start:end][good], axis=0)[0]
+                dx, dy = int(round(shift[0])), int(round(shift[1]))
+                info = self._tracked[object_id]
+                x, y, w, h = info["bbox"]
+                info["bbox"] = (x + dx, y + dy, w, h)
+                info["centroid"] = (x + dx + w // 2, y + dy + h // 2)
+                self._points[object_id] = new_points[start:end][good].reshape(-1, 1, 2)
+            else:
+                del self._points[object_id]
+            start = end
+
+        self._prev_gray = gray
@@ -2,36 +2,90 @@
 
 import cv2
 import numpy as np
-from utils.azure_api import analyze_image
 from PIL import Image, UnidentifiedImageError
-from utils.azure_api import analyze_image, extract_text, analyze_tags
+from utils.azure_api import analyze_features, ImageAnalysis
+from utils.media_utils import (encode_for_inference, rescale_objects,
+                               DEFAULT_INFERENCE_MAX_EDGE, DEFAULT_JPEG_QUALITY)
+from backend.detectors import get_detector
+from utils.metrics import metrics
 import io
 
-def process_image(uploaded_file):
+def analyze_image_bytes(img_bytes, features=("objects", "tags"),
+                        inference_max_edge=DEFAULT_INFERENCE_MAX_EDGE, jpeg_quality=DEFAULT_JPEG_QUALITY,
+                        image=None, detector=None):
+    """
+    Analyzes encoded image bytes without drawing anything. Images with a long
+    edge above `inference_max_edge` are downscaled and re-encoded at
+    `jpeg_quality` before upload and the boxes mapped back; OCR always reads
+    the original bytes. `image` may pass an already decoded RGB array.
+
+    With a non-Azure `detector` (a Detector or its name), objects come from
+    that detector and only the remaining features are requested from Azure.
+
+    Returns:
+        ImageAnalysis, with `uploaded_bytes` set to the size actually sent
+    """
+    if image is None:
+        with metrics.span("image_stage_seconds", stage="decode"):
+            image = np.array(Image.open(io.BytesIO(img_bytes)).convert("RGB"))
+
+    upload_bytes, scale = img_bytes, 1.0
+    if inference_max_edge and max(image.shape[:2]) > inference_max_edge:
+        with metrics.span("image_stage_seconds", stage="encode"):
+            upload_bytes, scale = encode_for_inference(cv2.cvtColor(image, cv2.COLOR_RGB2BGR),
+                                                       inference_max_edge, jpeg_quality)
+
+    if isinstance(detector, str):
+        detector = get_detector(detector)
+    with metrics.span("image_stage_seconds", stage="analyze"):
+        if detector is None or detector.name == "azure":
+            analysis = analyze_features(upload_bytes, features, read_image_bytes=img_bytes)
+        else:
+            remaining = tuple(name for name in features if name != "objects")
+            analysis = (analyze_features(upload_bytes, remaining, read_image_bytes=img_bytes)
+                        if remaining else ImageAnalysis(features=tuple(sorted(features))))
+            if "objects" in features:
+                analysis.objects = detector(upload_bytes)
+    analysis.objects = rescale_objects(analysis.objects, scale)
+    analysis.uploaded_bytes = len(upload_bytes)
+    return analysis
+
+
+def process_image(uploaded_file, features=("objects", "tags"),
+                  inference_max_edge=DEFAULT_INFERENCE_MAX_EDGE, jpeg_quality=DEFAULT_JPEG_QUALITY,
+                  detector=None):
+    """
+    Runs every requested feature in one Azure analysis (plus a concurrent
+    OCR job if "read" is included) and draws the detected objects.
+    See analyze_image_bytes for the upload resolution options.
+
+    Returns:
+        (annotated PIL image, object labels, ImageAnalysis)
+    """
     try:
         img_bytes = uploaded_file.getvalue()
-        image = Image.open(io.BytesIO(img_bytes)).convert("RGB")
-        img_np = np.array(image)
-        tags = analyze_tags(img_bytes)
-        objects = analyze_image(img_bytes)
-
-        for obj in objects:
-            bbox = obj["rectangle"]
-            label = obj["object"]
-            confidence = obj.get("confidence", 0) * 100
-            x, y, w, h = bbox["x"], bbox["y"], bbox["w"], bbox["h"]
-
-            # Draw bounding box and label with confidence
-            cv2.rectangle(img_np, (x, y), (x + w, y + h), (0, 255, 0), 2)
-            label_text = f"{label} ({confidence:.1f}%)"
-            cv2.putText(img_np, label_text, (x, y - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (36, 255, 12), 2)
+        with metrics.span("image_stage_seconds", stage="decode"):
+            image = Image.open(io.BytesIO(img_bytes)).convert("RGB")
+            img_np = np.array(image)
+        analysis = analyze_image_bytes(img_bytes, features, inference_max_edge, jpeg_quality,
+                                       image=img_np, detector=detector)
+        objects = analysis.objects
+
+        with metrics.span("image_stage_seconds", stage="draw"):
+            for obj in objects:
+                bbox = obj["rectangle"]
+                label = obj["object"]
+                confidence = obj.get("confidence", 0) * 100
+                x, y, w, h = bbox["x"], bbox["y"], bbox["w"], bbox["h"]
+
+                # Draw bounding box and label with confidence
+                cv2.rectangle(img_np, (x, y), (x + w, y + h), (0, 255, 0), 2)
+                label_text = f"{label} ({confidence:.1f}%)"
+                cv2.putText(img_np, label_text, (x, y - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (36, 255, 12), 2)
 
         # Show all detected objects with confidence
-        object_labels = [f"{obj['object']} ({obj['confidence']*100:.1f}%)" for obj in objects]
-        detected_text = extract_text(img_bytes)
-        # return Image.fromarray(img_np), object_labels
-        return Image.fromarray(img_np), [f"{obj['object']} ({obj['confidence']*100:.1f}%)" for obj in objects], detected_text
+        return Image.fromarray(img_np), analysis.object_labels(), analysis
 
     except UnidentifiedImageError:
         raise ValueError("Uploaded file is not a valid image. Please upload a .jpg, .png, or .jpeg file.")
@@ -0,0 +1,258 @@
+# backend/jobs.py
+
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+
+from utils.workspace import workspaces
+from utils.metrics import metrics
+
+# Workers write progress at most this often
+PROGRESS_INTERVAL = 0.5
+
+
+class JobQueueFullError(RuntimeError):
+    pass
+
+
+@dataclass
+class Job:
+    id: str
+    params: dict
+    workspace: object
+    submitted_at: float = field(default_factory=time.time)
+    future: object = None
+    result: tuple = None
+    error: str = None
+    finished_at: float = None
+
+    @property
+    def progress_path(self):
+        return os.path.join(self.workspace.path, "progress.json")
+
+
+def job_key(input_hash, params):
+    """
+    Returns: id shared by every submission of the same input with the same
+    parameters.
+    """
+    digest = hashlib.sha256(input_hash.encode("utf-8"))
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(8 * 1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _init_worker(workspace_root):
+    # Workers share the parent's workspace root but never reap it: only the
+    # parent knows which workspaces are in use.
+    workspaces.root = workspace_root
+    workspaces.reap_interval = 0
+
+
+def _run_job(video_path, workspace_name, params):
+    from backend.video_processor import process_video
+
+    workspace = workspaces.workspace(workspace_name)
+    progress_path = os.path.join(workspace.path, "progress.json")
+    state = {"started_at": time.time(), "updated_at": 0.0, "frames_done": 0, "total_frames": 0}
+
+    def report(frames_done, total_frames, status="running"):
+        now = time.time()
+        state.update(frames_done=frames_done, total_frames=total_frames)
+        if status == "running" and now - state["updated_at"] < PROGRESS_INTERVAL:
+            return
+        state["updated_at"] = now
+        _write_json(progress_path, dict(state, status=status))
+
+    # Workers are reused; only this job's metrics go back to the parent
+    metrics.reset()
+    report(0, 0)
+    result = process_video(video_path, workspace=workspace, progress_callback=report, **params)
+    report(state["frames_done"], state["total_frames"], status="done")
+    return result, metrics.snapshot()
+
+
+class JobManager:
+    """
+    Runs process_video jobs on a pool of `max_workers` processes.
+
+    submit() returns at once with a job id derived from the input's hash
+    and the parameters, so resubmitting the same video attaches to the job
+    already queued, running or finished. A failed job is returned as well
+    for `failed_ttl` seconds, so a page rerun shows its error instead of
+    starting it again. Each job owns a workspace holding a link to its
+    input, its outputs and a progress file that status() reads. At most
+    `max_pending` jobs may be queued or running.
+    """
+
+    def __init__(self, max_workers=2, max_pending=16, failed_ttl=300):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.failed_ttl = failed_ttl
+        self._jobs = {}
+        # Reentrant: a future that is already done runs _finished inside submit()
+        self._lock = threading.RLock()
+        self._pool = None
+
+    @classmethod
+    def from_env(cls):
+        """
+        VISION_JOB_WORKERS, VISION_JOB_MAX_PENDING and VISION_JOB_FAILED_TTL
+        configure the pool.
+        """
+        return cls(max_workers=int(os.getenv("VISION_JOB_WORKERS", "2")),
+                   max_pending=int(os.getenv("VISION_JOB_MAX_PENDING", "16")),
+                   failed_ttl=float(os.getenv("VISION_JOB_FAILED_TTL", "300")))
+
+    def _executor(self):
+        if self._pool is None:
+            # spawn, not fork: the parent runs threads (reaper, dispatchers)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker, initargs=(workspaces.root,))
+        return self._pool
+
+    def _pending(self):
+        return sum(1 for job in self._jobs.values() if job.future is not None and not job.future.done())
+
+    def _link_input(self, video_path, workspace):
+        target = os.path.join(workspace.path, "input" + os.path.splitext(video_path)[1].lower())
+        if not os.path.exists(target):
+            try:
+                os.link(video_path, target)
+            except OSError:
+                shutil.copyfile(video_path, target)
+        return target
+
+    def submit(self, video_path, input_hash=None, **params):
+        """
+        Queues process_video(video_path, **params) unless the same input and
+        parameters are already queued, running or done, or failed less than
+        `failed_ttl` seconds ago. Raises JobQueueFullError when
+        `max_pending` jobs are outstanding.
+
+        Returns: job id
+        """
+        job_id = job_key(input_hash or _file_hash(video_path), params)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.error is not None \
+                    and time.time() - job.finished_at < self.failed_ttl:
+                return job_id
+            if job is not None and job.error is None and os.path.isdir(job.workspace.path):
+                if job.result is None or all(os.path.exists(p) for p in job.result if p):
+                    return job_id
+
+            if self._pending() >= self.max_pending:
+                raise JobQueueFullError(f"{self.max_pending} video jobs are already queued or running")
+
+            workspace = workspaces.workspace(f"job-{job_id}")
+            workspace.clear()
+            workspace.acquire()
+            job = Job(job_id, params, workspace)
+            args = (self._link_input(video_path, workspace), workspace.name, params)
+            try:
+                job.future = self._executor().submit(_run_job, *args)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); start a fresh pool
+                self._pool = None
+                job.future = self._executor().submit(_run_job, *args)
+            job.future.add_done_callback(lambda future, job=job: self._finished(job, future))
+            self._jobs[job_id] = job
+        return job_id
+
+    def _finished(self, job, future):
+        try:
+            result, snapshot = future.result()
+            error = None
+            metrics.merge(snapshot)
+            metrics.counter("video_jobs_total", status="done")
+        except Exception as e:
+            result, error = None, f"{type(e).__name__}: {e}"
+            metrics.counter("video_jobs_total", status="failed")
+            print(f"Video job {job.id} failed: {error}")
+        with self._lock:
+            job.result, job.error = result, error
+            job.finished_at = time.time()
+        job.workspace.release()
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def status(self, job_id):
+        """
+        Returns:
+            dict with "status" ("queued", "running", "done", "failed" or
+            "unknown"), "frames_done", "total_frames", "fraction",
+            "elapsed", "eta" (seconds, None until known), "result" and
+            "error"
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            result, error = (job.result, job.error) if job is not None else (None, None)
+        if job is None:
+            return {"status": "unknown", "frames_done": 0, "total_frames": 0, "fraction": 0.0,
+                    "elapsed": 0.0, "eta": None, "result": None, "error": None}
+
+        progress = {}
+        try:
+            with open(job.progress_path, "r", encoding="utf-8") as f:
+                progress = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+        if error is not None:
+            status = "failed"
+        elif result is not None:
+            status = "done"
+        else:
+            status = "running" if progress else "queued"
+
+        frames_done = progress.get("frames_done", 0)
+        total_frames = progress.get("total_frames", 0)
+        if status == "done":
+            fraction = 1.0
+        else:
+            fraction = min(1.0, frames_done / total_frames) if total_frames else 0.0
+        started_at = progress.get("started_at")
+        if not started_at:
+            elapsed = 0.0
+        else:
+            elapsed = (progress["updated_at"] if status == "done" else time.time()) - started_at
+        if status == "done":
+            eta = 0.0
+        else:
+            eta = elapsed * (1 - fraction) / fraction if fraction > 0 else None
+        return {"status": status, "frames_done": frames_done, "total_frames": total_frames,
+                "fraction": fraction, "elapsed": elapsed, "eta": eta,
+                "result": result, "error": error}
+
+    def shutdown(self, wait=True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+
+
+# Shared by every session of the app
+job_manager = JobManager.from_env()
@@ -0,0 +1,97 @@
+# backend/kalman.py
+
+import numpy as np
+
+# Measurement matrix: only the centroid (cx, cy) is observed
+_H = np.array([[1.0, 0.0, 0.0, 0.0],
+               [0.0, 1.0, 0.0, 0.0]])
+
+
+def _transition(dt):
+    return np.array([[1.0, 0.0, dt, 0.0],
+                     [0.0, 1.0, 0.0, dt],
+                     [0.0, 0.0, 1.0, 0.0],
+                     [0.0, 0.0, 0.0, 1.0]])
+
+
+def _process_noise(dt, q):
+    # Discrete white-noise acceleration model for one axis, applied to x and y
+    dt2, dt3, dt4 = dt ** 2, dt ** 3, dt ** 4
+    return q * np.array([[dt4 / 4, 0.0, dt3 / 2, 0.0],
+                         [0.0, dt4 / 4, 0.0, dt3 / 2],
+                         [dt3 / 2, 0.0, dt2, 0.0],
+                         [0.0, dt3 / 2, 0.0, dt2]])
+
+
+class BatchKalmanFilter:
+    """
+    Constant-velocity Kalman filter for many tracks at once.
+
+    Row i of `x` is the state (cx, cy, vx, vy) of one track and `P[i]` its
+    covariance; predict and correct are single batched matrix operations over
+    all rows. Time is measured in frames.
+    """
+
+    def __init__(self, process_noise=1.0, measurement_noise=10.0, initial_velocity_variance=100.0):
+        self.q = process_noise
+        self.r = measurement_noise
+        self.initial_velocity_variance = initial_velocity_variance
+        self.x = np.empty((0, 4))
+        self.P = np.empty((0, 4, 4))
+
+    def __len__(self):
+        return len(self.x)
+
+    def add(self, centroids):
+        """Starts one track per (cx, cy) row with zero velocity."""
+        centroids = np.asarray(centroids, dtype=np.float64).reshape(-1, 2)
+        x = np.hstack([centroids, np.zeros_like(centroids)])
+        P = np.tile(np.diag([self.r, self.r, self.initial_velocity_variance,
+                             self.initial_velocity_variance]), (len(centroids), 1, 1))
+        self.x = np.concatenate([self.x, x])
+        self.P = np.concatenate([self.P, P])
+
+    def keep(self, mask):
+        """Drops the rows where `mask` is False."""
+        self.x = self.x[mask]
+        self.P = self.P[mask]
+
+    def predict(self, dt=1.0):
+        """Advances every track by `dt` frames in place."""
+        F = _transition(dt)
+        self.x = self.x @ F.T
+        self.P = F @ self.P @ F.T + _process_noise(dt, self.q)
+
+    def predicted(self, dt):
+        """Returns: (N, 2) centroids `dt` frames ahead, without changing state."""
+        return (self.x @ _transition(dt).T)[:, :2]
+
+    def innovation_covariance(self, rows=None):
+        """Returns: (N, 2, 2) covariance S of the predicted centroids against a measurement."""
+        P = self.P if rows is None else self.P[rows]
+        return _H @ P @ _H.T + self.r * np.eye(2)
+
+    def mahalanobis(self, rows, centroids):
+        """
+        Returns: (len(rows), M) squared Mahalanobis distances between the
+        predicted centroids of the tracks in `rows` and measured `centroids`.
+        """
+        centroids = np.asarray(centroids, dtype=np.float64).reshape(-1, 2)
+        S_inv = np.linalg.inv(self.innovation_covariance(rows))
+        dx = centroids[None, :, 0] - self.x[rows, 0:1]
+        dy = centroids[None, :, 1] - self.x[rows, 1:2]
+        return (S_inv[:, 0:1, 0] * dx * dx + 2 * S_inv[:, 0:1, 1] * dx * dy
+                + S_inv[:, 1:2, 1] * dy * dy)
+
+    def correct(self, rows, centroids):
+        """Applies measured (cx, cy) `centroids` to the tracks in `rows`."""
+        if len(rows) == 0:
+            return
+        x, P = self.x[rows], self.P[rows]
+        z = np.asarray(centroids, dtype=np.float64).reshape(-1, 2)
+
+        S = self.innovation_covariance(rows)
+        K = P @ _H.T @ np.linalg.inv(S)
+        innovation = z - x @ _H.T
+        self.x[rows] = x + np.einsum("nij,nj->ni", K, innovation)
+        self.P[rows] = (np.eye(4) - K @ _H) @ P
@@ -0,0 +1,243 @@
+# backend/pipeline.py
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from utils.metrics import metrics
+from utils.request_dispatcher import OrderedDispatcher
+from utils.media_utils import (encode_for_inference, rescale_objects, UploadStats,
+                               DEFAULT_INFERENCE_MAX_EDGE, DEFAULT_JPEG_QUALITY)
+
+_DONE = object()
+
+
+class StageTimer:
+    """
+    Thread-safe per-stage accounting: time spent working, items handled,
+    time starved waiting for input and time blocked handing output to a full
+    downstream queue. Busy time per item also goes to the
+    `pipeline_stage_seconds` histogram.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._started = time.perf_counter()
+
+    def add(self, stage, busy=0.0, items=0, starved=0.0, blocked=0.0):
+        with self._lock:
+            stats = self._stats.setdefault(stage, {"busy": 0.0, "items": 0, "starved": 0.0, "blocked": 0.0})
+            stats["busy"] += busy
+            stats["items"] += items
+            stats["starved"] += starved
+            stats["blocked"] += blocked
+        if items:
+            metrics.observe("pipeline_stage_seconds", busy / items, stage=stage)
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, busy=time.perf_counter() - start, items=1)
+
+    def report(self):
+        """
+        Returns: dict of stage -> {"items", "busy_s", "starved_s", "blocked_s",
+        "ms_per_item"}, plus "wall_s" for the whole run.
+        """
+        with self._lock:
+            report = {"wall_s": time.perf_counter() - self._started}
+            for stage, stats in self._stats.items():
+                report[stage] = {
+                    "items": stats["items"],
+                    "busy_s": stats["busy"],
+                    "starved_s": stats["starved"],
+                    "blocked_s": stats["blocked"],
+                    "ms_per_item": 1000 * stats["busy"] / stats["items"] if stats["items"] else 0.0,
+                }
+            return report
+
+    def summary(self):
+        report = self.report()
+        lines = [f"Pipeline wall time {report.pop('wall_s'):.2f}s"]
+        for stage, stats in report.items():
+            lines.append(f"  {stage:<8} {stats['items']:>6} items  busy {stats['busy_s']:7.2f}s  "
+                         f"starved {stats['starved_s']:7.2f}s  blocked {stats['blocked_s']:7.2f}s  "
+                         f"{stats['ms_per_item']:7.1f} ms/item")
+        return "\n".join(lines)
+
+
+class FramePipeline:
+    """
+    Runs decode -> JPEG encode -> inference -> (caller) -> write as
+    concurrent stages joined by bounded queues.
+
+    A decoder thread reads frames and decides which to sample, an encoder
+    pool downscales the sampled ones to `max_edge` and JPEG-encodes them at
+    `jpeg_quality`, and an OrderedDispatcher keeps up to
+    `max_in_flight` requests outstanding. Iterating the pipeline yields
+    ((frame_id, frame, sampled), objects, error) in frame order on the
+    caller's thread, which tracks and draws and then hands the frame to
+    `write()`; a writer thread drains those to `writer`. Each queue, and
+    the frames waiting behind an unfinished request, holds at most
+    `queue_size` frames, so memory stays flat however long the video is
+    and however slow a request gets. Returned rectangles are mapped back to full-resolution coordinates.
+    Per-stage timings are collected in `timer` and upload sizes in `uploads`.
+    """
+
+    def __init__(self, cap, should_sample, analyze, writer, keep_all=True, encoder_workers=2,
+                 max_in_flight=4, queue_size=16,
+                 max_edge=DEFAULT_INFERENCE_MAX_EDGE, jpeg_quality=DEFAULT_JPEG_QUALITY):
+        self.cap = cap
+        self.should_sample = should_sample
+        self.analyze = analyze
+        self.writer = writer
+        self.keep_all = keep_all
+        self.max_edge = max_edge
+        self.jpeg_quality = jpeg_quality
+        self.queue_size = queue_size
+        self.timer = StageTimer()
+        self.uploads = UploadStats()
+
+        self._decoded = queue.Queue(maxsize=queue_size)
+        self._encoded = queue.Queue(maxsize=queue_size)
+        self._results = queue.Queue(maxsize=queue_size)
+        self._to_write = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._error = None
+
+        self._encoder_pool = ThreadPoolExecutor(max_workers=encoder_workers)
+        # Azure calls are rate-limited by the shared client, local ones not at all
+        self._dispatcher = OrderedDispatcher(max_in_flight=max_in_flight, requests_per_second=None)
+        self._threads = [
+            threading.Thread(target=self._run_stage, args=(self._decode, self._decoded), daemon=True),
+            threading.Thread(target=self._run_stage, args=(self._encode, self._encoded), daemon=True),
+            threading.Thread(target=self._run_stage, args=(self._infer, self._results), daemon=True),
+        ]
+        self._writer_thread = threading.Thread(target=self._write_frames, daemon=True)
+
+    def __enter__(self):
+        for thread in self._threads:
+            thread.start()
+        self._writer_thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _put(self, q, item, stage):
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        if stage is not None:
+            self.timer.add(stage, blocked=time.perf_counter() - start)
+
+    def _get(self, q, stage):
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                item = q.get(timeout=0.1)
+                break
+            except queue.Empty:
+                continue
+        else:
+            item = _DONE
+        self.timer.add(stage, starved=time.perf_counter() - start)
+        return item
+
+    def _drain(self, q, stage):
+        while True:
+            item = self._get(q, stage)
+            if item is _DONE:
+                return
+            yield item
+
+    def _run_stage(self, stage, output):
+        try:
+            stage()
+        except Exception as e:
+            self._error = self._error or e
+        finally:
+            self._put(output, _DONE, None)
+
+    def _decode(self):
+        frame_id = 0
+        while self.cap.isOpened() and not self._stop.is_set():
+            with self.timer.time("decode"):
+                ret, frame = self.cap.read()
+            if not ret:
+                break
+
+            frame_id += 1
+            metrics.counter("frames_decoded_total")
+            with self.timer.time("sample"):
+                sampled = self.should_sample(frame_id, frame)
+            if sampled:
+                metrics.counter("frames_sampled_total")
+            if sampled or self.keep_all:
+                self._put(self._decoded, (frame_id, frame, sampled), "decode")
+
+    def _encode_frame(self, frame):
+        with self.timer.time("encode"):
+            return encode_for_inference(frame, self.max_edge, self.jpeg_quality)
+
+    def _encode(self):
+        for item in self._drain(self._decoded, "encode"):
+            future = self._encoder_pool.submit(self._encode_frame, item[1]) if item[2] else None
+            self._put(self._encoded, (item, future), "encode")
+
+    def _analyze_encoded(self, future):
+        image_bytes, scale = future.result()
+        self.uploads.record(len(image_bytes))
+        metrics.counter("frames_sent_total")
+        with self.timer.time("infer"):
+            return rescale_objects(self.analyze(image_bytes), scale)
+
+    def _infer(self):
+        items = self._drain(self._encoded, "infer")
+        for result in self._dispatcher.map(self._analyze_encoded, items, max_pending=self.queue_size):
+            self._put(self._results, result, "infer")
+
+    def _write_frames(self):
+        try:
+            for frame in self._drain(self._to_write, "write"):
+                with self.timer.time("write"):
+                    self.writer.write(frame)
+        except Exception as e:
+            self._error = self._error or e
+            self._stop.set()
+
+    def __iter__(self):
+        while True:
+            result = self._get(self._results, "track")
+            if result is _DONE:
+                break
+            if result[2] is not None:
+                metrics.counter("api_errors_total", call="analyze")
+            start = time.perf_counter()
+            yield result
+            self.timer.add("track", busy=time.perf_counter() - start, items=1)
+        if self._error is not None:
+            raise self._error
+
+    def write(self, frame):
+        self._put(self._to_write, frame, "track")
+
+    def close(self):
+        """Flushes the writer and stops every stage."""
+        if self._writer_thread.is_alive():
+            self._put(self._to_write, _DONE, None)
+            self._writer_thread.join()
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._encoder_pool.shutdown(wait=True)
@@ -0,0 +1,315 @@
+# backend/sharded_video.py
+#
+# Processes a long video as keyframe-aligned segments on a pool of worker
+# processes, then joins the annotated segments and the track logs.
+#
+#   python -m backend.sharded_video recording.mp4 --workers 8
+#   AZURE_ENDPOINT=http://127.0.0.1:8765/ python -m backend.sharded_video recording.mp4 --segment-seconds 60
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from backend.jobs import _init_worker
+from backend.track_log import TrackLog, TRACK_DTYPE
+from backend.tracker import CentroidTracker
+from backend.trajectory_viz import write_trajectory_html, write_trajectory_heatmap
+from backend.video_encoder import OUTPUT_ARGS, OUTPUT_FILTERS
+from utils.metrics import metrics
+from utils.request_dispatcher import DEFAULT_REQUESTS_PER_SECOND
+from utils.workspace import workspaces
+
+# Segments shorter than this aren't worth a worker's start-up cost
+MIN_SEGMENT_SECONDS = 10.0
+# Formats that can be joined by stream copy; gif is transcoded from one of them
+CONCAT_FORMATS = ("mp4", "webm")
+
+
+def split_at_keyframes(video_path, segment_seconds, directory):
+    """
+    Cuts the video stream into pieces of roughly `segment_seconds` with
+    ffmpeg's segment muxer. Stream copy can only cut on keyframes, so every
+    piece starts on one and decodes on its own.
+    Returns: list of (segment path, start seconds)
+    """
+    listing = os.path.join(directory, "segments.csv")
+    subprocess.run([
+        "ffmpeg", "-y", "-loglevel", "error", "-i", video_path,
+        "-map", "0:v:0", "-c", "copy", "-f", "segment",
+        "-segment_time", f"{segment_seconds:.3f}", "-reset_timestamps", "1",
+        "-segment_list", listing, "-segment_list_type", "csv",
+        os.path.join(directory, "segment_%04d.mkv"),
+    ], check=True)
+    with open(listing, "r", newline="") as f:
+        return [(os.path.join(directory, name), float(start)) for name, start, _ in csv.reader(f)]
+
+
+def concat_segments(paths, output_path):
+    """
+    Joins encoded segments with ffmpeg's concat demuxer, without re-encoding.
+    Returns: output_path
+    """
+    listing = output_path + ".txt"
+    with open(listing, "w", encoding="utf-8") as f:
+        for path in paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    command = ["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", listing, "-c", "copy"]
+    if output_path.endswith(".mp4"):
+        command += ["-movflags", "+faststart"]
+    try:
+        subprocess.run(command + [output_path], check=True)
+    finally:
+        os.remove(listing)
+    return output_path
+
+
+def _first_rows(rows, last=False):
+    # Index of each object's first (or last) row; rows are in frame order
+    ids = rows["object_id"][::-1] if last else rows["object_id"]
+    unique, index = np.unique(ids, return_index=True)
+    return unique, (len(rows) - 1 - index if last else index)
+
+
+def stitch_tracks(logs, offsets, frame_size, frame_interval=10, max_distance=50, window=None):
+    """
+    Merges per-segment track logs into one with globally consistent object
+    ids. Frames are shifted by each segment's frame offset. A track that
+    starts within `window` frames of a segment boundary takes over the id of
+    a same-label track that ended within `window` frames before it, if
+    their centroids are within the tracker's distance gate for that gap;
+    pairs are chosen by optimal assignment on centroid distance. Other
+    tracks get new ids.
+
+    Returns: TrackLog
+    """
+    window = window or 2 * frame_interval
+    gate = CentroidTracker(max_distance=max_distance, frame_size=frame_size, reference_gap=frame_interval)
+    labels = []
+    merged = []
+    next_id = 0
+    tails = None  # (global ids, label codes, last frames, centroids) of the previous segment
+
+    for log, offset in zip(logs, offsets):
+        rows = log.rows.copy()
+        if not len(rows):
+            tails = None
+            continue
+        rows["frame"] += offset
+        for label in log.labels:
+            if label not in labels:
+                labels.append(label)
+        codes = np.array([labels.index(label) for label in log.labels], dtype=rows["label"].dtype)
+        rows["label"] = codes[rows["label"]]
+        centroids = np.stack([rows["x"] + rows["w"] // 2, rows["y"] + rows["h"] // 2], axis=1).astype(float)
+
+        local_ids, heads = _first_rows(rows)
+        mapping = {}
+        if tails is not None:
+            head_mask = rows["frame"][heads] <= offset + window
+            tail_ids, tail_codes, tail_frames, tail_centroids = tails
+            tail_mask = tail_frames >= offset - window
+            h_idx, t_idx = np.flatnonzero(head_mask), np.flatnonzero(tail_mask)
+            if len(h_idx) and len(t_idx):
+                h_rows = heads[h_idx]
+                distances = np.linalg.norm(centroids[h_rows][:, None] - tail_centroids[t_idx][None], axis=2)
+                gaps = rows["frame"][h_rows][:, None] - tail_frames[t_idx][None]
+                gates = np.vectorize(gate.gate_distance)(np.maximum(gaps, 1))
+                valid = ((rows["label"][h_rows][:, None] == tail_codes[t_idx][None])
+                         & (gaps > 0) & (distances <= gates))
+                r, c = linear_sum_assignment(np.where(valid, distances, 1e9))
+                for i, j in zip(r, c):
+                    if valid[i, j]:
+                        mapping[int(local_ids[h_idx[i]])] = int(tail_ids[t_idx[j]])
+        for local_id in local_ids.tolist():
+            if local_id not in mapping:
+                mapping[local_id] = next_id
+                next_id += 1
+
+        lookup = np.zeros(int(local_ids.max()) + 1, dtype=rows["object_id"].dtype)
+        lookup[list(mapping)] = list(mapping.values())
+        rows["object_id"] = lookup[rows["object_id"]]
+        merged.append(rows)
+
+        global_ids, lasts = _first_rows(rows, last=True)
+        tails = (global_ids, rows["label"][lasts], rows["frame"][lasts], centroids[lasts])
+
+    rows = np.concatenate(merged) if merged else np.zeros(0, dtype=TRACK_DTYPE)
+    return TrackLog(rows, labels)
+
+
+def _process_segment(segment_path, workspace_name, params):
+    from backend.video_processor import process_video
+
+    metrics.reset()
+    # process_video holds the worker's client to its share of the rate limit
+    workspace = workspaces.workspace(workspace_name)
+    result = process_video(segment_path, workspace=workspace, visualization=None, **params)
+    with open(os.path.join(workspace.path, "timings.json"), "r", encoding="utf-8") as f:
+        timings = json.load(f)
+    return result, timings, metrics.snapshot()
+
+
+def process_video_sharded(video_path, workers=None, segment_seconds=None, frame_interval=10,
+                          requests_per_second=DEFAULT_REQUESTS_PER_SECOND, outputs=("webm",),
+                          workspace=None, progress_callback=None, export_csv=False,
+                          visualization="html", **params):
+    """
+    process_video for long recordings: the video is split at keyframes into
+    segments of about `segment_seconds` (by default enough for one per
+    worker, at least MIN_SEGMENT_SECONDS), each segment is processed by
+    process_video in one of `workers` processes with its own capture,
+    tracker and writer, and the results are joined:
+
+    - the annotated segments are concatenated without re-encoding (a
+      requested gif is transcoded from the joined video);
+    - the segment track logs are stitched into one position log with
+      global object ids (see stitch_tracks). Ids drawn into the video
+      frames stay per segment, as the frames aren't re-encoded.
+
+    `requests_per_second` is the limit for all workers together. Other
+    keyword arguments go to process_video. progress_callback is called as
+    progress_callback(frames_done, total_frames) as segments finish. Needs
+    ffmpeg; without it the video is processed in one piece. The workspace quota
+    is checked as in process_video.
+
+    Returns:
+        (mp4_path, log_path, viz_path, gif_path, webm_path), as process_video
+    """
+    from backend.video_processor import process_video
+
+    workers = workers or int(os.getenv("VISION_SHARD_WORKERS", "0")) or os.cpu_count() or 1
+    cap = cv2.VideoCapture(video_path)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    total_frames = max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+    ret, background = cap.read()
+    cap.release()
+    duration = total_frames / fps
+    segment_seconds = segment_seconds or max(MIN_SEGMENT_SECONDS, duration / workers)
+
+    if workers < 2 or duration <= segment_seconds or not shutil.which("ffmpeg"):
+        return process_video(video_path, frame_interval=frame_interval, requests_per_second=requests_per_second,
+                             outputs=outputs, workspace=workspace, progress_callback=progress_callback,
+                             export_csv=export_csv, visualization=visualization, **params)
+    if visualization not in ("html", "heatmap", None):
+        raise ValueError(f"Unknown visualization: {visualization}")
+
+    workspace = workspace or workspaces.workspace(prefix="video")
+    workspace.check_quota()
+    segment_outputs = tuple(fmt for fmt in CONCAT_FORMATS if fmt in outputs) or ("mp4",)
+    params.update(frame_interval=frame_interval, outputs=segment_outputs,
+                  requests_per_second=requests_per_second / workers if requests_per_second else None)
+
+    with workspace.in_use(), workspaces.temporary(prefix="split") as scratch:
+        started = time.perf_counter()
+        segments = split_at_keyframes(video_path, segment_seconds, scratch.path)
+        split_seconds = time.perf_counter() - started
+        offsets = [int(round(start * fps)) for _, start in segments]
+        lengths = np.diff(offsets + [max(total_frames, offsets[-1])]).tolist()
+
+        shards = [workspaces.workspace(prefix="shard") for _ in segments]
+        for shard in shards:
+            shard.acquire()
+        results = [None] * len(segments)
+        frames_done = 0
+        try:
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=min(workers, len(segments)), mp_context=context,
+                                     initializer=_init_worker, initargs=(workspaces.root,)) as pool:
+                futures = {pool.submit(_process_segment, path, shard.name, params): i
+                           for i, ((path, _), shard) in enumerate(zip(segments, shards))}
+                for future in as_completed(futures):
+                    i = futures[future]
+                    results[i] = future.result()
+                    metrics.merge(results[i][2])
+                    frames_done += lengths[i]
+                    if progress_callback is not None:
+                        progress_callback(frames_done, total_frames)
+
+            started_join = time.perf_counter()
+            annotated = {}
+            for fmt in segment_outputs:
+                parts = [result[0][{"mp4": 0, "webm": 4}[fmt]] for result in results]
+                if all(parts):
+                    annotated[fmt] = concat_segments(parts, os.path.join(workspace.path, f"annotated.{fmt}"))
+            if "gif" in outputs and annotated:
+                gif_path = os.path.join(workspace.path, "annotated.gif")
+                subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-i", next(iter(annotated.values()))]
+                               + OUTPUT_ARGS["gif"]["fast"] + OUTPUT_FILTERS["gif"] + [gif_path], check=True)
+                annotated["gif"] = gif_path
+            workspace.check_quota()
+            join_seconds = time.perf_counter() - started_join
+
+            started_stitch = time.perf_counter()
+            track_log = stitch_tracks([TrackLog.load(result[0][1]) for result in results], offsets,
+                                      (width, height), frame_interval=frame_interval)
+            log_path = track_log.save(os.path.join(workspace.path, "position_log.npz"))
+            stitch_seconds = time.perf_counter() - started_stitch
+        finally:
+            for shard in shards:
+                shard.release()
+                shard.remove()
+
+        viz_started = time.perf_counter()
+        if export_csv:
+            track_log.to_csv(os.path.join(workspace.path, "position_log.csv"))
+            workspace.check_quota()
+        viz_path = None
+        if visualization == "html":
+            viz_path = write_trajectory_html(track_log, os.path.join(workspace.path, "trajectories.html"))
+        elif visualization == "heatmap":
+            viz_path = write_trajectory_heatmap(track_log, os.path.join(workspace.path, "trajectories.png"),
+                                                (width, height), background=background if ret else None)
+        workspace.check_quota()
+
+        total_seconds = time.perf_counter() - started
+        metrics.observe("video_job_seconds", total_seconds)
+        timings = {
+            "total_s": total_seconds,
+            "frames": total_frames,
+            "workers": min(workers, len(segments)),
+            "split_s": split_seconds,
+            "join_s": join_seconds,
+            "stitch_s": stitch_seconds,
+            "viz_s": time.perf_counter() - viz_started,
+            "tracks": len(track_log.object_ids()),
+            "segments": [dict(timing, start_frame=offset) for (_, timing, _), offset in zip(results, offsets)],
+        }
+        with open(os.path.join(workspace.path, "timings.json"), "w", encoding="utf-8") as f:
+            json.dump(timings, f, indent=2)
+        print(f"Processed {len(segments)} segments on {timings['workers']} workers in {total_seconds:.2f}s "
+              f"(split {split_seconds:.2f}s, join {join_seconds:.2f}s, stitch {stitch_seconds:.2f}s)")
+
+    return (annotated.get("mp4"), log_path, viz_path, annotated.get("gif"), annotated.get("webm"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process a long video in parallel segments")
+    parser.add_argument("video")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--segment-seconds", type=float, default=None)
+    parser.add_argument("--frame-interval", type=int, default=10)
+    parser.add_argument("--outputs", default="webm", help="comma-separated: mp4, webm, gif")
+    parser.add_argument("--visualization", default="html", choices=["html", "heatmap", "none"])
+    parser.add_argument("--preset", default="fast", choices=["realtime", "fast", "quality"])
+    args = parser.parse_args()
+
+    paths = process_video_sharded(args.video, workers=args.workers, segment_seconds=args.segment_seconds,
+                                  frame_interval=args.frame_interval, outputs=tuple(args.outputs.split(",")),
+                                  visualization=None if args.visualization == "none" else args.visualization,
+                                  encoder_preset=args.preset)
+    for name, path in zip(("mp4", "log", "viz", "gif", "webm"), paths):
+        if path:
+            print(f"{name:<5} {path}")
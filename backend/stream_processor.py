@@ -0,0 +1,406 @@
+# backend/stream_processor.py
+#
+# Live tracking from an RTSP/HTTP stream, a camera or a file played back at
+# real-time speed.
+#
+#   python -m backend.stream_processor rtsp://camera.local/stream --hls outputs/live
+#   python -m backend.stream_processor 0 --latency-budget 0.5
+#   AZURE_ENDPOINT=http://127.0.0.1:8765/ AZURE_KEY=mock python -m backend.stream_processor recording.mp4 --hls outputs/live
+
+import argparse
+import asyncio
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+
+import cv2
+import numpy as np
+
+from backend.detectors import get_detector, Detector
+from backend.track_log import TrackLogWriter
+from backend.tracker import CentroidTracker
+from backend.video_encoder import open_video_writer
+from backend.video_processor import detections_from_objects, record_tracks, draw_tracks
+from utils.media_utils import (encode_for_inference, rescale_objects,
+                               DEFAULT_INFERENCE_MAX_EDGE, DEFAULT_JPEG_QUALITY)
+from utils.azure_client import azure_client
+from utils.metrics import metrics
+from utils.request_dispatcher import OrderedDispatcher, DEFAULT_REQUESTS_PER_SECOND
+
+# Smoothing factor of the mean lag
+LAG_SMOOTHING = 0.1
+
+
+@dataclass
+class StreamUpdate:
+    """
+    Tracking result for one analyzed frame. `lag` is the time from the frame
+    being captured to this update being produced, in seconds.
+    """
+    frame_id: int
+    captured_at: float  # time.monotonic() when the frame was read
+    lag: float
+    tracked: dict = field(default_factory=dict)  # object_id -> {"label", "bbox", "centroid", "confidence"}
+    frame: np.ndarray = None  # the frame as captured (BGR)
+    error: Exception = None
+
+
+class StreamStats:
+    """
+    Thread-safe counters for a running stream.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self.frames_captured = 0
+        self.frames_analyzed = 0
+        self.frames_dropped = 0  # replaced by a newer frame before analysis
+        self.frames_stale = 0  # older than the latency budget when picked up
+        self.frames_written = 0
+        self.output_dropped = 0  # skipped because the output encoder fell behind
+        self.errors = 0
+        self.reconnects = 0
+        self.lag = 0.0
+        self.mean_lag = 0.0
+
+    def add(self, name, value=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    def record_lag(self, lag):
+        with self._lock:
+            self.lag = lag
+            self.mean_lag = lag if not self.frames_analyzed else (
+                self.mean_lag + LAG_SMOOTHING * (lag - self.mean_lag))
+            self.frames_analyzed += 1
+
+    def report(self):
+        """
+        Returns: dict of the counters plus "lag_s" (latest), "mean_lag_s",
+        "drop_rate" (share of captured frames never analyzed) and the
+        capture and analysis rates in frames per second.
+        """
+        with self._lock:
+            elapsed = max(1e-9, time.monotonic() - self._started)
+            return {
+                "frames_captured": self.frames_captured,
+                "frames_analyzed": self.frames_analyzed,
+                "frames_dropped": self.frames_dropped,
+                "frames_stale": self.frames_stale,
+                "frames_written": self.frames_written,
+                "output_dropped": self.output_dropped,
+                "errors": self.errors,
+                "reconnects": self.reconnects,
+                "lag_s": self.lag,
+                "mean_lag_s": self.mean_lag,
+                "drop_rate": ((self.frames_dropped + self.frames_stale) / self.frames_captured
+                              if self.frames_captured else 0.0),
+                "capture_fps": self.frames_captured / elapsed,
+                "analysis_fps": self.frames_analyzed / elapsed,
+            }
+
+    def summary(self):
+        report = self.report()
+        return (f"Stream: {report['frames_captured']} frames captured, {report['frames_analyzed']} analyzed "
+                f"({report['drop_rate']:.0%} dropped), lag {report['lag_s'] * 1000:.0f} ms "
+                f"(mean {report['mean_lag_s'] * 1000:.0f} ms), {report['errors']} errors")
+
+
+def _parse_source(source):
+    """Device indices may be given as strings, e.g. from the command line."""
+    if isinstance(source, str) and source.isdigit():
+        return int(source)
+    return source
+
+
+class StreamProcessor:
+    """
+    Tracks objects in a live source and yields a StreamUpdate for every
+    analyzed frame as soon as it is ready.
+
+    A capture thread reads the source continuously and keeps only the newest
+    frame, so frames the detector can't keep up with are dropped rather than
+    queued. Up to `max_in_flight` frames are analyzed at a time, each one
+    the newest frame when a slot frees up; frames that are already older
+    than `latency_budget` seconds when picked up are dropped as stale.
+    Updates come out in capture order. While iterating, calls that reach
+    Azure are held to `requests_per_second` (see AzureClient.rate_limited).
+
+    source: anything cv2.VideoCapture opens (an RTSP/HTTP URL, a device
+    index, a file). Files are paced to real time unless `realtime` is False.
+    Live sources are reopened up to `max_reconnects` times if reads fail.
+
+    hls_path: if set, every captured frame is drawn with the latest tracks
+    and pushed to a rolling HLS playlist at that path (.m3u8) through
+    ffmpeg. log_path: if set, tracks are written to a track log there when
+    the stream ends (see backend.track_log).
+
+    Iterate it directly, or with `async for`. `stats` holds the current
+    lag and drop counts; stop() ends the stream from another thread. If the
+    HLS output fails (e.g. ffmpeg exits), it is counted in `stats.errors`
+    and iteration raises the error, ending the stream.
+    """
+
+    def __init__(self, source, detector=None, latency_budget=1.0, max_in_flight=2,
+                 requests_per_second=DEFAULT_REQUESTS_PER_SECOND, realtime=None, motion_model="kalman",
+                 inference_max_edge=DEFAULT_INFERENCE_MAX_EDGE, jpeg_quality=DEFAULT_JPEG_QUALITY,
+                 hls_path=None, log_path=None, encoder_preset="realtime", max_reconnects=5,
+                 reconnect_delay=2.0):
+        self.source = _parse_source(source)
+        self.detector = get_detector(detector) if detector is None or isinstance(detector, str) else detector
+        if isinstance(self.detector, Detector):
+            self.detector = self.detector.for_job()
+        self.latency_budget = latency_budget
+        self.live = not (isinstance(self.source, str) and os.path.isfile(self.source))
+        self.realtime = not self.live if realtime is None else realtime
+        self.inference_max_edge = inference_max_edge
+        self.jpeg_quality = jpeg_quality
+        self.hls_path = hls_path
+        self.log_path = log_path
+        self.encoder_preset = encoder_preset
+        self.max_reconnects = max_reconnects
+        self.reconnect_delay = reconnect_delay
+        self.stats = StreamStats()
+
+        self.cap = self._open()
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 25.0
+        # Tracker gates are scaled for the frame gap expected at the request rate
+        self.tracker = CentroidTracker(max_distance=50, motion_model=motion_model,
+                                       frame_size=(self.width, self.height),
+                                       reference_gap=max(1, round(self.fps / requests_per_second))
+                                       if requests_per_second else 1)
+
+        self.requests_per_second = requests_per_second
+        # Azure calls are rate-limited by the shared client while iterating
+        self._dispatcher = OrderedDispatcher(max_in_flight=max_in_flight, requests_per_second=None)
+
+        self._latest = None  # (frame_id, captured_at, frame) not yet picked up
+        self._latest_ready = threading.Condition()
+        self._ended = threading.Event()
+        self._stop = threading.Event()
+        self._overlay = ({}, {}, {})  # (tracked, trails, colors) drawn on output frames
+        self._output_frames = queue.Queue(maxsize=int(self.fps) or 25)
+        self._output_error = None  # set if the HLS output fails; raised by the iterator
+        self._threads = []
+
+    def _open(self):
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            raise ValueError(f"Could not open video source: {self.source}")
+        # Keep the driver's own buffer short so reads return recent frames
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+    def _reconnect(self):
+        for attempt in range(self.max_reconnects):
+            if self._stop.wait(self.reconnect_delay):
+                return False
+            try:
+                self.cap.release()
+                self.cap = self._open()
+                self.stats.add("reconnects")
+                print(f"Reconnected to {self.source}")
+                return True
+            except ValueError:
+                print(f"Reconnect {attempt + 1}/{self.max_reconnects} to {self.source} failed")
+        return False
+
+    def _capture(self):
+        frame_id = 0
+        started = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                if self.realtime:
+                    delay = started + frame_id / self.fps - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                ret, frame = self.cap.read()
+                if not ret:
+                    if not self.live or not self._reconnect():
+                        break
+                    continue
+
+                frame_id += 1
+                captured_at = time.monotonic()
+                self.stats.add("frames_captured")
+                with self._latest_ready:
+                    if self._latest is not None:
+                        self.stats.add("frames_dropped")
+                        metrics.counter("stream_frames_dropped_total", reason="superseded")
+                    self._latest = (frame_id, captured_at, frame)
+                    self._latest_ready.notify()
+
+                if self.hls_path and self._output_error is None:
+                    try:
+                        self._output_frames.put_nowait(frame)
+                    except queue.Full:
+                        self.stats.add("output_dropped")
+        finally:
+            self._ended.set()
+            with self._latest_ready:
+                self._latest_ready.notify_all()
+            self._output_frames.put(None)
+
+    def _write_output(self):
+        writer = None
+        ended = False
+        try:
+            writer = open_video_writer({"hls": self.hls_path}, self.width, self.height, self.fps,
+                                       preset=self.encoder_preset)
+            while True:
+                frame = self._output_frames.get()
+                if frame is None:
+                    ended = True
+                    break
+                frame = frame.copy()
+                draw_tracks(frame, *self._overlay)
+                writer.write(frame)
+                self.stats.add("frames_written")
+            writer.release()
+        except Exception as e:
+            print(f"Stream output to {self.hls_path} failed: {e}")
+            self.stats.add("errors")
+            self._output_error = e
+            if writer is not None:
+                try:
+                    writer.release()
+                except Exception:
+                    pass  # already reported
+            # Keep taking frames so the capture thread never blocks on a full queue
+            while not ended and self._output_frames.get() is not None:
+                pass
+
+    def _frames(self):
+        """
+        Yields ((frame_id, captured_at, frame), jpeg_bytes) for the newest
+        frame whenever the dispatcher has room, skipping stale ones.
+        """
+        while not self._stop.is_set():
+            with self._latest_ready:
+                while self._latest is None and not self._ended.is_set() and not self._stop.is_set():
+                    self._latest_ready.wait(0.1)
+                item, self._latest = self._latest, None
+            if item is None:
+                return
+            frame_id, captured_at, frame = item
+            if time.monotonic() - captured_at > self.latency_budget:
+                self.stats.add("frames_stale")
+                metrics.counter("stream_frames_dropped_total", reason="stale")
+                continue
+            jpeg, scale = encode_for_inference(frame, self.inference_max_edge, self.jpeg_quality)
+            yield (item, scale), jpeg
+
+    def start(self):
+        if self._threads:
+            return self
+        self._threads = [threading.Thread(target=self._capture, daemon=True)]
+        if self.hls_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.hls_path)), exist_ok=True)
+            self._threads.append(threading.Thread(target=self._write_output, daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        """Stops capturing; iteration ends once in-flight frames are done."""
+        self._stop.set()
+
+    def close(self):
+        self.stop()
+        for thread in self._threads:
+            thread.join()
+        self.cap.release()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        self.start()
+        trails = {}
+        colors = {}
+        last_frame = 0
+        log_writer = TrackLogWriter(self.log_path) if self.log_path else None
+        try:
+            with azure_client.rate_limited(self.requests_per_second):
+                for ((frame_id, captured_at, frame), scale), objects, error in self._dispatcher.map(
+                        self.detector, self._frames()):
+                    tracked = {}
+                    if error is not None:
+                        self.stats.add("errors")
+                    else:
+                        detections = detections_from_objects(rescale_objects(objects, scale))
+                        tracked = self.tracker.update(detections, frame_gap=frame_id - last_frame)
+                        last_frame = frame_id
+
+                        record_tracks(tracked, trails, colors)
+                        if log_writer is not None:
+                            for object_id, info in tracked.items():
+                                log_writer.add(frame_id, object_id, info["label"], info["bbox"],
+                                               info.get("confidence"))
+                        # The output thread draws a copy, as the trails keep changing here
+                        tags = [f"{info['label']}_{object_id}" for object_id, info in tracked.items()]
+                        self._overlay = (tracked, {tag: list(trails[tag]) for tag in tags},
+                                         {tag: colors[tag] for tag in tags})
+
+                    if self._output_error is not None:
+                        raise self._output_error
+
+                    lag = time.monotonic() - captured_at
+                    self.stats.record_lag(lag)
+                    metrics.observe("stream_lag_seconds", lag)
+                    yield StreamUpdate(frame_id, captured_at, lag, tracked, frame, error)
+                if self._output_error is not None:
+                    raise self._output_error
+        finally:
+            self.stop()
+            if log_writer is not None:
+                log_writer.close()
+
+    async def __aiter__(self):
+        loop = asyncio.get_running_loop()
+        updates = iter(self)
+        try:
+            while True:
+                update = await loop.run_in_executor(None, next, updates, None)
+                if update is None:
+                    break
+                yield update
+        finally:
+            self.stop()
+            await loop.run_in_executor(None, updates.close)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Track objects in a live stream")
+    parser.add_argument("source", help="RTSP/HTTP URL, camera index or video file")
+    parser.add_argument("--latency-budget", type=float, default=1.0)
+    parser.add_argument("--max-in-flight", type=int, default=2)
+    parser.add_argument("--hls", help="directory for a rolling HLS playlist (index.m3u8)")
+    parser.add_argument("--log", help="write the track log here when the stream ends")
+    parser.add_argument("--detector", default=None)
+    parser.add_argument("--stats-interval", type=float, default=5.0)
+    args = parser.parse_args()
+
+    processor = StreamProcessor(args.source, detector=args.detector, latency_budget=args.latency_budget,
+                                max_in_flight=args.max_in_flight, log_path=args.log,
+                                hls_path=os.path.join(args.hls, "index.m3u8") if args.hls else None)
+    last_report = time.monotonic()
+    try:
+        with processor:
+            for update in processor:
+                labels = ", ".join(f"{info['label']}_{object_id}" for object_id, info in update.tracked.items())
+                print(f"frame {update.frame_id:>6}  lag {update.lag * 1000:5.0f} ms  {labels}")
+                if time.monotonic() - last_report >= args.stats_interval:
+                    print(processor.stats.summary())
+                    last_report = time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    print(processor.stats.summary())
@@ -2,24 +2,11 @@
 
 import cv2
 import numpy as np
-import time
-from io import BytesIO
 from PIL import Image
 from difflib import get_close_matches
-from azure.cognitiveservices.vision.computervision import ComputerVisionClient
-from msrest.authentication import CognitiveServicesCredentials
-import os
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-AZURE_ENDPOINT = "https://4382-computer-vision.cognitiveservices.azure.com/"
-AZURE_KEY = "CkVzy8Fy4OhsyBt6SAEUl8DuAE8kSZqL6PQtOM6D6VPL6hZigttFJQQJ99BDACYeBjFXJ3w3AAAFACOGXp9x"
-
-# Azure client
-computervision_client = ComputerVisionClient(
-    AZURE_ENDPOINT, CognitiveServicesCredentials(AZURE_KEY)
-)
+from utils.azure_api import ocr_manager
+from utils.ocr_jobs import OCRResult
+from utils.metrics import metrics
 
 
 def preprocess_image(image_bytes):
@@ -31,29 +18,25 @@ def preprocess_image(image_bytes):
     return encoded_img.tobytes()
 
 
-def extract_text(image_bytes):
+def run_ocr(image_bytes):
+    """
+    Submits one Read job for the preprocessed image and waits for it.
+    Returns: OCRResult whose lines carry both text and polygons, so one job
+    serves extract_text and visualize_ocr_on_image.
+    """
     preprocessed_bytes = preprocess_image(image_bytes)
 
     try:
-        poller = computervision_client.read_in_stream(image=BytesIO(preprocessed_bytes), raw=True)
-        operation_id = poller.headers["Operation-Location"].split("/")[-1]
+        return ocr_manager.read(preprocessed_bytes)
     except Exception as e:
+        metrics.counter("api_errors_total", call="read")
         print("Azure OCR request failed:", e)
-        return []
-
-    for _ in range(10):
-        result = computervision_client.get_read_result(operation_id)
-        if result.status.lower() in ['succeeded', 'failed']:
-            break
-        time.sleep(1)
+        return OCRResult(status="failed")
 
-    lines = []
-    if result.status.lower() == 'succeeded':
-        for page in result.analyze_result.read_results:
-            for line in page.lines:
-                lines.append(line.text)
 
-    return lines
+def extract_text(image_bytes, ocr_result=None):
+    result = ocr_result or run_ocr(image_bytes)
+    return result.texts()
 
 
 def correct_ocr_text(lines, vocabulary, threshold=0.8):
@@ -64,34 +47,21 @@ def correct_ocr_text(lines, vocabulary, threshold=0.8):
     return corrected
 
 
-def visualize_ocr_on_image(image_bytes):
-    preprocessed_bytes = preprocess_image(image_bytes)
-
-    try:
-        poller = computervision_client.read_in_stream(image=BytesIO(preprocessed_bytes), raw=True)
-        operation_id = poller.headers["Operation-Location"].split("/")[-1]
-    except Exception as e:
-        print("Azure OCR request failed:", e)
+def visualize_ocr_on_image(image_bytes, ocr_result=None):
+    result = ocr_result or run_ocr(image_bytes)
+    if not result.succeeded:
         return None
 
-    for _ in range(10):
-        result = computervision_client.get_read_result(operation_id)
-        if result.status.lower() in ['succeeded', 'failed']:
-            break
-        time.sleep(1)
-
     np_img = np.asarray(bytearray(image_bytes), dtype=np.uint8)
     img = cv2.imdecode(np_img, cv2.IMREAD_COLOR)
 
-    if result.status.lower() == 'succeeded':
-        for page in result.analyze_result.read_results:
-            for line in page.lines:
-                points = line.bounding_box
-                pts = np.array([[int(points[i]), int(points[i + 1])] for i in range(0, len(points), 2)], np.int32)
-                pts = pts.reshape((-1, 1, 2))
-                cv2.polylines(img, [pts], isClosed=True, color=(0, 255, 0), thickness=2)
-                x, y = pts[0][0]
-                cv2.putText(img, line.text, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (36, 255, 12), 2)
+    if result.lines:
+        for line in result.lines:
+            pts = np.array(line.polygon, np.int32)
+            pts = pts.reshape((-1, 1, 2))
+            cv2.polylines(img, [pts], isClosed=True, color=(0, 255, 0), thickness=2)
+            x, y = pts[0][0]
+            cv2.putText(img, line.text, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (36, 255, 12), 2)
         return Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
 
     print("OCR completed but returned no readable content.")
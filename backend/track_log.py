@@ -0,0 +1,172 @@
+# backend/track_log.py
+
+import csv
+import io
+import os
+
+import numpy as np
+
+# One row per tracked object per analyzed frame. Labels are stored once in a
+# side table and referenced by code.
+TRACK_DTYPE = np.dtype([
+    ("frame", "<i4"),
+    ("object_id", "<i4"),
+    ("label", "<i2"),
+    ("x", "<i4"),
+    ("y", "<i4"),
+    ("w", "<i4"),
+    ("h", "<i4"),
+    ("confidence", "<f4"),  # NaN when the detector didn't report one
+])
+
+CSV_COLUMNS = ["frame", "object_id", "label", "x", "y", "w", "h", "confidence"]
+
+
+class TrackLogWriter:
+    """
+    Appends track rows to a compressed .npz log.
+
+    Rows are buffered `chunk_rows` at a time and flushed to a raw spool file
+    next to `path`, so memory stays flat during the video; close() packs the
+    spool into the final file.
+    """
+
+    def __init__(self, path, chunk_rows=4096):
+        self.path = path
+        self.rows = 0
+        self._spool_path = path + ".rows"
+        self._spool = open(self._spool_path, "wb")
+        self._buffer = np.empty(chunk_rows, dtype=TRACK_DTYPE)
+        self._buffered = 0
+        self._labels = []
+        self._codes = {}
+
+    def _code(self, label):
+        code = self._codes.get(label)
+        if code is None:
+            code = self._codes[label] = len(self._labels)
+            self._labels.append(label)
+        return code
+
+    def add(self, frame, object_id, label, bbox, confidence=None):
+        x, y, w, h = bbox
+        self._buffer[self._buffered] = (frame, object_id, self._code(label), x, y, w, h,
+                                        np.nan if confidence is None else confidence)
+        self._buffered += 1
+        self.rows += 1
+        if self._buffered == len(self._buffer):
+            self._flush()
+
+    def _flush(self):
+        self._buffer[:self._buffered].tofile(self._spool)
+        self._buffered = 0
+
+    def close(self):
+        if self._spool.closed:
+            return
+        self._flush()
+        self._spool.close()
+        rows = np.fromfile(self._spool_path, dtype=TRACK_DTYPE)
+        np.savez_compressed(self.path, rows=rows, labels=np.array(self._labels, dtype=str))
+        os.remove(self._spool_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TrackLog:
+    """
+    Read-only view over a track log. Queries return new TrackLog views and
+    can be chained, e.g. log.by_label("person").by_frames(100, 200).
+    """
+
+    def __init__(self, rows, labels):
+        self.rows = rows
+        self.labels = list(labels)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["rows"], data["labels"].tolist())
+
+    def save(self, path):
+        np.savez_compressed(path, rows=self.rows, labels=np.array(self.labels, dtype=str))
+        return path
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _view(self, mask):
+        return TrackLog(self.rows[mask], self.labels)
+
+    def label_of(self, code):
+        return self.labels[code]
+
+    def by_label(self, label):
+        if label not in self.labels:
+            return self._view(np.zeros(len(self.rows), dtype=bool))
+        return self._view(self.rows["label"] == self.labels.index(label))
+
+    def by_frames(self, start=None, stop=None):
+        """Rows with start <= frame < stop; rows are in frame order."""
+        frames = self.rows["frame"]
+        lo = 0 if start is None else np.searchsorted(frames, start, side="left")
+        hi = len(frames) if stop is None else np.searchsorted(frames, stop, side="left")
+        return TrackLog(self.rows[lo:hi], self.labels)
+
+    def by_id(self, object_id):
+        return self._view(self.rows["object_id"] == object_id)
+
+    def object_ids(self):
+        return np.unique(self.rows["object_id"]).tolist()
+
+    def centroids(self):
+        """
+        Returns: (N, 2) int array of box centres, matching the tracker's.
+        """
+        return np.stack([self.rows["x"] + self.rows["w"] // 2,
+                         self.rows["y"] + self.rows["h"] // 2], axis=1)
+
+    def trajectories(self):
+        """
+        Returns:
+            dict of (label, object_id) -> (frames, centroids) arrays, in
+            order of each track's first appearance.
+        """
+        if not len(self.rows):
+            return {}
+        ids = self.rows["object_id"]
+        order = np.argsort(ids, kind="stable")
+        sorted_ids = ids[order]
+        starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+        centroids = self.centroids()
+
+        tracks = []
+        for start, stop in zip(starts, np.r_[starts[1:], len(order)]):
+            rows = order[start:stop]
+            first = rows[0]
+            key = (self.labels[self.rows["label"][first]], int(sorted_ids[start]))
+            tracks.append((first, key, (self.rows["frame"][rows], centroids[rows])))
+        return {key: value for _, key, value in sorted(tracks, key=lambda t: t[0])}
+
+    def to_csv(self, path=None):
+        """
+        Writes the rows as CSV to `path`, or returns the CSV text if no path
+        is given.
+        """
+        out = open(path, "w", newline="") if path else io.StringIO()
+        try:
+            writer = csv.writer(out)
+            writer.writerow(CSV_COLUMNS)
+            labels = np.array(self.labels, dtype=object)
+            for row, label in zip(self.rows.tolist(), labels[self.rows["label"]] if len(self.rows) else []):
+                frame, object_id, _, x, y, w, h, confidence = row
+                writer.writerow([frame, object_id, label, x, y, w, h,
+                                 "" if confidence != confidence else round(confidence, 4)])
+            if path is None:
+                return out.getvalue()
+        finally:
+            out.close()
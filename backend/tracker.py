@@ -1,76 +1,240 @@
 
 import numpy as np
+from scipy.optimize import linear_sum_assignment
 from scipy.spatial import distance
+from backend.kalman import BatchKalmanFilter
+
+# Cost given to pairs that fail a gate, so the solver never prefers them
+_INVALID = 1e9
+
+# max_distance is expressed at this frame diagonal (640x480) when frame_size is set
+REFERENCE_DIAGONAL = 800.0
+
+# Squared Mahalanobis gate for Kalman tracks: 99% of a 2-D Gaussian
+MAHALANOBIS_GATE = 9.21
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """
+    boxes_a: (N, 4), boxes_b: (M, 4) arrays of (x, y, w, h)
+    Returns: (N, M) array of intersection-over-union values
+    """
+    ax0, ay0 = boxes_a[:, 0:1], boxes_a[:, 1:2]
+    ax1, ay1 = ax0 + boxes_a[:, 2:3], ay0 + boxes_a[:, 3:4]
+    bx0, by0 = boxes_b[:, 0], boxes_b[:, 1]
+    bx1, by1 = bx0 + boxes_b[:, 2], by0 + boxes_b[:, 3]
+
+    inter_w = np.clip(np.minimum(ax1, bx1) - np.maximum(ax0, bx0), 0, None)
+    inter_h = np.clip(np.minimum(ay1, by1) - np.maximum(ay0, by0), 0, None)
+    inter = inter_w * inter_h
+    union = (boxes_a[:, 2:3] * boxes_a[:, 3:4]) + (boxes_b[:, 2] * boxes_b[:, 3]) - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
 
 class CentroidTracker:
-    def __init__(self, max_distance=50):
+    """
+    Multi-object tracker with optimal (Hungarian) assignment.
+
+    Track state lives in NumPy arrays. A detection can only be matched to a
+    track whose centroid is closer than `max_distance`, whose box overlaps it
+    by at least `min_iou`, and, with `match_labels`, that has the same label.
+    Tracks that go unmatched for more than `max_disappeared` updates are
+    retired.
+
+    With motion_model="kalman", every track carries a constant-velocity
+    Kalman filter and detections are matched against predicted positions. A
+    detection also passes the distance gate if it lies within the track's
+    predicted uncertainty (squared Mahalanobis distance under
+    MAHALANOBIS_GATE), so young tracks without a velocity estimate yet can
+    still follow fast objects.
+    The distance gate scales with the frame diagonal when `frame_size` is
+    given, and with the frames elapsed since the previous update relative to
+    `reference_gap` (linearly without a motion model, by the square root
+    with one).
+    """
+
+    def __init__(self, max_distance=50, max_disappeared=10, min_iou=0.0, match_labels=True,
+                 motion_model=None, frame_size=None, reference_gap=1):
+        if motion_model not in (None, "kalman"):
+            raise ValueError(f"Unknown motion model: {motion_model}")
         self.next_object_id = 0
-        self.objects = {}  # object_id -> centroid
-        self.labels = {}   # object_id -> label
         self.max_distance = max_distance
+        self.max_disappeared = max_disappeared
+        self.min_iou = min_iou
+        self.match_labels = match_labels
+        self.frame_size = frame_size
+        self.reference_gap = reference_gap
+        self.kalman = BatchKalmanFilter() if motion_model == "kalman" else None
+        self._gate = max_distance
+
+        self._label_codes = {}  # label -> int code
+        self._label_names = []  # int code -> label
+        self._ids = np.empty(0, dtype=np.int64)
+        self._boxes = np.empty((0, 4), dtype=np.float64)  # x, y, w, h
+        self._codes = np.empty(0, dtype=np.int64)
+        self._disappeared = np.empty(0, dtype=np.int64)
+
+    @property
+    def objects(self):
+        """object_id -> centroid of every live track"""
+        centroids = self._centroids(self._boxes).astype(int)
+        return {int(i): (int(cx), int(cy)) for i, (cx, cy) in zip(self._ids, centroids)}
+
+    @property
+    def labels(self):
+        """object_id -> label of every live track"""
+        return {int(i): self._label_names[c] for i, c in zip(self._ids, self._codes)}
+
+    def __len__(self):
+        return len(self._ids)
+
+    @staticmethod
+    def _centroids(boxes):
+        return boxes[:, :2] + boxes[:, 2:] // 2
+
+    def _encode_label(self, label):
+        code = self._label_codes.get(label)
+        if code is None:
+            code = len(self._label_names)
+            self._label_codes[label] = code
+            self._label_names.append(label)
+        return code
+
+    def gate_distance(self, frame_gap=None):
+        """Centroid distance gate in pixels for an update `frame_gap` frames after the last one."""
+        gate = self.max_distance
+        if self.frame_size:
+            gate *= np.hypot(*self.frame_size) / REFERENCE_DIAGONAL
+        if frame_gap:
+            ratio = frame_gap / self.reference_gap
+            gate *= np.sqrt(ratio) if self.kalman is not None else ratio
+        return gate
+
+    def _track_boxes(self):
+        """Boxes the detections are matched against: last seen, or predicted."""
+        if self.kalman is None:
+            return self._boxes
+        boxes = self._boxes.copy()
+        boxes[:, :2] = self.kalman.x[:, :2] - boxes[:, 2:] // 2
+        return boxes
 
-    def update(self, detections):
+    def predict(self, frames_ahead):
         """
-        detections: list of dicts with keys 'label' and 'bbox' (x, y, w, h)
+        Returns: dict of object_id -> {"label", "bbox", "centroid"} with every
+        live track moved `frames_ahead` frames past the last update. Without
+        a motion model the last seen boxes are returned. State is unchanged.
+        """
+        boxes = self._boxes.copy()
+        if self.kalman is not None:
+            boxes[:, :2] = self.kalman.predicted(frames_ahead) - boxes[:, 2:] // 2
+        predicted = {}
+        for object_id, code, (x, y, w, h) in zip(self._ids, self._codes, boxes.astype(int)):
+            predicted[int(object_id)] = {
+                "label": self._label_names[code],
+                "bbox": (int(x), int(y), int(w), int(h)),
+                "centroid": (int(x + w // 2), int(y + h // 2))
+            }
+        return predicted
+
+    def _match(self, det_boxes, det_codes):
+        """
+        Returns: (track_rows, det_cols) arrays of accepted matches
+        """
+        track_boxes = self._track_boxes()
+        if self.match_labels:
+            groups = [(np.flatnonzero(self._codes == code), np.flatnonzero(det_codes == code))
+                      for code in np.intersect1d(self._codes, det_codes)]
+        else:
+            groups = [(np.arange(len(self._ids)), np.arange(len(det_boxes)))]
+
+        matched_rows, matched_cols = [], []
+        for rows, cols in groups:
+            cost = distance.cdist(self._centroids(track_boxes[rows]), self._centroids(det_boxes[cols]))
+            valid = cost < self._gate
+            if self.kalman is not None:
+                # Only tracks whose uncertainty reaches past the distance gate can add matches
+                S = self.kalman.innovation_covariance(rows)
+                wide = MAHALANOBIS_GATE * np.trace(S, axis1=1, axis2=2) > self._gate ** 2
+                if wide.any():
+                    valid[wide] |= self.kalman.mahalanobis(
+                        rows[wide], self._centroids(det_boxes[cols])) < MAHALANOBIS_GATE
+            if self.min_iou > 0:
+                valid &= iou_matrix(track_boxes[rows], det_boxes[cols]) >= self.min_iou
+            if not valid.any():
+                continue
+
+            r, c = linear_sum_assignment(np.where(valid, cost, _INVALID))
+            keep = valid[r, c]
+            matched_rows.append(rows[r[keep]])
+            matched_cols.append(cols[c[keep]])
+
+        if not matched_rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(matched_rows), np.concatenate(matched_cols)
+
+    def _age(self, unmatched_mask):
+        self._disappeared[unmatched_mask] += 1
+        alive = self._disappeared <= self.max_disappeared
+        if not alive.all():
+            self._ids = self._ids[alive]
+            self._boxes = self._boxes[alive]
+            self._codes = self._codes[alive]
+            self._disappeared = self._disappeared[alive]
+            if self.kalman is not None:
+                self.kalman.keep(alive)
+        return alive
+
+    def update(self, detections, frame_gap=None):
+        """
+        detections: list of dicts with keys 'label', 'x', 'y', 'w' and 'h',
+            plus an optional 'confidence' that is passed through
+        frame_gap: frames elapsed since the previous update, if known
         Returns: dict of object_id -> updated bounding box and label
         """
+        self._gate = self.gate_distance(frame_gap)
+        if self.kalman is not None:
+            self.kalman.predict(frame_gap or self.reference_gap)
+
         if not detections:
+            self._age(np.ones(len(self._ids), dtype=bool))
             return {}
 
-        input_centroids = []
-        input_labels = []
-        bboxes = []
+        det_boxes = np.array([(d["x"], d["y"], d["w"], d["h"]) for d in detections], dtype=np.float64)
+        det_codes = np.array([self._encode_label(d["label"]) for d in detections], dtype=np.int64)
 
-        for det in detections:
-            x, y, w, h = det["x"], det["y"], det["w"], det["h"]
-            cx, cy = x + w // 2, y + h // 2
-            input_centroids.append((cx, cy))
-            input_labels.append(det["label"])
-            bboxes.append((x, y, w, h))
-
-        if not self.objects:
-            for i, (centroid, label) in enumerate(zip(input_centroids, input_labels)):
-                self.objects[self.next_object_id] = centroid
-                self.labels[self.next_object_id] = label
-                self.next_object_id += 1
-        else:
-            object_ids = list(self.objects.keys())
-            object_centroids = list(self.objects.values())
-
-            D = distance.cdist(np.array(object_centroids), np.array(input_centroids))
-            rows = D.min(axis=1).argsort()
-            cols = D.argmin(axis=1)[rows]
-
-            used_rows = set()
-            used_cols = set()
-
-            for row, col in zip(rows, cols):
-                if row in used_rows or col in used_cols:
-                    continue
-
-                if D[row, col] < self.max_distance:
-                    object_id = object_ids[row]
-                    self.objects[object_id] = input_centroids[col]
-                    self.labels[object_id] = input_labels[col]
-                    used_rows.add(row)
-                    used_cols.add(col)
-
-            # Add unmatched new detections
-            for i in range(len(input_centroids)):
-                if i not in used_cols:
-                    self.objects[self.next_object_id] = input_centroids[i]
-                    self.labels[self.next_object_id] = input_labels[i]
-                    self.next_object_id += 1
+        rows, cols = self._match(det_boxes, det_codes) if len(self._ids) else (
+            np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+
+        # Matched tracks take the new box; the rest age and may be retired
+        self._boxes[rows] = det_boxes[cols]
+        self._codes[rows] = det_codes[cols]
+        self._disappeared[rows] = 0
+        if self.kalman is not None:
+            self.kalman.correct(rows, self._centroids(det_boxes[cols]))
+        matched_ids = self._ids[rows]
+        unmatched = np.ones(len(self._ids), dtype=bool)
+        unmatched[rows] = False
+        self._age(unmatched)
+
+        # Unmatched detections start new tracks
+        new_cols = np.setdiff1d(np.arange(len(detections)), cols)
+        new_ids = np.arange(self.next_object_id, self.next_object_id + len(new_cols), dtype=np.int64)
+        self.next_object_id += len(new_cols)
+        self._ids = np.concatenate([self._ids, new_ids])
+        self._boxes = np.concatenate([self._boxes, det_boxes[new_cols]])
+        self._codes = np.concatenate([self._codes, det_codes[new_cols]])
+        self._disappeared = np.concatenate([self._disappeared, np.zeros(len(new_cols), dtype=np.int64)])
+        if self.kalman is not None:
+            self.kalman.add(self._centroids(det_boxes[new_cols]))
 
         tracked = {}
-        for object_id, centroid in self.objects.items():
-            label = self.labels[object_id]
-            for i, c in enumerate(input_centroids):
-                if centroid == c:
-                    x, y, w, h = bboxes[i]
-                    tracked[object_id] = {
-                        "label": label,
-                        "bbox": (x, y, w, h),
-                        "centroid": centroid
-                    }
+        for object_id, col in zip(np.concatenate([matched_ids, new_ids]), np.concatenate([cols, new_cols])):
+            det = detections[col]
+            x, y, w, h = det["x"], det["y"], det["w"], det["h"]
+            tracked[int(object_id)] = {
+                "label": det["label"],
+                "bbox": (x, y, w, h),
+                "centroid": (x + w // 2, y + h // 2),
+                "confidence": det.get("confidence")
+            }
         return tracked
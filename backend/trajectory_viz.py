@@ -0,0 +1,169 @@
+# backend/trajectory_viz.py
+
+import heapq
+
+import cv2
+import numpy as np
+import plotly.graph_objects as go
+
+# Points drawn across all trajectories; longer tracks are simplified to fit
+DEFAULT_POINT_BUDGET = 20000
+MIN_POINTS_PER_TRACK = 8
+
+
+def _farthest(points, start, end):
+    """
+    Returns: (distance, index) of the point between start and end farthest
+    from the chord joining them.
+    """
+    segment = points[end] - points[start]
+    inner = points[start + 1:end] - points[start]
+    length = np.hypot(*segment)
+    if length == 0:
+        distances = np.hypot(inner[:, 0], inner[:, 1])
+    else:
+        distances = np.abs(segment[0] * inner[:, 1] - segment[1] * inner[:, 0]) / length
+    index = int(np.argmax(distances))
+    return distances[index], start + 1 + index
+
+
+def simplify(points, max_points):
+    """
+    Ramer-Douglas-Peucker simplification to a point budget: segments are
+    split at their farthest point in order of that distance, largest first,
+    until `max_points` points are kept. This yields the same points as RDP
+    with the tolerance that just fits the budget, in max_points steps.
+    Returns: sorted indices of the kept points.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    count = len(points)
+    if count <= max_points:
+        return np.arange(count)
+
+    keep = [0, count - 1]
+    heap = []
+
+    def push(start, end):
+        if end - start >= 2:
+            distance, split = _farthest(points, start, end)
+            heapq.heappush(heap, (-distance, start, end, split))
+
+    push(0, count - 1)
+    while heap and len(keep) < max_points:
+        _, start, end, split = heapq.heappop(heap)
+        keep.append(split)
+        push(start, split)
+        push(split, end)
+    return np.sort(np.array(keep))
+
+
+def _track_budgets(lengths, point_budget):
+    """
+    Returns: points to keep per track, summing to at most `point_budget`;
+    0 for tracks left out.
+    """
+    floors = np.minimum(lengths, MIN_POINTS_PER_TRACK)
+    if floors.sum() > point_budget:
+        # Keep the longest tracks whose floors fit
+        order = np.argsort(-lengths, kind="stable")
+        dropped = order[np.cumsum(floors[order]) > point_budget]
+        floors[dropped] = 0
+        lengths = lengths.copy()
+        lengths[dropped] = 0
+    spare = lengths - floors
+    extra = point_budget - floors.sum()
+    scale = min(1.0, extra / spare.sum()) if spare.sum() else 0.0
+    return floors + (spare * scale).astype(np.int64)
+
+
+def build_trajectory_figure(track_log, point_budget=DEFAULT_POINT_BUDGET, title="Object Trajectories"):
+    """
+    Builds a WebGL figure with one trace per label. Each label's tracks
+    share a trace, separated by gaps, and are simplified so the whole
+    figure stays within `point_budget` points: every track keeps up to
+    MIN_POINTS_PER_TRACK points and the rest of the budget is shared in
+    proportion to track length. If there are too many tracks for even
+    that, the shortest are left out.
+
+    Returns: (go.Figure, points drawn, points in the log)
+    """
+    trajectories = track_log.trajectories()
+    lengths = np.array([len(centroids) for _, centroids in trajectories.values()], dtype=np.int64)
+    total = int(lengths.sum())
+    budgets = _track_budgets(lengths, point_budget)
+
+    by_label = {}
+    drawn = 0
+    for ((label, object_id), (frames, centroids)), budget in zip(trajectories.items(), budgets):
+        if budget == 0:
+            continue
+        keep = simplify(centroids, budget)
+        drawn += len(keep)
+        xs, ys, ids = by_label.setdefault(label, ([], [], []))
+        xs.extend(centroids[keep, 0].tolist() + [None])
+        ys.extend(centroids[keep, 1].tolist() + [None])
+        ids.extend([object_id] * len(keep) + [None])
+
+    fig = go.Figure()
+    for label, (xs, ys, ids) in by_label.items():
+        fig.add_trace(go.Scattergl(
+            x=xs, y=ys,
+            mode='lines+markers',
+            name=label,
+            customdata=ids,
+            hovertemplate=f"{label} %{{customdata}}<br>(%{{x}}, %{{y}})<extra></extra>",
+            marker=dict(size=4)
+        ))
+
+    fig.update_layout(
+        title=title,
+        xaxis_title="X Position",
+        yaxis_title="Y Position",
+        yaxis=dict(autorange="reversed"),  # image coordinates
+        template="plotly_white"
+    )
+    return fig, drawn, total
+
+
+def write_trajectory_html(track_log, path, point_budget=DEFAULT_POINT_BUDGET, plotly_js="cdn"):
+    """
+    plotly_js: "cdn" loads plotly.js from the CDN; "directory" expects a
+    shared plotly.min.js next to `path` (written once if missing); "inline"
+    embeds the whole library in the file.
+    Returns: path
+    """
+    fig, drawn, total = build_trajectory_figure(track_log, point_budget)
+    include = {"cdn": "cdn", "directory": "directory", "inline": True}[plotly_js]
+    fig.write_html(path, include_plotlyjs=include, full_html=True)
+    if drawn < total:
+        print(f"Trajectory chart simplified to {drawn} of {total} points")
+    return path
+
+
+def write_trajectory_heatmap(track_log, path, frame_size, background=None, cell=8, blur=15):
+    """
+    Pre-renders where objects spent time as a PNG: centroids are binned
+    into `cell`-pixel cells, blurred and colour-mapped, optionally blended
+    over a `background` BGR frame. Cost doesn't depend on track count.
+    Returns: path
+    """
+    width, height = frame_size
+    bins = (max(1, height // cell), max(1, width // cell))
+    counts = np.zeros(bins, dtype=np.float32)
+    if len(track_log):
+        centroids = track_log.centroids()
+        rows = np.clip(centroids[:, 1] * bins[0] // max(1, height), 0, bins[0] - 1)
+        cols = np.clip(centroids[:, 0] * bins[1] // max(1, width), 0, bins[1] - 1)
+        np.add.at(counts, (rows, cols), 1)
+
+    counts = cv2.GaussianBlur(counts, (0, 0), blur / cell)
+    if counts.max() > 0:
+        counts = np.sqrt(counts / counts.max())  # keep sparse paths visible
+    heat = cv2.applyColorMap((counts * 255).astype(np.uint8), cv2.COLORMAP_INFERNO)
+    heat = cv2.resize(heat, (width, height), interpolation=cv2.INTER_LINEAR)
+
+    if background is not None:
+        alpha = cv2.resize(counts, (width, height))[..., None] * 0.75
+        heat = (background * (1 - alpha) + heat * alpha).astype(np.uint8)
+    cv2.imwrite(path, heat)
+    return path
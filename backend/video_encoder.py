@@ -0,0 +1,169 @@
+# backend/video_encoder.py
+
+import shutil
+import subprocess
+import tempfile
+import time
+
+import cv2
+
+# Lines of ffmpeg's stderr quoted in a VideoEncodeError
+STDERR_TAIL_LINES = 20
+
+# Per-format encoder arguments for each speed/quality preset
+OUTPUT_ARGS = {
+    "mp4": {
+        "realtime": ["-c:v", "libx264", "-preset", "ultrafast", "-crf", "26"],
+        "fast": ["-c:v", "libx264", "-preset", "veryfast", "-crf", "23"],
+        "quality": ["-c:v", "libx264", "-preset", "medium", "-crf", "20"],
+    },
+    "webm": {
+        "realtime": ["-c:v", "libvpx-vp9", "-deadline", "realtime", "-cpu-used", "8", "-row-mt", "1",
+                     "-b:v", "2M"],
+        "fast": ["-c:v", "libvpx-vp9", "-deadline", "good", "-cpu-used", "5", "-row-mt", "1",
+                 "-crf", "34", "-b:v", "0"],
+        "quality": ["-c:v", "libvpx-vp9", "-deadline", "good", "-cpu-used", "2", "-row-mt", "1",
+                    "-crf", "30", "-b:v", "0"],
+    },
+    "gif": {
+        "realtime": [],
+        "fast": [],
+        "quality": [],
+    },
+    "hls": {
+        "realtime": ["-c:v", "libx264", "-preset", "ultrafast", "-tune", "zerolatency", "-crf", "26"],
+        "fast": ["-c:v", "libx264", "-preset", "veryfast", "-tune", "zerolatency", "-crf", "23"],
+        "quality": ["-c:v", "libx264", "-preset", "medium", "-crf", "20"],
+    },
+}
+
+# Rolling HLS playlist: 2 s segments, the last HLS_PLAYLIST_SIZE kept on disk
+HLS_SEGMENT_SECONDS = 2
+HLS_PLAYLIST_SIZE = 6
+
+# Output filters: previews are only ever scaled down, never up
+OUTPUT_FILTERS = {
+    "mp4": ["-vf", "scale=trunc(iw/2)*2:trunc(ih/2)*2", "-pix_fmt", "yuv420p", "-movflags", "+faststart"],
+    "webm": ["-vf", "scale='min(960,iw)':-2:flags=lanczos", "-pix_fmt", "yuv420p"],
+    "gif": ["-vf", "fps=10,scale='min(640,iw)':-1:flags=lanczos", "-loop", "0"],
+    "hls": ["-vf", "scale=trunc(iw/2)*2:trunc(ih/2)*2", "-pix_fmt", "yuv420p",
+            "-force_key_frames", f"expr:gte(t,n_forced*{HLS_SEGMENT_SECONDS})",
+            "-f", "hls", "-hls_time", str(HLS_SEGMENT_SECONDS), "-hls_list_size", str(HLS_PLAYLIST_SIZE),
+            "-hls_flags", "delete_segments+independent_segments"],
+}
+
+
+class VideoEncodeError(RuntimeError):
+    """Raised when ffmpeg fails, with the tail of its stderr."""
+
+
+class FFmpegVideoWriter:
+    """
+    Drop-in replacement for cv2.VideoWriter that pipes raw BGR frames into a
+    single ffmpeg process writing every requested output at once.
+
+    outputs: dict of format ("mp4", "webm", "gif", "hls") -> path; the hls
+    path is the .m3u8 playlist, with its segments written next to it
+    preset: "realtime", "fast" or "quality"
+    After release(), `encode_seconds` holds the wall time from the first
+    frame to the last output being finalised. write() and release() raise
+    VideoEncodeError if ffmpeg exits with an error, so `outputs` only ever
+    names files that were written completely.
+    """
+
+    def __init__(self, outputs, width, height, fps, preset="fast"):
+        unknown = set(outputs) - set(OUTPUT_ARGS)
+        if unknown:
+            raise ValueError(f"Unsupported output formats: {', '.join(sorted(unknown))}")
+        if preset not in OUTPUT_ARGS["mp4"]:
+            raise ValueError(f"Unknown encoder preset: {preset}")
+
+        command = [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", str(fps),
+            "-i", "-",
+        ]
+        for fmt, path in outputs.items():
+            command += OUTPUT_ARGS[fmt][preset] + OUTPUT_FILTERS[fmt] + [path]
+
+        self.outputs = dict(outputs)
+        self.encode_seconds = 0.0
+        self._started = None
+        self._stderr = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE,
+                                         stdout=subprocess.DEVNULL, stderr=self._stderr)
+
+    def isOpened(self):
+        return self._process.poll() is None
+
+    def write(self, frame):
+        if self._started is None:
+            self._started = time.perf_counter()
+        try:
+            self._process.stdin.write(frame.tobytes())
+        except (BrokenPipeError, ValueError):
+            # ffmpeg has exited; report why
+            self.release()
+            raise VideoEncodeError("ffmpeg exited before all frames were written.")
+
+    def _error(self, returncode):
+        self._stderr.seek(0)
+        tail = self._stderr.read().decode(errors="replace").strip().splitlines()[-STDERR_TAIL_LINES:]
+        return VideoEncodeError(f"ffmpeg exited with {returncode} writing {', '.join(self.outputs)}:\n"
+                                + "\n".join(tail))
+
+    def release(self):
+        if self._stderr.closed:
+            return
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = self._process.wait()
+        if self._started is not None:
+            self.encode_seconds = time.perf_counter() - self._started
+        error = self._error(returncode) if returncode != 0 else None
+        self._stderr.close()
+        if error is not None:
+            self.outputs = {}
+            raise error
+
+
+class OpenCVVideoWriter:
+    """
+    Fallback used when ffmpeg isn't installed: writes a single mp4v file
+    through cv2.VideoWriter, with the same interface as FFmpegVideoWriter.
+    """
+
+    def __init__(self, path, width, height, fps):
+        self.outputs = {"mp4": path}
+        self.encode_seconds = 0.0
+        self._writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+
+    def isOpened(self):
+        return self._writer.isOpened()
+
+    def write(self, frame):
+        start = time.perf_counter()
+        self._writer.write(frame)
+        self.encode_seconds += time.perf_counter() - start
+
+    def release(self):
+        self._writer.release()
+
+
+def open_video_writer(outputs, width, height, fps, preset="fast"):
+    """
+    Returns an FFmpegVideoWriter for `outputs`, or an OpenCVVideoWriter
+    writing only an mp4 next to the first output when ffmpeg isn't installed.
+    Check `writer.outputs` for the files actually produced. `fps` may be
+    fractional (e.g. 29.97).
+    """
+    if not outputs:
+        raise ValueError("At least one output format is required.")
+    if shutil.which("ffmpeg"):
+        return FFmpegVideoWriter(outputs, width, height, fps, preset=preset)
+
+    print("ffmpeg not found; writing an mp4v file only.")
+    path = outputs.get("mp4") or next(iter(outputs.values())).rsplit(".", 1)[0] + ".mp4"
+    return OpenCVVideoWriter(path, width, height, fps)
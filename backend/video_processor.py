@@ -1,133 +1,307 @@
 
 import cv2
+import json
+import logging
 import os
-import csv
 import time
 import numpy as np
-import tempfile
-import plotly.graph_objects as go
-import subprocess
-from utils.azure_api import analyze_image
+from collections import deque
+from contextlib import suppress
+from utils.request_dispatcher import DEFAULT_REQUESTS_PER_SECOND
+from utils.media_utils import DEFAULT_INFERENCE_MAX_EDGE, DEFAULT_JPEG_QUALITY
 from backend.tracker import CentroidTracker
+from backend.frame_sampler import AdaptiveFrameSampler
+from backend.gap_filler import GapFiller
+from backend.pipeline import FramePipeline
+from backend.video_encoder import open_video_writer, VideoEncodeError
+from backend.track_log import TrackLog, TrackLogWriter
+from backend.trajectory_viz import write_trajectory_html, write_trajectory_heatmap
+from backend.detectors import get_detector, Detector, HybridDetector
+from utils.workspace import workspaces
+from utils.metrics import metrics
+from utils.azure_client import azure_client, CircuitOpenError
 
-def process_video(video_path, frame_interval=10, delay_between_requests=1.0):
-    cap = cv2.VideoCapture(video_path)
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fps = int(cap.get(cv2.CAP_PROP_FPS))
-
-    temp_video = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
-    out_path = temp_video.name
-    temp_log = tempfile.NamedTemporaryFile(delete=False, suffix=".csv")
-    log_path = temp_log.name
-    temp_html = tempfile.NamedTemporaryFile(delete=False, suffix=".html")
-    viz_path = temp_html.name
-
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(out_path, fourcc, fps, (width, height))
-
-    tracker = CentroidTracker(max_distance=50)
-    trails = {}
-    colors = {}
-
-    def get_color(object_id):
-        np.random.seed(object_id)
-        return tuple(int(c) for c in np.random.randint(100, 255, 3))
-
-    frame_id = 0
-
-    with open(log_path, mode='w', newline='') as log_file:
-        log_writer = csv.writer(log_file)
-        log_writer.writerow(["frame", "object_id", "label", "x", "y", "w", "h"])
-
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            frame_id += 1
-            if frame_id % frame_interval != 0:
-                continue
-
-            _, img_encoded = cv2.imencode('.jpg', frame)
-            try:
-                objects = analyze_image(img_encoded.tobytes())
-            except Exception as e:
-                print(f"Azure error at frame {frame_id}: {e}")
-                continue
-
-            detections = [{
-                "label": obj["object"],
-                "x": obj["rectangle"]["x"],
-                "y": obj["rectangle"]["y"],
-                "w": obj["rectangle"]["w"],
-                "h": obj["rectangle"]["h"]
-            } for obj in objects]
-
-            tracked = tracker.update(detections)
-
-            for object_id, info in tracked.items():
-                label = info["label"]
-                x, y, w, h = info["bbox"]
-                cx, cy = info["centroid"]
-                tag = f"{label}_{object_id}"
-
-                trails.setdefault(tag, []).append((cx, cy))
-                colors.setdefault(tag, get_color(object_id))
-
-                color = colors[tag]
-                cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
-                cv2.putText(frame, tag, (x, y - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-
-                log_writer.writerow([frame_id, object_id, label, x, y, w, h])
-
-                pts = trails[tag][-10:]
-                for i in range(1, len(pts)):
-                    cv2.line(frame, pts[i - 1], pts[i], color, 1)
-
-            out.write(frame)
-            time.sleep(delay_between_requests)
-
-    cap.release()
-    out.release()
-
-    # Plotly chart
-    fig = go.Figure()
-    for tag, pts in trails.items():
-        if pts:
-            xs, ys = zip(*pts)
-            fig.add_trace(go.Scatter(
-                x=xs, y=ys,
-                mode='lines+markers',
-                name=tag,
-                marker=dict(size=6)
-            ))
-
-    fig.update_layout(
-        title="Object Trajectories",
-        xaxis_title="X Position",
-        yaxis_title="Y Position",
-        template="plotly_white"
-    )
-    fig.write_html(viz_path)
-
-    # Export GIF and WebM
-    gif_path = out_path.replace(".mp4", ".gif")
-    webm_path = out_path.replace(".mp4", ".webm")
-
-    subprocess.run([
-        "ffmpeg", "-y", "-i", out_path,
-        "-vf", "fps=10,scale=640:-1:flags=lanczos",
-        "-loop", "0", gif_path
-    ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
-    subprocess.run([
-        "ffmpeg", "-y", "-i", out_path,
-        "-c:v", "libvpx-vp9", "-b:v", "2M",
-        "-c:a", "libopus",
-        "-vf", "scale=960:-1:flags=lanczos",  # upscale width to 960px, preserve aspect
-        webm_path
-    ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
-
-    return out_path, log_path, viz_path, gif_path, webm_path
+logger = logging.getLogger(__name__)
+
+
+def _make_sampler(sampling, frame_interval):
+    """
+    Returns a should_sample(frame_id, frame) callable and the adaptive
+    sampler behind it, if any.
+    """
+    if sampling == "fixed":
+        return (lambda frame_id, frame: frame_id % frame_interval == 0), None
+    if sampling == "adaptive":
+        sampling = AdaptiveFrameSampler(frame_interval=frame_interval,
+                                        min_gap=max(1, frame_interval // 3),
+                                        max_gap=frame_interval * 3)
+    if isinstance(sampling, AdaptiveFrameSampler):
+        return (lambda frame_id, frame: sampling.should_sample(frame)), sampling
+    raise ValueError(f"Unknown sampling mode: {sampling}")
+
+
+# Centroids kept per track for the trail drawn behind it
+TRAIL_LENGTH = 10
+
+
+def detections_from_objects(objects):
+    """
+    Returns: detector output ({"object", "confidence", "rectangle"}) as
+    CentroidTracker.update detections.
+    """
+    return [{
+        "label": obj["object"],
+        "x": obj["rectangle"]["x"],
+        "y": obj["rectangle"]["y"],
+        "w": obj["rectangle"]["w"],
+        "h": obj["rectangle"]["h"],
+        "confidence": obj.get("confidence")
+    } for obj in objects]
+
+
+def track_color(object_id):
+    """Returns: the BGR colour drawn for a track id, the same in every output."""
+    rng = np.random.RandomState(object_id)
+    return tuple(int(c) for c in rng.randint(100, 255, 3))
+
+
+def record_tracks(tracked, trails, colors):
+    """Appends each tracked centroid to its trail and gives new tracks a colour."""
+    for object_id, info in tracked.items():
+        tag = f"{info['label']}_{object_id}"
+        trails.setdefault(tag, deque(maxlen=TRAIL_LENGTH)).append(info["centroid"])
+        if tag not in colors:
+            colors[tag] = track_color(object_id)
+
+
+def draw_tracks(frame, tracked, trails, colors, thickness=2):
+    """Draws the box, tag and trail of every tracked object onto `frame`."""
+    for object_id, info in tracked.items():
+        x, y, w, h = info["bbox"]
+        tag = f"{info['label']}_{object_id}"
+        color = colors.get(tag) or track_color(object_id)
+        cv2.rectangle(frame, (x, y), (x + w, y + h), color, thickness)
+        cv2.putText(frame, tag, (x, y - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+
+        pts = list(trails.get(tag, ()))
+        for i in range(1, len(pts)):
+            cv2.line(frame, pts[i - 1], pts[i], color, 1)
+
+
+def process_video(video_path, frame_interval=10, delay_between_requests=None,
+                  max_in_flight=4, requests_per_second=DEFAULT_REQUESTS_PER_SECOND,
+                  sampling="fixed", fill_gaps="flow", motion_model=None, encoder_workers=2,
+                  queue_size=16, outputs=("webm",), encoder_preset="fast",
+                  inference_max_edge=DEFAULT_INFERENCE_MAX_EDGE, jpeg_quality=DEFAULT_JPEG_QUALITY,
+                  detector=None, workspace=None, progress_callback=None, export_csv=False,
+                  visualization="html"):
+    """
+    Detects and tracks objects in a video, keeping up to `max_in_flight`
+    detector requests outstanding. While the video is processed, the shared
+    Azure client is held to `requests_per_second` (retries included; None
+    keeps its VISION_AZURE_TPS limit). `delay_between_requests` is still
+    accepted and is converted into an equivalent request rate.
+
+    sampling: "fixed" sends every `frame_interval`-th frame; "adaptive" (or an
+    AdaptiveFrameSampler) only sends frames whose content changed.
+    fill_gaps: "flow" or "hold" writes every frame, carrying the last tracked
+    boxes across unsampled frames (see GapFiller); "predict" draws the
+    tracker's motion-model predictions instead; None writes only the sampled
+    frames. Frames whose request failed (after the client's retries, or at
+    once while its circuit breaker is open) are filled the same way, or
+    without gap filling drawn at the tracker's predicted positions.
+    motion_model: "kalman" matches detections against predicted track
+    positions instead of last-seen ones.
+
+    Decoding, JPEG encoding, inference and writing run as concurrent stages
+    (see FramePipeline) with `queue_size` frames buffered between them; a
+    per-stage timing summary is logged at the end.
+
+    outputs: annotated video formats to produce, any of "mp4" (H.264),
+    "webm" (VP9) and "gif". All are encoded by one ffmpeg process fed the
+    annotated frames over a pipe; `encoder_preset` is "realtime", "fast" or
+    "quality".
+
+    Frames are downscaled to `inference_max_edge` (None for full resolution)
+    and encoded at `jpeg_quality` before upload; boxes are mapped back to the
+    original resolution and the bytes uploaded are reported.
+
+    detector: a Detector or its name ("azure", "local", "hybrid"); defaults
+    to the VISION_DETECTOR setting (see backend.detectors.get_detector). The
+    request rate limit only applies to the calls that reach Azure. With the
+    hybrid detector and fixed sampling every frame is sent, `frame_interval`
+    is ignored and Azure runs on every VISION_HYBRID_KEYFRAME_INTERVAL-th
+    frame; adaptive sampling still skips unchanged frames.
+
+    workspace: the utils.workspace.Workspace the outputs are written to; a
+    new job workspace by default. It is held in use while the video is
+    processed, and the caller owns it afterwards. Its quota is checked up
+    front and again after each output is finalized (annotated video with
+    the track log, CSV, visualization); going over raises
+    QuotaExceededError and leaves the files written so far to the caller.
+
+    The position log is a compressed NumPy track log (see
+    backend.track_log.TrackLog); `export_csv` also writes it as
+    position_log.csv next to it.
+
+    visualization: "html" writes an interactive WebGL trajectory chart
+    (simplified to a point budget, plotly.js from the CDN); "heatmap"
+    pre-renders a PNG of where objects spent time over the first analyzed
+    frame; None skips it and returns no viz_path.
+
+    progress_callback: called as progress_callback(frames_done, total_frames)
+    after every frame; total_frames is 0 if the container doesn't say.
+
+    A timing summary (per-stage busy/starved/blocked time, uploads, API
+    errors, encode and visualization time) is written to timings.json in
+    the workspace.
+
+    Returns:
+        (mp4_path, log_path, viz_path, gif_path, webm_path); paths for formats
+        that were not requested are None.
+    """
+    if delay_between_requests:
+        requests_per_second = 1.0 / delay_between_requests
+    if not outputs:
+        raise ValueError("At least one output format is required.")
+    if visualization not in ("html", "heatmap", None):
+        raise ValueError(f"Unknown visualization: {visualization}")
+    if detector is None or isinstance(detector, str):
+        detector = get_detector(detector)
+    if isinstance(detector, Detector):
+        detector = detector.for_job()
+    if isinstance(detector, HybridDetector) and sampling == "fixed":
+        # The local model sees every frame; Azure only the hybrid keyframes
+        frame_interval = 1
+    should_sample, sampler = _make_sampler(sampling, frame_interval)
+
+    workspace = workspace or workspaces.workspace(prefix="video")
+    workspace.check_quota()
+    with workspace.in_use(), azure_client.rate_limited(requests_per_second):
+        started = time.perf_counter()
+        cap = cv2.VideoCapture(video_path)
+        out = None
+        try:
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            # Kept fractional (e.g. 29.97) so the output plays at the source's speed
+            fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+            total_frames = max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+
+            out = open_video_writer(
+                {fmt: os.path.join(workspace.path, f"annotated.{fmt}") for fmt in outputs},
+                width, height, fps, preset=encoder_preset)
+            log_path = os.path.join(workspace.path, "position_log.npz")
+            viz_path = {"html": os.path.join(workspace.path, "trajectories.html"),
+                        "heatmap": os.path.join(workspace.path, "trajectories.png"),
+                        None: None}[visualization]
+
+            tracker = CentroidTracker(max_distance=50, motion_model=motion_model,
+                                      frame_size=(width, height), reference_gap=frame_interval)
+            trails = {}
+            colors = {}
+            gap_filler = GapFiller(method=fill_gaps, tracker=tracker) if fill_gaps else None
+            last_sampled = 0
+            background = None
+            errors = 0
+            degraded = 0
+
+            pipeline = FramePipeline(cap, should_sample, detector, out,
+                                     keep_all=gap_filler is not None, encoder_workers=encoder_workers,
+                                     max_in_flight=max_in_flight, queue_size=queue_size,
+                                     max_edge=inference_max_edge, jpeg_quality=jpeg_quality)
+
+            with TrackLogWriter(log_path) as log_writer, pipeline:
+                for (frame_id, frame, sampled), objects, error in pipeline:
+                    if progress_callback is not None:
+                        progress_callback(frame_id, total_frames)
+                    if isinstance(error, CircuitOpenError):
+                        degraded += 1
+                        metrics.counter("circuit_open_frames_total")
+                    elif error is not None:
+                        errors += 1
+                        logger.debug("Azure error at frame %d: %s", frame_id, error)
+                    if not sampled or error is not None:
+                        if gap_filler is not None:
+                            draw_tracks(frame, gap_filler.propagate(frame), trails, colors, thickness=1)
+                            pipeline.write(frame)
+                        elif error is not None:
+                            # Keep the frame, with tracks where the motion model expects them
+                            draw_tracks(frame, tracker.predict(frame_id - last_sampled), trails, colors,
+                                        thickness=1)
+                            pipeline.write(frame)
+                        continue
+
+                    tracked = tracker.update(detections_from_objects(objects),
+                                             frame_gap=frame_id - last_sampled)
+                    last_sampled = frame_id
+
+                    # Only the tail drawn on the frame is kept; the full
+                    # trajectory lives in the track log
+                    record_tracks(tracked, trails, colors)
+                    for object_id, info in tracked.items():
+                        log_writer.add(frame_id, object_id, info["label"], info["bbox"],
+                                       info.get("confidence"))
+
+                    if background is None:
+                        background = frame.copy()
+
+                    # Seed the gap filler before drawing so overlays aren't tracked as features
+                    if gap_filler is not None:
+                        gap_filler.reset(frame, tracked)
+                    draw_tracks(frame, tracked, trails, colors)
+                    pipeline.write(frame)
+
+            with pipeline.timer.time("finalize"):
+                out.release()
+            workspace.check_quota()
+        finally:
+            # Also on errors, so neither the capture nor ffmpeg is left open
+            cap.release()
+            if out is not None:
+                with suppress(VideoEncodeError):
+                    out.release()  # already done unless the run failed; keep that error
+        logger.info("%s", pipeline.timer.summary())
+        logger.info("%s", pipeline.uploads.summary())
+        logger.info("Encoded %s in %.2fs", ", ".join(out.outputs), out.encode_seconds)
+        if errors:
+            logger.warning("Azure errors on %d sampled frames; counted in api_errors_total", errors)
+        if degraded:
+            logger.warning("Azure circuit breaker was open for %d sampled frames; used tracker predictions",
+                           degraded)
+
+        if sampler is not None:
+            report = sampler.report()
+            logger.info("Adaptive sampling sent %d of %d frames (%d API calls saved vs. every %dth frame)",
+                        report["frames_sampled"], report["frames_seen"], report["api_calls_saved"],
+                        frame_interval)
+
+        with pipeline.timer.time("viz"):
+            track_log = TrackLog.load(log_path)
+            if export_csv:
+                track_log.to_csv(os.path.join(workspace.path, "position_log.csv"))
+                workspace.check_quota()
+
+            if visualization == "html":
+                write_trajectory_html(track_log, viz_path)
+            elif visualization == "heatmap":
+                write_trajectory_heatmap(track_log, viz_path, (width, height), background=background)
+            workspace.check_quota()
+
+        total_seconds = time.perf_counter() - started
+        metrics.observe("video_job_seconds", total_seconds)
+        timings = {
+            "total_s": total_seconds,
+            "frames": total_frames,
+            "api_errors": errors,
+            "circuit_open_frames": degraded,
+            "encode_s": out.encode_seconds,
+            "stages": pipeline.timer.report(),
+            "uploads": pipeline.uploads.report(),
+            "sampling": sampler.report() if sampler is not None else None,
+        }
+        with open(os.path.join(workspace.path, "timings.json"), "w", encoding="utf-8") as f:
+            json.dump(timings, f, indent=2)
+
+        return (out.outputs.get("mp4"), log_path, viz_path,
+                out.outputs.get("gif"), out.outputs.get("webm"))
@@ -0,0 +1,58 @@
+# benchmarks/dispatch_benchmark.py
+#
+# Compares the old one-request-then-sleep loop against OrderedDispatcher
+# using the local mock endpoint.
+#
+#   python -m benchmarks.dispatch_benchmark --requests 50 --latency 0.3
+
+import argparse
+import os
+import time
+
+from benchmarks.mock_azure import start_mock_server
+
+
+def run(requests=50, latency=0.3, max_in_flight=8, requests_per_second=10.0, delay=1.0):
+    server = start_mock_server(latency=latency)
+    os.environ["AZURE_ENDPOINT"] = server.endpoint
+    os.environ.setdefault("AZURE_KEY", "mock-key")
+
+    # Imported late so the client picks up the mock endpoint
+    from utils.azure_api import analyze_image
+    from utils.request_dispatcher import OrderedDispatcher
+
+    # Distinct payloads so the detection cache doesn't answer repeat requests
+    payloads = [b"\xff\xd8\xff\xe0" + i.to_bytes(4, "big") + b"\x00" * 2048
+                for i in range(2 * requests)]
+
+    start = time.perf_counter()
+    for payload in payloads[:requests]:
+        analyze_image(payload)
+        time.sleep(delay)
+    sequential = time.perf_counter() - start
+
+    dispatcher = OrderedDispatcher(max_in_flight=max_in_flight, requests_per_second=requests_per_second)
+    items = ((i, payloads[requests + i]) for i in range(requests))
+    start = time.perf_counter()
+    order = [i for i, _, error in dispatcher.map(analyze_image, items) if error is None]
+    concurrent = time.perf_counter() - start
+
+    assert order == list(range(requests)), "results were not returned in order"
+    server.shutdown()
+
+    print(f"requests:    {requests} (mock latency {latency:.2f}s)")
+    print(f"sequential:  {sequential:.2f}s  {requests / sequential:.2f} req/s  (sleep {delay:.2f}s)")
+    print(f"dispatcher:  {concurrent:.2f}s  {requests / concurrent:.2f} req/s  "
+          f"({max_in_flight} in flight, {requests_per_second:g} TPS)")
+    print(f"speed-up:    {sequential / concurrent:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OrderedDispatcher throughput benchmark")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument("--tps", type=float, default=10.0)
+    parser.add_argument("--delay", type=float, default=1.0, help="sleep used by the sequential loop")
+    args = parser.parse_args()
+    run(args.requests, args.latency, args.max_in_flight, args.tps, args.delay)
@@ -0,0 +1,302 @@
+# benchmarks/mock_azure.py
+#
+# Local stand-in for the Azure Computer Vision analyze and Read endpoints, so
+# request throughput can be measured without the real service or its quota.
+#
+#   python -m benchmarks.mock_azure --port 8765 --latency 0.3
+#   python -m benchmarks.mock_azure --latency 0.3 --jitter 0.2 --throttle 0.05
+#   AZURE_ENDPOINT=http://127.0.0.1:8765/ AZURE_KEY=mock streamlit run app.py
+#
+# Record real responses once, then replay them offline:
+#
+#   AZURE_KEY=... python -m benchmarks.mock_azure --record https://<name>.cognitiveservices.azure.com/ \
+#       --recordings benchmarks/recordings.json
+#   python -m benchmarks.mock_azure --replay benchmarks/recordings.json --latency 0.3
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+DEFAULT_OBJECTS = [
+    {"object": "person", "confidence": 0.91, "rectangle": {"x": 120, "y": 80, "w": 160, "h": 340}},
+    {"object": "dog", "confidence": 0.84, "rectangle": {"x": 360, "y": 260, "w": 140, "h": 120}},
+]
+DEFAULT_TAGS = [
+    {"name": "outdoor", "confidence": 0.97},
+    {"name": "person", "confidence": 0.93},
+]
+DEFAULT_LINES = [
+    {"text": "EXIT", "boundingBox": [40, 30, 160, 30, 160, 80, 40, 80]},
+    {"text": "Platform 2", "boundingBox": [40, 120, 300, 120, 300, 170, 40, 170]},
+]
+
+
+def recording_key(kind, body, features=""):
+    return f"{kind}:{features}:{hashlib.sha256(body).hexdigest()}"
+
+
+class MockAzureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        # The SDK streams uploads with chunked transfer encoding
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            body = b""
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return body
+                body += self.rfile.read(size)
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _throttled(self):
+        retry_after = self.server.throttle()
+        if retry_after is None:
+            return False
+        self._send_json(429, {"error": {"code": "429", "message": "Rate limit is exceeded."}},
+                        headers={"Retry-After": str(retry_after)})
+        return True
+
+    def do_POST(self):
+        body = self._read_body()
+        url = urlparse(self.path)
+        if url.path.endswith("/read/analyze"):
+            self.server.record_request()
+            if self._throttled():
+                return
+            operation_id = self.server.start_read_job(body)
+            host = self.headers.get("Host", "127.0.0.1")
+            self._send_json(202, {}, headers={
+                "Operation-Location": f"http://{host}/vision/v3.2/read/analyzeResults/{operation_id}"
+            })
+            return
+        if not url.path.endswith("/analyze"):
+            self._send_json(404, {"error": {"code": "NotFound", "message": url.path}})
+            return
+
+        self.server.record_request()
+        if self._throttled():
+            return
+        if not self.server.upstream:
+            time.sleep(self.server.sample_latency())
+
+        features = ",".join(parse_qs(url.query).get("visualFeatures", [])).lower()
+        result = self.server.analyze_result(body, features, url.query)
+        self._send_json(200, result)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if "/read/analyzeResults/" not in url.path:
+            self._send_json(404, {"error": {"code": "NotFound", "message": url.path}})
+            return
+
+        job = self.server.read_jobs.get(url.path.rsplit("/", 1)[-1])
+        if job is None:
+            self._send_json(404, {"error": {"code": "NotFound", "message": "Unknown operation"}})
+        elif time.monotonic() < job["ready_at"]:
+            self._send_json(200, {"status": "running"})
+        else:
+            self._send_json(200, self.server.read_result(job["body"]))
+
+
+class MockAzureServer(ThreadingHTTPServer):
+    """
+    latency/jitter: each analyze call takes latency + uniform(0, jitter)
+    seconds; Read jobs finish read_latency after submission.
+    throttle: fraction of POSTs answered 429 with `Retry-After: retry_after`.
+    replay: recordings (see save_recordings) answered for matching requests;
+    anything unrecorded gets the default synthetic response.
+    record: an upstream endpoint every request is forwarded to (with
+    `key`), saving the responses into `recordings`.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.3, objects=None, tags=None, lines=None, read_latency=1.0,
+                 jitter=0.0, throttle=0.0, retry_after=1, replay=None, record=None, key=None, seed=None):
+        super().__init__(address, MockAzureHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.read_latency = read_latency
+        self.throttle_rate = throttle
+        self.retry_after = retry_after
+        self.objects = objects if objects is not None else DEFAULT_OBJECTS
+        self.tags = tags if tags is not None else DEFAULT_TAGS
+        self.lines = lines if lines is not None else DEFAULT_LINES
+        self.recordings = replay if replay is not None else {}
+        self.upstream = record.rstrip("/") if record else None
+        self.key = key
+        self.read_jobs = {}  # operation id -> {"ready_at", "body"}
+        self.request_count = 0
+        self.throttled_count = 0
+        self.replay_hits = 0
+        self.replay_misses = 0
+        self._count_lock = threading.Lock()
+        self._random = random.Random(seed)
+
+    def record_request(self):
+        with self._count_lock:
+            self.request_count += 1
+
+    def sample_latency(self):
+        with self._count_lock:
+            return self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    def throttle(self):
+        """
+        Returns: Retry-After seconds if this request should get a 429, else None.
+        """
+        with self._count_lock:
+            if self.throttle_rate and not self.upstream and self._random.random() < self.throttle_rate:
+                self.throttled_count += 1
+                return self.retry_after
+        return None
+
+    def start_read_job(self, body):
+        operation_id = str(uuid.uuid4())
+        ready_at = time.monotonic() + (0.0 if self.upstream else self.read_latency)
+        self.read_jobs[operation_id] = {"ready_at": ready_at, "body": body}
+        return operation_id
+
+    def _lookup(self, key):
+        with self._count_lock:
+            if key in self.recordings:
+                self.replay_hits += 1
+                return self.recordings[key]
+            self.replay_misses += 1
+        return None
+
+    def _store(self, key, value):
+        with self._count_lock:
+            self.recordings[key] = value
+
+    def analyze_result(self, body, features, query):
+        key = recording_key("analyze", body, features)
+        if self.upstream:
+            result = self._forward("POST", f"/vision/v3.2/analyze?{query}", body)
+            self._store(key, result)
+            return result
+        recorded = self._lookup(key)
+        if recorded is not None:
+            return recorded
+
+        result = {
+            "requestId": str(uuid.uuid4()),
+            "metadata": {"width": 640, "height": 480, "format": "Jpeg"},
+        }
+        if not features or "objects" in features:
+            result["objects"] = self.objects
+        if "tags" in features:
+            result["tags"] = self.tags
+        return result
+
+    def read_result(self, body):
+        key = recording_key("read", body)
+        if self.upstream:
+            result = self._forward_read(body)
+            self._store(key, result)
+            return result
+        recorded = self._lookup(key)
+        if recorded is not None:
+            return recorded
+        return {
+            "status": "succeeded",
+            "analyzeResult": {"version": "3.2.0", "readResults": [{
+                "page": 1, "angle": 0, "width": 640, "height": 480, "unit": "pixel",
+                "lines": [dict(line, words=[]) for line in self.lines],
+            }]},
+        }
+
+    def _forward(self, method, path, body=None):
+        request = urllib.request.Request(
+            self.upstream + path, data=body, method=method,
+            headers={"Ocp-Apim-Subscription-Key": self.key or "",
+                     "Content-Type": "application/octet-stream"})
+        with urllib.request.urlopen(request, timeout=60) as response:
+            payload = response.read()
+            return json.loads(payload) if payload else dict(response.headers)
+
+    def _forward_read(self, body):
+        headers = self._forward("POST", "/vision/v3.2/read/analyze", body)
+        operation = headers["Operation-Location"].split("/vision/v3.2", 1)[1]
+        while True:
+            result = self._forward("GET", "/vision/v3.2" + operation)
+            if result.get("status") in ("succeeded", "failed"):
+                return result
+            time.sleep(1.0)
+
+    @property
+    def endpoint(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+
+def load_recordings(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_recordings(server, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(server.recordings, f)
+    return len(server.recordings)
+
+
+def start_mock_server(port=0, latency=0.3, **kwargs):
+    """
+    Starts the mock on a background thread.
+    Returns: the running MockAzureServer; `server.endpoint` is its base URL.
+    """
+    server = MockAzureServer(("127.0.0.1", port), latency=latency, **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Azure Computer Vision mock")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per analyze call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra uniform random latency")
+    parser.add_argument("--read-latency", type=float, default=1.0, help="seconds until a Read job is done")
+    parser.add_argument("--throttle", type=float, default=0.0, help="fraction of requests answered 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--replay", help="recordings to answer from")
+    parser.add_argument("--record", help="real endpoint to forward to and record (key from AZURE_KEY)")
+    parser.add_argument("--recordings", default="recordings.json", help="where --record saves responses")
+    args = parser.parse_args()
+
+    server = MockAzureServer(("127.0.0.1", args.port), latency=args.latency, jitter=args.jitter,
+                             read_latency=args.read_latency, throttle=args.throttle,
+                             retry_after=args.retry_after,
+                             replay=load_recordings(args.replay) if args.replay else None,
+                             record=args.record, key=os.getenv("AZURE_KEY"))
+    mode = f"recording {args.record}" if args.record else f"replaying {args.replay}" if args.replay else "synthetic"
+    print(f"Mock Azure endpoint listening on {server.endpoint} ({mode})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+        if args.record:
+            print(f"Saved {save_recordings(server, args.recordings)} responses to {args.recordings}")
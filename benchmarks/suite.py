@@ -0,0 +1,283 @@
+# benchmarks/suite.py
+#
+# End-to-end benchmarks against the local Azure stand-in: process_image,
+# process_video on synthetic videos of several lengths, resolutions and
+# object counts, OCR, and CentroidTracker.update. Each case runs in a fresh
+# process and reports throughput, p50/p95 latency and peak RSS.
+#
+# Results are compared against benchmarks/baseline.json (recorded with the
+# default mock settings) unless another --baseline is given; the run exits
+# non-zero if a metric regressed beyond --tolerance.
+#
+#   python -m benchmarks.suite --quick
+#   python -m benchmarks.suite --save-baseline benchmarks/baseline.json
+#   python -m benchmarks.suite --baseline other.json --latency 0.3 --jitter 0.1 --throttle 0.02
+#   python -m benchmarks.suite --replay recordings.json --only video
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.mock_azure import start_mock_server, load_recordings
+
+# Metrics where a larger value is an improvement
+HIGHER_IS_BETTER = {"throughput"}
+COMPARED_METRICS = ("throughput", "p50_ms", "p95_ms", "peak_rss_mb")
+# Latency changes smaller than this are noise, whatever their relative size
+MIN_LATENCY_CHANGE_MS = 1.0
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def make_video(path, seconds=5, fps=25, width=640, height=480, objects=3, seed=0):
+    """
+    Writes a synthetic video of `objects` coloured boxes bouncing around.
+    Returns: path
+    """
+    rng = np.random.default_rng(seed)
+    size = np.maximum(20, rng.uniform(0.05, 0.15, size=(objects, 2)) * (width, height)).astype(int)
+    position = rng.uniform(0, 1, size=(objects, 2)) * ((width, height) - size)
+    velocity = rng.uniform(-6, 6, size=(objects, 2)) * width / 640
+    colors = rng.integers(60, 255, size=(objects, 3))
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    background = np.full((height, width, 3), 40, dtype=np.uint8)
+    for _ in range(int(seconds * fps)):
+        position += velocity
+        bounce = (position < 0) | (position > (width, height) - size)
+        velocity[bounce] *= -1
+        position = np.clip(position, 0, (width, height) - size)
+        frame = background.copy()
+        for (x, y), (w, h), color in zip(position.astype(int), size, colors):
+            cv2.rectangle(frame, (x, y), (x + w, y + h), tuple(int(c) for c in color), -1)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def make_image(width, height, seed):
+    rng = np.random.default_rng(seed)
+    image = rng.integers(0, 255, size=(height // 8, width // 8, 3), dtype=np.uint8)
+    image = cv2.resize(image, (width, height), interpolation=cv2.INTER_LINEAR)
+    return cv2.imencode(".jpg", image)[1].tobytes()
+
+
+def _summary(latencies, seconds, items, errors=0):
+    latencies = np.array(latencies) * 1000 if len(latencies) else np.zeros(1)
+    return {
+        "items": items,
+        "seconds": round(seconds, 4),
+        "throughput": round(items / seconds, 3) if seconds else 0.0,
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "errors": errors,
+    }
+
+
+class _Upload:
+    # Stands in for a Streamlit UploadedFile
+    def __init__(self, data):
+        self._data = data
+
+    def getvalue(self):
+        return self._data
+
+
+def bench_image(count=20, width=1920, height=1080):
+    from backend.image_processor import process_image
+
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    for i in range(count):
+        t = time.perf_counter()
+        try:
+            process_image(_Upload(make_image(width, height, seed=i)))
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - t)
+    return _summary(latencies, time.perf_counter() - start, count, errors)
+
+
+def bench_ocr(count=10, width=1280, height=720):
+    from backend.text_processor import run_ocr
+
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    for i in range(count):
+        t = time.perf_counter()
+        if not run_ocr(make_image(width, height, seed=1000 + i)).succeeded:
+            errors += 1
+        latencies.append(time.perf_counter() - t)
+    return _summary(latencies, time.perf_counter() - start, count, errors)
+
+
+def bench_video(seconds=5, width=640, height=480, objects=3, frame_interval=10):
+    from backend.video_processor import process_video
+
+    with tempfile.TemporaryDirectory(prefix="bench_video_") as directory:
+        path = make_video(os.path.join(directory, "input.mp4"), seconds, 25, width, height, objects)
+        stamps = []
+        start = time.perf_counter()
+        process_video(path, frame_interval=frame_interval, outputs=("webm",), encoder_preset="realtime",
+                      progress_callback=lambda done, total: stamps.append(time.perf_counter()))
+        seconds_taken = time.perf_counter() - start
+    # Per-frame latency: time between consecutive frames leaving the pipeline
+    return _summary(np.diff([start] + stamps), seconds_taken, len(stamps))
+
+
+def bench_tracker(tracks=1000, frames=100):
+    from backend.tracker import CentroidTracker
+    from benchmarks.tracker_benchmark import synthetic_scene
+
+    tracker = CentroidTracker(max_distance=25)
+    latencies = []
+    for detections, _ in synthetic_scene(tracks, frames):
+        t = time.perf_counter()
+        tracker.update(detections)
+        latencies.append(time.perf_counter() - t)
+    # Scene generation is excluded; only update() is timed
+    return _summary(latencies[1:], sum(latencies), frames)
+
+
+BENCHMARKS = {
+    "image": bench_image,
+    "ocr": bench_ocr,
+    "video": bench_video,
+    "tracker": bench_tracker,
+}
+
+
+def cases(quick=False):
+    """
+    Returns: list of (case name, benchmark, kwargs)
+    """
+    if quick:
+        return [
+            ("image-1080p", "image", dict(count=5)),
+            ("ocr", "ocr", dict(count=3)),
+            ("video-5s-480p-3obj", "video", dict(seconds=5)),
+            ("tracker-100", "tracker", dict(tracks=100, frames=50)),
+        ]
+    return [
+        ("image-480p", "image", dict(count=20, width=640, height=480)),
+        ("image-1080p", "image", dict(count=20)),
+        ("image-4k", "image", dict(count=10, width=3840, height=2160)),
+        ("ocr", "ocr", dict(count=10)),
+        ("video-5s-480p-3obj", "video", dict(seconds=5)),
+        ("video-30s-480p-10obj", "video", dict(seconds=30, objects=10)),
+        ("video-10s-1080p-20obj", "video", dict(seconds=10, width=1920, height=1080, objects=20)),
+        ("tracker-100", "tracker", dict(tracks=100)),
+        ("tracker-1000", "tracker", dict(tracks=1000)),
+    ]
+
+
+def _run_case(benchmark, kwargs):
+    # Runs in a fresh process so peak RSS belongs to this case alone
+    result = BENCHMARKS[benchmark](**kwargs)
+    result["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    result["params"] = kwargs
+    return result
+
+
+def run(quick=False, only=None, latency=0.3, jitter=0.0, throttle=0.0, read_latency=1.0, replay=None):
+    server = start_mock_server(latency=latency, jitter=jitter, throttle=throttle, read_latency=read_latency,
+                               replay=load_recordings(replay) if replay else None, seed=0)
+    workspace_root = tempfile.mkdtemp(prefix="bench_workspaces_")
+    # Spawned workers inherit these: mock endpoint, no result cache, scratch workspaces
+    os.environ["AZURE_ENDPOINT"] = server.endpoint
+    os.environ.setdefault("AZURE_KEY", "mock-key")
+    os.environ["VISION_CACHE_ENTRIES"] = "0"
+    os.environ.pop("VISION_CACHE_DIR", None)
+    os.environ["VISION_WORKSPACE_ROOT"] = workspace_root
+
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for name, benchmark, kwargs in cases(quick):
+        if only and benchmark not in only:
+            continue
+        with context.Pool(1) as pool:
+            results[name] = pool.apply(_run_case, (benchmark, kwargs))
+        print(_format(name, results[name]), flush=True)
+
+    server.shutdown()
+    shutil.rmtree(workspace_root, ignore_errors=True)
+    print(f"mock: {server.request_count} requests, {server.throttled_count} throttled"
+          + (f", replay {server.replay_hits} hits / {server.replay_misses} misses" if replay else ""))
+    return results
+
+
+def _format(name, result):
+    return (f"{name:<24} {result['throughput']:>9.2f}/s  p50 {result['p50_ms']:>9.2f} ms  "
+            f"p95 {result['p95_ms']:>9.2f} ms  rss {result['peak_rss_mb']:>7.1f} MB"
+            + (f"  errors {result['errors']}" if result.get("errors") else ""))
+
+
+def compare(results, baseline, tolerance=0.15):
+    """
+    Prints each metric's change against `baseline`. Cases missing from the
+    baseline or recorded with other parameters (e.g. --quick) are skipped.
+    Returns: list of (case, metric, change) regressions beyond `tolerance`.
+    """
+    regressions = []
+    print(f"\n{'case':<24} {'metric':<12} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        if baseline[name].get("params") != result.get("params"):
+            print(f"{name:<24} skipped: baseline was recorded with {baseline[name].get('params')}")
+            continue
+        for metric in COMPARED_METRICS:
+            before, after = baseline[name].get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            significant = not metric.endswith("_ms") or abs(after - before) >= MIN_LATENCY_CHANGE_MS
+            flag = "  REGRESSION" if worse > tolerance and significant else ""
+            if flag:
+                regressions.append((name, metric, change))
+            print(f"{name:<24} {metric:<12} {before:>10.2f} {after:>10.2f} {change:>+7.1%}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end benchmark suite")
+    parser.add_argument("--quick", action="store_true", help="small cases only")
+    parser.add_argument("--only", help="comma-separated: image, ocr, video, tracker")
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--throttle", type=float, default=0.0, help="fraction of requests answered 429")
+    parser.add_argument("--read-latency", type=float, default=1.0)
+    parser.add_argument("--replay", help="recorded responses (see benchmarks.mock_azure --record)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE,
+                        help="compare against this results file (default: benchmarks/baseline.json)")
+    parser.add_argument("--save-baseline", help="write the results to this file")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed regression before failing")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    elif args.baseline != DEFAULT_BASELINE:
+        parser.error(f"baseline not found: {args.baseline}")
+
+    results = run(args.quick, set(args.only.split(",")) if args.only else None, args.latency,
+                  args.jitter, args.throttle, args.read_latency, args.replay)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metrics regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
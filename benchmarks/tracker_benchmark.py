@@ -0,0 +1,71 @@
+# benchmarks/tracker_benchmark.py
+#
+# Micro-benchmark for CentroidTracker.update with many simultaneous tracks.
+#
+#   python -m benchmarks.tracker_benchmark --tracks 1000 --frames 100
+
+import argparse
+import time
+
+import numpy as np
+
+from backend.tracker import CentroidTracker
+
+LABELS = ["person", "car", "dog", "bicycle", "truck"]
+
+
+def synthetic_scene(tracks, frames, width=3840, height=2160, speed=4.0, seed=0):
+    """
+    Yields one detection list per frame for `tracks` objects drifting on a
+    grid, plus the ground-truth index of each detection.
+    """
+    rng = np.random.default_rng(seed)
+    side = int(np.ceil(np.sqrt(tracks)))
+    gx, gy = np.meshgrid(np.linspace(0, width - 40, side), np.linspace(0, height - 40, side))
+    positions = np.stack([gx.ravel(), gy.ravel()], axis=1)[:tracks]
+    velocities = rng.uniform(-speed, speed, size=(tracks, 2))
+    labels = rng.choice(LABELS, size=tracks)
+
+    for _ in range(frames):
+        positions += velocities
+        order = rng.permutation(tracks)
+        yield [{
+            "label": labels[i],
+            "x": int(positions[i, 0]), "y": int(positions[i, 1]), "w": 30, "h": 30
+        } for i in order], order
+
+
+def run(tracks=1000, frames=100):
+    tracker = CentroidTracker(max_distance=25)
+    timings = []
+    id_of_truth = {}
+    switches = 0
+
+    for detections, truth in synthetic_scene(tracks, frames):
+        start = time.perf_counter()
+        tracked = tracker.update(detections)
+        timings.append(time.perf_counter() - start)
+
+        # Count identity switches against the generator's ground truth
+        by_centroid = {info["centroid"]: object_id for object_id, info in tracked.items()}
+        for det, true_index in zip(detections, truth):
+            object_id = by_centroid.get((det["x"] + 15, det["y"] + 15))
+            if true_index in id_of_truth and id_of_truth[true_index] != object_id:
+                switches += 1
+            id_of_truth[true_index] = object_id
+
+    timings = np.array(timings[1:]) * 1000
+    print(f"tracks:          {tracks}")
+    print(f"frames:          {frames}")
+    print(f"update p50:      {np.percentile(timings, 50):.2f} ms")
+    print(f"update p95:      {np.percentile(timings, 95):.2f} ms")
+    print(f"live tracks:     {len(tracker)}")
+    print(f"id switches:     {switches}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CentroidTracker micro-benchmark")
+    parser.add_argument("--tracks", type=int, default=1000)
+    parser.add_argument("--frames", type=int, default=100)
+    args = parser.parse_args()
+    run(args.tracks, args.frames)
@@ -0,0 +1,83 @@
+# benchmarks/viz_benchmark.py
+#
+# Compares the trajectory chart outputs on a synthetic track log: the old
+# one-Scatter-per-track figure with plotly.js inlined, the decimated WebGL
+# chart and the pre-rendered heatmap. Reports what can be measured without
+# a browser: file size, server-side build+write time and the number of
+# points the browser has to draw. Browser render time is not measured; the
+# point count is the proxy for it.
+#
+#   python -m benchmarks.viz_benchmark --tracks 500 --points 2000
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import plotly.graph_objects as go
+
+from backend.track_log import TrackLog, TRACK_DTYPE
+from backend.trajectory_viz import (build_trajectory_figure, write_trajectory_html, write_trajectory_heatmap,
+                                   DEFAULT_POINT_BUDGET)
+
+LABELS = ["person", "car", "dog", "bicycle", "truck"]
+
+
+def synthetic_log(tracks, points, width=1920, height=1080, seed=0):
+    """
+    Returns: TrackLog of `tracks` random walks of `points` samples each.
+    """
+    rng = np.random.default_rng(seed)
+    rows = np.zeros(tracks * points, dtype=TRACK_DTYPE)
+    start = rng.uniform((0, 0), (width, height), size=(tracks, 2))
+    steps = rng.normal(0, 6, size=(tracks, points, 2)).cumsum(axis=1)
+    positions = np.clip(start[:, None, :] + steps, 0, (width - 1, height - 1)).astype(int)
+
+    rows["frame"] = np.tile(np.arange(points) * 10, tracks)
+    rows["object_id"] = np.repeat(np.arange(tracks), points)
+    rows["label"] = np.repeat(rng.integers(0, len(LABELS), size=tracks), points)
+    rows["x"] = positions[..., 0].ravel() - 15
+    rows["y"] = positions[..., 1].ravel() - 15
+    rows["w"] = rows["h"] = 30
+    order = np.argsort(rows["frame"], kind="stable")
+    return TrackLog(rows[order], LABELS)
+
+
+def legacy_html(track_log, path):
+    fig = go.Figure()
+    for (label, object_id), (_, centroids) in track_log.trajectories().items():
+        fig.add_trace(go.Scatter(x=centroids[:, 0], y=centroids[:, 1], mode='lines+markers',
+                                 name=f"{label}_{object_id}", marker=dict(size=6)))
+    fig.update_layout(title="Object Trajectories", template="plotly_white")
+    fig.write_html(path)
+
+
+def _measure(name, write, path, points):
+    start = time.perf_counter()
+    write(path)
+    seconds = time.perf_counter() - start
+    print(f"{name:<26} {os.path.getsize(path) / 1e6:8.2f} MB  {seconds:10.2f}s  {points:>12}")
+
+
+def run(tracks=500, points=2000, point_budget=DEFAULT_POINT_BUDGET):
+    track_log = synthetic_log(tracks, points)
+    total = len(track_log)
+    print(f"{tracks} tracks x {points} points = {total} rows")
+    print(f"{'output':<26} {'file size':>11}  {'build+write':>11}  {'points drawn':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        _measure("legacy (Scatter, inline)", lambda p: legacy_html(track_log, p),
+                 os.path.join(directory, "legacy.html"), total)
+        _measure("webgl (decimated, cdn)", lambda p: write_trajectory_html(track_log, p, point_budget),
+                 os.path.join(directory, "webgl.html"), build_trajectory_figure(track_log, point_budget)[1])
+        _measure("heatmap (png)", lambda p: write_trajectory_heatmap(track_log, p, (1920, 1080)),
+                 os.path.join(directory, "heatmap.png"), 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trajectory visualization benchmark")
+    parser.add_argument("--tracks", type=int, default=500)
+    parser.add_argument("--points", type=int, default=2000)
+    parser.add_argument("--point-budget", type=int, default=DEFAULT_POINT_BUDGET)
+    args = parser.parse_args()
+    run(args.tracks, args.points, args.point_budget)
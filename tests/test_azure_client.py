@@ -0,0 +1,110 @@
+# tests/test_azure_client.py
+
+import socket
+import time
+
+import pytest
+from msrest.exceptions import HttpOperationError, ClientRequestError
+
+from benchmarks.mock_azure import start_mock_server
+from utils.azure_client import AzureClient, CircuitBreaker, CircuitOpenError
+
+
+def _open_breaker(reset_timeout=0.05):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=reset_timeout)
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    return breaker
+
+
+def test_breaker_opens_after_consecutive_failures_only():
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()  # resets the count
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_half_open_lets_one_probe_through_and_its_success_closes():
+    breaker = _open_breaker()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()  # the probe is still out
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_failed_probe_reopens():
+    breaker = _open_breaker()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_released_probe_lets_another_through():
+    breaker = _open_breaker()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+
+@pytest.fixture
+def mock_azure():
+    server = start_mock_server(latency=0.0, throttle=1.0, retry_after=0)
+    yield server
+    server.shutdown()
+
+
+def test_throttling_is_retried_but_does_not_open_the_circuit(mock_azure):
+    client = AzureClient(mock_azure.endpoint, "mock-key", max_retries=3, max_backoff=0.01,
+                         breaker=CircuitBreaker(failure_threshold=2), requests_per_second=None)
+    with pytest.raises(HttpOperationError):
+        client.analyze(b"jpeg", ["Objects"])
+    assert mock_azure.throttled_count == 4
+    assert client.breaker.state == "closed"
+
+
+def _unreachable_endpoint():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]  # nothing listens here once closed
+    return f"http://127.0.0.1:{port}/"
+
+
+def test_a_call_that_runs_out_of_retries_counts_as_one_failure():
+    client = AzureClient(_unreachable_endpoint(), "mock-key", max_retries=4, backoff=0.01,
+                         breaker=CircuitBreaker(failure_threshold=5), requests_per_second=None)
+    with pytest.raises(ClientRequestError):
+        client.analyze(b"jpeg", ["Objects"])
+    assert client.breaker.state == "closed"
+
+
+def test_connection_failures_open_the_circuit():
+    client = AzureClient(_unreachable_endpoint(), "mock-key", max_retries=1, backoff=0.01,
+                         breaker=CircuitBreaker(failure_threshold=2), requests_per_second=None)
+    for _ in range(2):
+        with pytest.raises(ClientRequestError):
+            client.analyze(b"jpeg", ["Objects"])
+    assert client.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        client.analyze(b"jpeg", ["Objects"])
+
+
+def test_rate_limited_restores_the_previous_limit():
+    client = AzureClient("http://127.0.0.1/", "mock-key", requests_per_second=10)
+    previous = client.rate_limiter
+    with client.rate_limited(50):
+        assert client.rate_limiter.rate == 50
+    assert client.rate_limiter is previous
+    with client.rate_limited(None):
+        assert client.rate_limiter is previous
@@ -0,0 +1,88 @@
+# tests/test_batch_processor.py
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from backend import batch_processor
+from backend.batch_processor import run_batch, write_parquet, load_checkpoint
+from utils.azure_client import azure_client
+
+
+@pytest.fixture
+def images(tmp_path):
+    directory = tmp_path / "images"
+    directory.mkdir()
+    for name in ("a.jpg", "b.jpg", "c.png", "notes.txt"):
+        (directory / name).write_bytes(name.encode())
+    return directory
+
+
+@pytest.fixture
+def analyzed(monkeypatch):
+    """Replaces the Azure analysis; images whose bytes start with b"b" fail until fixed."""
+    calls = []
+    state = SimpleNamespace(calls=calls, failing=True)
+
+    def analyze(image_bytes, features, inference_max_edge, jpeg_quality):
+        calls.append(image_bytes)
+        if state.failing and image_bytes.startswith(b"b"):
+            raise RuntimeError("Azure error")
+        return SimpleNamespace(objects=[{"object": "car", "confidence": 0.9,
+                                         "rectangle": {"x": 1, "y": 2, "w": 3, "h": 4}}],
+                               tags=[{"name": "road", "confidence": 0.8}], captions=[], categories=[],
+                               text=[], uploaded_bytes=len(image_bytes))
+
+    monkeypatch.setattr(batch_processor, "analyze_image_bytes", analyze)
+    return state
+
+
+def test_resumed_run_only_analyzes_what_is_missing_or_failed(images, analyzed, tmp_path):
+    output = str(tmp_path / "results.jsonl")
+    stats = run_batch(str(images), output, max_in_flight=2)
+    assert (stats["analyzed"], stats["failed"], stats["skipped"]) == (2, 1, 0)
+    assert load_checkpoint(output) == {str(images / "a.jpg"), str(images / "c.png")}
+
+    analyzed.calls.clear()
+    analyzed.failing = False
+    stats = run_batch(str(images), output, max_in_flight=2)
+    assert analyzed.calls == [b"b.jpg"]
+    assert (stats["analyzed"], stats["failed"], stats["skipped"]) == (1, 0, 2)
+
+
+def test_failed_images_are_logged_not_printed(images, analyzed, tmp_path, caplog, capsys):
+    with caplog.at_level("WARNING", logger="backend.batch_processor"):
+        run_batch(str(images), str(tmp_path / "results.jsonl"))
+    assert [record.getMessage() for record in caplog.records] == [
+        f"Failed to analyze {images / 'b.jpg'}: Azure error"]
+    assert capsys.readouterr().out == ""
+
+
+def test_batch_restores_the_client_rate_limit(images, analyzed, tmp_path):
+    previous = azure_client.rate_limiter
+    run_batch(str(images), str(tmp_path / "results.jsonl"), requests_per_second=3)
+    assert azure_client.rate_limiter is previous
+
+
+def test_parquet_keeps_all_columns_when_the_first_image_failed(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    jsonl = tmp_path / "results.jsonl"
+    records = [
+        {"image": "a.jpg", "error": "Azure error"},
+        {"image": "b.jpg", "objects": [{"object": "car", "confidence": 0.9,
+                                        "rectangle": {"x": 1, "y": 2, "w": 3, "h": 4}}],
+         "tags": [], "captions": [], "categories": [], "text": ["STOP"], "uploaded_bytes": 10,
+         "seconds": 0.5, "error": None},
+        {"image": "a.jpg", "error": "retried, failed again"},  # latest record per image wins
+    ]
+    jsonl.write_text("".join(json.dumps(record) + "\n" for record in records))
+
+    write_parquet(str(jsonl), str(tmp_path / "results.parquet"))
+    table = pq.read_table(str(tmp_path / "results.parquet"))
+    assert table.column_names == list(batch_processor.RECORD_FIELDS)
+    rows = table.to_pylist()
+    assert [row["image"] for row in rows] == ["a.jpg", "b.jpg"]
+    assert rows[0]["error"] == "retried, failed again" and rows[0]["objects"] is None
+    assert rows[1]["objects"][0]["rectangle"] == {"x": 1, "y": 2, "w": 3, "h": 4}
+    assert rows[1]["text"] == ["STOP"]
@@ -0,0 +1,85 @@
+# tests/test_detection_cache.py
+
+from types import SimpleNamespace
+
+import pytest
+
+from utils import detection_cache
+from utils.detection_cache import DetectionCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A settable replacement for time.time() inside the cache module."""
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(detection_cache, "time", SimpleNamespace(time=lambda: now.value))
+    return now
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = DetectionCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == (True, 1)  # a is now more recent than b
+    cache.put("c", 3)
+
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.get("c") == (True, 3)
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_memory_entries_expire_after_ttl(clock):
+    cache = DetectionCache(ttl=60)
+    cache.put("a", [1])
+    clock.value += 59
+    assert cache.get("a") == (True, [1])
+    clock.value += 2
+    assert cache.get("a") == (False, None)
+
+
+def test_values_are_copied_in_and_out():
+    cache = DetectionCache()
+    value = {"objects": [1]}
+    cache.put("a", value)
+    value["objects"].append(2)
+    cache.get("a")[1]["objects"].append(3)
+    assert cache.get("a") == (True, {"objects": [1]})
+
+
+def test_disk_tier_survives_restart_and_honours_ttl(tmp_path, clock):
+    DetectionCache(max_entries=0, cache_dir=str(tmp_path), ttl=60).put("a", {"n": 1})
+
+    cache = DetectionCache(max_entries=0, cache_dir=str(tmp_path), ttl=60)
+    assert cache.get("a") == (True, {"n": 1})
+    assert cache.disk_hits == 1
+    clock.value += 61
+    assert cache.get("a") == (False, None)
+
+
+def test_disk_tier_trims_least_recently_accessed(tmp_path, clock):
+    cache = DetectionCache(max_entries=0, cache_dir=str(tmp_path), max_disk_bytes=25)
+    cache.put("a", "x" * 8)  # 10 bytes as JSON
+    clock.value += 1
+    cache.put("b", "y" * 8)
+    clock.value += 1
+    cache.get("a")
+    clock.value += 1
+    cache.put("c", "z" * 8)
+
+    assert cache.get("b") == (False, None)
+    assert cache.get("a")[0] and cache.get("c")[0]
+
+
+def test_get_or_compute_calls_compute_once_per_image_and_features():
+    cache = DetectionCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return ["car"]
+
+    assert cache.get_or_compute(b"jpeg", "objects", compute) == ["car"]
+    assert cache.get_or_compute(b"jpeg", "objects", compute) == ["car"]
+    cache.get_or_compute(b"jpeg", "objects,tags", compute)
+    assert len(calls) == 2
@@ -0,0 +1,113 @@
+# tests/test_detectors.py
+
+import cv2
+import numpy as np
+import pytest
+
+from backend.detectors import Detector, OpenCVDNNDetector, HybridDetector, COCO_LABELS
+
+
+class StubNet:
+    """Stands in for cv2.dnn.Net, returning a fixed raw output."""
+
+    def __init__(self, output):
+        self.output = output
+        self.inputs = []
+
+    def setInput(self, blob):
+        self.inputs.append(blob.shape)
+
+    def forward(self):
+        return self.output
+
+
+def _jpeg(width, height):
+    return cv2.imencode(".jpg", np.zeros((height, width, 3), np.uint8))[1].tobytes()
+
+
+def _local_detector(tmp_path, monkeypatch, output, **kwargs):
+    model_path = tmp_path / "model.bin"
+    model_path.write_bytes(b"stub")
+    net = StubNet(output)
+    monkeypatch.setattr(cv2.dnn, "readNet", lambda *args: net)
+    return OpenCVDNNDetector(str(model_path), **kwargs), net
+
+
+def _box(label, x, y, w=10, h=10, confidence=0.9):
+    return {"object": label, "confidence": confidence, "rectangle": {"x": x, "y": y, "w": w, "h": h}}
+
+
+def test_detector_is_abstract():
+    with pytest.raises(TypeError):
+        Detector()
+
+
+def test_missing_local_model_fails_fast(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        OpenCVDNNDetector(str(tmp_path / "missing.onnx"))
+
+
+def test_local_yolov8_parses_scales_and_suppresses(tmp_path, monkeypatch):
+    # 1 x (4 + classes) x N, boxes as (cx, cy, w, h) in 640x640 input pixels
+    output = np.zeros((1, 4 + len(COCO_LABELS), 3), np.float32)
+    output[0, :4, 0] = (320, 320, 100, 200)
+    output[0, 4 + COCO_LABELS.index("person"), 0] = 0.9
+    output[0, :4, 1] = (322, 321, 100, 200)  # duplicate, removed by NMS
+    output[0, 4 + COCO_LABELS.index("person"), 1] = 0.8
+    output[0, :4, 2] = (100, 100, 50, 50)  # below the confidence threshold
+    output[0, 4 + COCO_LABELS.index("car"), 2] = 0.1
+    detector, net = _local_detector(tmp_path, monkeypatch, output)
+
+    objects = detector(_jpeg(1280, 640))
+
+    assert net.inputs == [(1, 3, 640, 640)]
+    assert objects == [{"object": "person", "confidence": pytest.approx(0.9),
+                        "rectangle": {"x": 540, "y": 220, "w": 200, "h": 200}}]
+
+
+def test_local_ssd_skips_unused_coco_ids(tmp_path, monkeypatch):
+    # 1 x 1 x N x 7 rows of (image, class, score, x0, y0, x1, y1), coordinates relative
+    output = np.array([[[[0, 1, 0.95, 0.1, 0.2, 0.5, 0.6],
+                         [0, 12, 0.9, 0.6, 0.6, 0.9, 0.9]]]], np.float32)
+    detector, _ = _local_detector(tmp_path, monkeypatch, output, model_type="ssd")
+
+    objects = detector(_jpeg(200, 100))
+
+    assert [obj["object"] for obj in objects] == ["person"]
+    assert objects[0]["rectangle"] == {"x": 20, "y": 20, "w": 80, "h": 40}
+
+
+def test_hybrid_merges_remote_detections_on_keyframes():
+    local = lambda image_bytes: [_box("car", 0, 0), _box("dog", 100, 100)]
+    remote_calls = []
+
+    def remote(image_bytes):
+        remote_calls.append(image_bytes)
+        return [_box("truck", 1, 1)]
+
+    detector = HybridDetector(local, remote, keyframe_interval=2)
+
+    keyframe = detector(b"frame")
+    assert [obj["object"] for obj in keyframe] == ["truck", "dog"]
+    assert [obj["object"] for obj in detector(b"frame")] == ["car", "dog"]
+    assert len(remote_calls) == 1
+
+
+def test_hybrid_falls_back_to_local_when_remote_fails():
+    def remote(image_bytes):
+        raise RuntimeError("Azure unavailable")
+
+    detector = HybridDetector(lambda image_bytes: [_box("car", 0, 0)], remote, keyframe_interval=1)
+    assert [obj["object"] for obj in detector(b"frame")] == ["car"]
+
+
+def test_each_job_counts_hybrid_keyframes_from_its_first_frame():
+    remote_calls = []
+    shared = HybridDetector(lambda image_bytes: [], lambda image_bytes: remote_calls.append(image_bytes) or [],
+                            keyframe_interval=3)
+    shared(b"frame")
+
+    first, second = shared.for_job(), shared.for_job()
+    first(b"first")
+    second(b"second")
+    assert remote_calls == [b"frame", b"first", b"second"]
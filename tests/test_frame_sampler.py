@@ -0,0 +1,55 @@
+# tests/test_frame_sampler.py
+
+import cv2
+import numpy as np
+import pytest
+
+from backend.frame_sampler import AdaptiveFrameSampler
+
+
+def _frame(value, width=128, height=72):
+    return np.full((height, width, 3), value, np.uint8)
+
+
+def _scene(seed, width=128, height=72):
+    """A frame of large random colour blocks; different seeds make different scenes."""
+    blocks = np.random.RandomState(seed).randint(0, 256, (9, 16, 3)).astype(np.uint8)
+    return cv2.resize(blocks, (width, height), interpolation=cv2.INTER_NEAREST)
+
+
+def _sampled(sampler, frames):
+    return [n for n, frame in enumerate(frames, start=1) if sampler.should_sample(frame)]
+
+
+def test_static_video_is_only_sampled_on_max_gap():
+    sampler = AdaptiveFrameSampler(min_gap=2, max_gap=10, frame_interval=5)
+
+    assert _sampled(sampler, [_frame(40)] * 30) == [1, 11, 21]
+    report = sampler.report()
+    assert (report["frames_seen"], report["frames_sampled"], report["max_gap_triggered"]) == (30, 3, 2)
+    assert report["fixed_interval_calls"] == 6
+    assert report["api_calls_saved"] == 3
+
+
+def test_changes_are_sampled_but_not_sooner_than_min_gap():
+    sampler = AdaptiveFrameSampler(min_gap=3, max_gap=30)
+    # Every frame differs from the last; only every third can be sent
+    frames = [_frame(0 if n % 2 else 200) for n in range(10)]
+
+    assert _sampled(sampler, frames) == [1, 4, 7, 10]
+    assert sampler.change_triggered == 3
+
+
+@pytest.mark.parametrize("method", ["diff", "histogram", "phash"])
+def test_every_method_detects_a_scene_change(method):
+    sampler = AdaptiveFrameSampler(method=method, min_gap=1, max_gap=100)
+    frames = [_scene(1)] * 5 + [_scene(2)] * 5
+
+    assert _sampled(sampler, frames) == [1, 6]
+
+
+def test_invalid_settings_are_rejected():
+    with pytest.raises(ValueError):
+        AdaptiveFrameSampler(method="optical")
+    with pytest.raises(ValueError):
+        AdaptiveFrameSampler(min_gap=5, max_gap=2)
@@ -0,0 +1,78 @@
+# tests/test_gap_filler.py
+
+import cv2
+import numpy as np
+import pytest
+
+from backend.gap_filler import GapFiller
+
+
+def _textured_frame(x, y, width=160, height=120):
+    """A black frame with a checkered 30x30 patch at (x, y), which has corners to follow."""
+    frame = np.zeros((height, width, 3), np.uint8)
+    patch = (np.indices((30, 30)).sum(axis=0) // 5 % 2 * 255).astype(np.uint8)
+    frame[y:y + 30, x:x + 30] = cv2.cvtColor(patch, cv2.COLOR_GRAY2BGR)
+    return frame
+
+
+def _tracked(x, y):
+    return {1: {"label": "car", "bbox": (x, y, 30, 30), "centroid": (x + 15, y + 15)}}
+
+
+def test_hold_repeats_the_last_boxes():
+    filler = GapFiller(method="hold")
+    filler.reset(_textured_frame(20, 20), _tracked(20, 20))
+
+    held = filler.propagate(_textured_frame(40, 30))
+    assert held == _tracked(20, 20)
+    held[1]["bbox"] = (0, 0, 1, 1)
+    assert filler.propagate(_textured_frame(40, 30)) == _tracked(20, 20)
+
+
+def test_flow_moves_boxes_with_the_content():
+    filler = GapFiller(method="flow")
+    filler.reset(_textured_frame(40, 40), _tracked(40, 40))
+
+    filler.propagate(_textured_frame(43, 42))
+    moved = filler.propagate(_textured_frame(46, 44))
+
+    assert moved[1]["bbox"] == (46, 44, 30, 30)
+    assert moved[1]["centroid"] == (61, 59)
+
+
+def test_flow_holds_boxes_without_features():
+    filler = GapFiller(method="flow")
+    blank = np.zeros((120, 160, 3), np.uint8)
+    filler.reset(blank, _tracked(40, 40))
+
+    assert filler.propagate(blank) == _tracked(40, 40)
+
+
+def test_predict_asks_the_tracker_for_elapsed_frames():
+    class StubTracker:
+        def __init__(self):
+            self.gaps = []
+
+        def predict(self, frame_gap):
+            self.gaps.append(frame_gap)
+            return {1: {"label": "car", "bbox": (frame_gap, 0, 30, 30), "centroid": (frame_gap + 15, 15)},
+                    2: {"label": "bus", "bbox": (0, 0, 30, 30), "centroid": (15, 15)}}
+
+    tracker = StubTracker()
+    filler = GapFiller(method="predict", tracker=tracker)
+    filler.reset(_textured_frame(0, 0), _tracked(0, 0))
+
+    filler.propagate(None)
+    predicted = filler.propagate(None)
+
+    assert tracker.gaps == [1, 2]
+    # Only tracks present when the gap started are drawn
+    assert list(predicted) == [1]
+    assert predicted[1]["bbox"] == (2, 0, 30, 30)
+
+
+def test_invalid_settings_are_rejected():
+    with pytest.raises(ValueError):
+        GapFiller(method="interpolate")
+    with pytest.raises(ValueError):
+        GapFiller(method="predict")
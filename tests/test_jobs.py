@@ -0,0 +1,140 @@
+# tests/test_jobs.py
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from backend import jobs
+from backend.jobs import JobManager, JobQueueFullError, job_key
+from utils.metrics import Metrics
+from utils.workspace import WorkspaceManager
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(b"not really a video")
+    return str(path)
+
+
+@pytest.fixture
+def runs(tmp_path, monkeypatch):
+    """
+    Runs jobs on a thread instead of a process pool, with a stand-in for
+    process_video that writes an output and records its calls. Set
+    `runs.error` to make jobs fail, or clear `runs.release` to hold them.
+    """
+    manager_workspaces = WorkspaceManager(root=str(tmp_path / "workspaces"), reap_interval=0)
+    monkeypatch.setattr(jobs, "workspaces", manager_workspaces)
+
+    state = SimpleNamespace(calls=[], error=None, release=threading.Event())
+    state.release.set()
+
+    def run_job(video_path, workspace_name, params):
+        state.calls.append((os.path.basename(video_path), params))
+        state.release.wait(5)
+        if state.error is not None:
+            raise state.error
+        workspace = manager_workspaces.workspace(workspace_name)
+        output = workspace.new_path(".mp4")
+        open(output, "wb").close()
+        return (output, None, None, None, None), Metrics().snapshot()
+
+    monkeypatch.setattr(jobs, "_run_job", run_job)
+    return state
+
+
+def _manager(**kwargs):
+    manager = JobManager(**kwargs)
+    pool = ThreadPoolExecutor(max_workers=2)
+    manager._executor = lambda: pool
+    return manager
+
+
+def _wait(manager, job_id):
+    future = manager.get(job_id).future
+    try:
+        future.result(timeout=5)
+    except Exception:
+        pass
+    # Let the done callback record the outcome
+    deadline = time.monotonic() + 5
+    while manager.get(job_id).finished_at is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return manager.status(job_id)
+
+
+def test_job_key_ignores_parameter_order():
+    assert job_key("abc", {"a": 1, "b": 2}) == job_key("abc", {"b": 2, "a": 1})
+    assert job_key("abc", {"a": 1}) != job_key("abc", {"a": 2})
+    assert job_key("abc", {"a": 1}) != job_key("abd", {"a": 1})
+
+
+def test_resubmitting_the_same_video_attaches_to_the_finished_job(video, runs):
+    manager = _manager()
+    job_id = manager.submit(video, frame_interval=5)
+    status = _wait(manager, job_id)
+
+    assert status["status"] == "done"
+    assert status["fraction"] == 1.0
+    assert os.path.exists(status["result"][0])
+    assert manager.submit(video, frame_interval=5) == job_id
+    other_id = manager.submit(video, frame_interval=10)
+    assert other_id != job_id
+    _wait(manager, other_id)
+    assert runs.calls == [("input.mp4", {"frame_interval": 5}), ("input.mp4", {"frame_interval": 10})]
+
+
+def test_failed_jobs_are_only_retried_after_failed_ttl(video, runs):
+    runs.error = RuntimeError("decoder crashed")
+    manager = _manager(failed_ttl=60)
+    job_id = manager.submit(video)
+    status = _wait(manager, job_id)
+
+    assert status["status"] == "failed"
+    assert status["error"] == "RuntimeError: decoder crashed"
+    assert manager.submit(video) == job_id
+    assert len(runs.calls) == 1
+
+    manager.failed_ttl = 0
+    runs.error = None
+    assert manager.submit(video) == job_id
+    assert _wait(manager, job_id)["status"] == "done"
+    assert len(runs.calls) == 2
+
+
+def test_submissions_past_max_pending_are_refused(tmp_path, runs):
+    runs.release.clear()
+    manager = _manager(max_pending=1)
+    first, second = tmp_path / "first.mp4", tmp_path / "second.mp4"
+    first.write_bytes(b"first")
+    second.write_bytes(b"second")
+    try:
+        manager.submit(str(first))
+        with pytest.raises(JobQueueFullError):
+            manager.submit(str(second))
+    finally:
+        runs.release.set()
+
+
+def test_status_reports_progress_from_the_worker(video, runs):
+    runs.release.clear()
+    manager = _manager()
+    job_id = manager.submit(video)
+    try:
+        assert manager.status(job_id)["status"] == "queued"
+        with open(manager.get(job_id).progress_path, "w", encoding="utf-8") as f:
+            json.dump({"started_at": time.time() - 10, "updated_at": time.time(),
+                       "frames_done": 25, "total_frames": 100, "status": "running"}, f)
+
+        status = manager.status(job_id)
+        assert (status["status"], status["frames_done"], status["fraction"]) == ("running", 25, 0.25)
+        assert status["eta"] == pytest.approx(30, abs=1)
+    finally:
+        runs.release.set()
+    assert manager.status("missing")["status"] == "unknown"
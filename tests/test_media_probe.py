@@ -0,0 +1,95 @@
+# tests/test_media_probe.py
+
+import shutil
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from utils import media_probe
+from utils.media_probe import MediaInfo, sniff_media_type, probe_media, extract_thumbnail
+
+needs_ffprobe = pytest.mark.skipif(not shutil.which("ffprobe"), reason="ffprobe is not installed")
+
+
+@pytest.fixture
+def video(tmp_path):
+    # 50 frames at 25 fps; each frame's brightness is its index * 5
+    path = str(tmp_path / "clip.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 25, (64, 48))
+    for i in range(50):
+        writer.write(np.full((48, 64, 3), i * 5, np.uint8))
+    writer.release()
+    return path
+
+
+@pytest.mark.parametrize("header, media_type", [
+    (b"\xff\xd8\xff\xe0\x00\x10JFIF\x00", "image"),
+    (b"\x89PNG\r\n\x1a\n\x00\x00\x00\x0dIHDR", "image"),
+    (b"RIFF\x00\x00\x00\x00WEBPVP8 ", "image"),
+    (b"RIFF\x00\x00\x00\x00AVI LIST", "video"),
+    (b"\x00\x00\x00\x18ftypheic\x00\x00\x00\x00", "image"),
+    (b"\x00\x00\x00\x18ftypisom\x00\x00\x02\x00", "video"),
+    (b"\x1a\x45\xdf\xa3\x9f\x42\x86\x81\x01", "video"),
+    (b"%PDF-1.7\n", "unknown"),
+])
+def test_sniff_media_type(header, media_type):
+    assert sniff_media_type(header) == media_type
+
+
+@needs_ffprobe
+def test_probe_reads_video_metadata_with_ffprobe(video):
+    info = probe_media(video)
+    assert (info.media_type, info.source) == ("video", "ffprobe")
+    assert (info.width, info.height, info.frame_count) == (64, 48, 50)
+    assert info.fps == pytest.approx(25)
+    assert info.duration == pytest.approx(2.0)
+
+
+def test_probe_falls_back_to_opencv_without_ffprobe(video, monkeypatch):
+    monkeypatch.setattr(media_probe.shutil, "which", lambda name: None)
+
+    info = probe_media(video)
+
+    assert (info.media_type, info.source) == ("video", "opencv")
+    assert (info.width, info.height, info.frame_count) == (64, 48, 50)
+    assert info.duration == pytest.approx(2.0)
+
+
+def test_probe_reads_image_headers_and_unknown_files(tmp_path):
+    image_path = str(tmp_path / "photo.png")
+    Image.new("RGB", (30, 20)).save(image_path)
+    other_path = tmp_path / "notes.txt"
+    other_path.write_text("not media")
+
+    image = probe_media(image_path)
+    assert (image.media_type, image.width, image.height, image.codec) == ("image", 30, 20, "png")
+    assert probe_media(str(other_path)).media_type == "unknown"
+
+
+def test_probe_results_are_cached_until_the_file_changes(video, tmp_path):
+    assert probe_media(video) is probe_media(video)
+
+    path = tmp_path / "photo.png"
+    Image.new("RGB", (30, 20)).save(path)
+    first = probe_media(str(path))
+    Image.new("RGB", (40, 20)).save(path)
+    assert probe_media(str(path)).width == 40
+    assert first.width == 30
+
+
+def test_thumbnail_is_taken_past_the_start(video):
+    thumbnail, jpeg = extract_thumbnail(video, position=0.5)
+
+    assert thumbnail.size == (64, 48)
+    decoded = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+    # Halfway into the clip is frame 25, not the black first frame
+    assert abs(int(decoded.mean()) - 125) <= 10
+
+
+def test_rotated_videos_report_their_display_size():
+    info = MediaInfo("clip.mp4", "video", width=1920, height=1080, fps=30.0, duration=1.0, codec="h264",
+                     rotation=90)
+    assert info.display_size == (1080, 1920)
+    assert info.summary().startswith("1080x1920, 30.00 fps")
@@ -0,0 +1,108 @@
+# tests/test_ocr_jobs.py
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from utils import ocr_jobs
+from utils.detection_cache import DetectionCache
+from utils.ocr_jobs import OCRJobManager
+
+
+class StubReadClient:
+    """Stands in for AzureClient: each job reports "running" `polls_needed` times, then its result."""
+
+    def __init__(self, polls_needed=2, status="succeeded", retry_after=None, fail_on=None):
+        self.polls_needed = polls_needed
+        self.status = status
+        self.retry_after = retry_after
+        self.fail_on = fail_on
+        self.submitted = []
+        self.polls = {}
+
+    def submit_read(self, image_bytes):
+        if image_bytes == self.fail_on:
+            raise RuntimeError("submission rejected")
+        self.submitted.append(image_bytes)
+        headers = {"Operation-Location": f"https://vision/read/operations/{image_bytes.decode()}"}
+        if self.retry_after is not None:
+            headers["Retry-After"] = str(self.retry_after)
+        return SimpleNamespace(headers=headers)
+
+    def get_read_result(self, operation_id):
+        self.polls[operation_id] = self.polls.get(operation_id, 0) + 1
+        status = self.status if self.polls[operation_id] > self.polls_needed else "running"
+        line = SimpleNamespace(text=f"text of {operation_id}",
+                               bounding_box=[1.0, 2.0, 30.0, 2.0, 30.0, 9.0, 1.0, 9.0])
+        output = SimpleNamespace(status=f"OperationStatusCodes.{status}",
+                                 analyze_result=SimpleNamespace(read_results=[SimpleNamespace(lines=[line])]))
+        return SimpleNamespace(output=output, response=SimpleNamespace(headers={}))
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    """Records the polling delays instead of sleeping them."""
+    recorded = []
+    sleep = asyncio.sleep
+
+    async def fake_sleep(delay):
+        recorded.append(delay)
+        await sleep(0)
+
+    monkeypatch.setattr(ocr_jobs.asyncio, "sleep", fake_sleep)
+    return recorded
+
+
+def _manager(client, **kwargs):
+    return OCRJobManager(client, initial_delay=0.25, max_delay=1.0, cache=None, **kwargs)
+
+
+def test_polls_with_backoff_until_the_job_succeeds(delays):
+    client = StubReadClient(polls_needed=3)
+
+    result = _manager(client).read(b"sign")
+
+    assert delays == [0.25, 0.5, 1.0, 1.0]
+    assert result.succeeded
+    assert result.texts() == ["text of sign"]
+    assert result.lines[0].polygon == [(1, 2), (30, 2), (30, 9), (1, 9)]
+
+
+def test_retry_after_sets_the_first_poll_delay(delays):
+    _manager(StubReadClient(polls_needed=0, retry_after=3)).read(b"sign")
+    assert delays == [3.0]
+
+
+def test_jobs_that_never_finish_time_out(delays):
+    result = _manager(StubReadClient(polls_needed=1000), timeout=0).read(b"sign")
+    assert result.status == "timeout"
+    assert not result.lines
+
+
+def test_successful_results_are_cached_by_content(delays):
+    client = StubReadClient(polls_needed=0)
+    manager = OCRJobManager(client, cache=DetectionCache())
+
+    first = manager.read(b"sign")
+    second = manager.read(b"sign")
+
+    assert client.submitted == [b"sign"]
+    assert second.to_json() == first.to_json()
+
+
+def test_read_many_keeps_input_order_and_returns_errors(delays):
+    client = StubReadClient(polls_needed=1, fail_on=b"bad")
+
+    results = _manager(client, max_concurrency=2).read_many([b"one", b"bad", b"two"])
+
+    assert results[0].texts() == ["text of one"]
+    assert isinstance(results[1], RuntimeError)
+    assert results[2].texts() == ["text of two"]
+
+
+def test_read_works_inside_a_running_event_loop(delays):
+    async def caller():
+        return _manager(StubReadClient(polls_needed=0)).read(b"sign")
+
+    assert asyncio.run(caller()).succeeded
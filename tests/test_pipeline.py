@@ -0,0 +1,107 @@
+# tests/test_pipeline.py
+
+import numpy as np
+import pytest
+
+from backend.pipeline import FramePipeline
+
+
+class StubCapture:
+    """Stands in for cv2.VideoCapture, returning frames whose pixels hold their index."""
+
+    def __init__(self, count, width=64, height=48):
+        self.frames = [np.full((height, width, 3), n, np.uint8) for n in range(1, count + 1)]
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        if not self.frames:
+            return False, None
+        return True, self.frames.pop(0)
+
+
+class StubWriter:
+    def __init__(self, fail=False):
+        self.frames = []
+        self.fail = fail
+
+    def write(self, frame):
+        if self.fail:
+            raise OSError("disk full")
+        self.frames.append(int(frame[0, 0, 0]))
+
+
+def _box(x, y, w=4, h=4):
+    return [{"object": "car", "confidence": 0.9, "rectangle": {"x": x, "y": y, "w": w, "h": h}}]
+
+
+def _run(pipeline):
+    results = []
+    with pipeline:
+        for (frame_id, frame, sampled), objects, error in pipeline:
+            results.append((frame_id, sampled, objects, error))
+            pipeline.write(frame)
+    return results
+
+
+def test_frames_come_back_in_order_with_boxes_at_full_resolution():
+    writer = StubWriter()
+    pipeline = FramePipeline(StubCapture(12), lambda frame_id, frame: frame_id % 3 == 1,
+                             lambda image_bytes: _box(5, 6), writer, max_in_flight=3, max_edge=32)
+
+    results = _run(pipeline)
+
+    assert [frame_id for frame_id, _, _, _ in results] == list(range(1, 13))
+    assert [sampled for _, sampled, _, _ in results] == [n % 3 == 1 for n in range(1, 13)]
+    # Inference saw a 32x24 image, so boxes are scaled back up by 2
+    assert all(objects == _box(10, 12, 8, 8) for _, sampled, objects, _ in results if sampled)
+    assert all(objects is None for _, sampled, objects, _ in results if not sampled)
+    assert writer.frames == list(range(1, 13))
+    assert pipeline.uploads.report()["uploads"] == 4
+
+
+def test_without_keep_all_only_sampled_frames_are_yielded():
+    pipeline = FramePipeline(StubCapture(10), lambda frame_id, frame: frame_id % 5 == 0,
+                             lambda image_bytes: [], StubWriter(), keep_all=False)
+
+    assert [frame_id for frame_id, _, _, _ in _run(pipeline)] == [5, 10]
+
+
+def test_analyze_errors_are_returned_with_their_frame():
+    calls = []
+
+    def analyze(image_bytes):
+        calls.append(image_bytes)
+        if len(calls) == 2:
+            raise RuntimeError("503")
+        return []
+
+    pipeline = FramePipeline(StubCapture(3), lambda frame_id, frame: True, analyze, StubWriter(),
+                             max_in_flight=1)
+
+    results = _run(pipeline)
+
+    assert [frame_id for frame_id, _, _, _ in results] == [1, 2, 3]
+    assert [error is None for _, _, _, error in results] == [True, False, True]
+    assert isinstance(results[1][3], RuntimeError)
+
+
+def test_writer_failures_stop_the_pipeline_and_are_raised():
+    pipeline = FramePipeline(StubCapture(50), lambda frame_id, frame: False, lambda image_bytes: [],
+                             StubWriter(fail=True), queue_size=2)
+
+    with pytest.raises(OSError, match="disk full"):
+        _run(pipeline)
+
+
+def test_timer_reports_every_stage():
+    pipeline = FramePipeline(StubCapture(6), lambda frame_id, frame: frame_id % 2 == 0,
+                             lambda image_bytes: [], StubWriter())
+
+    _run(pipeline)
+
+    report = pipeline.timer.report()
+    assert {"decode", "sample", "encode", "infer", "track", "write"} <= set(report)
+    assert report["infer"]["items"] == 3
+    assert report["write"]["items"] == 6
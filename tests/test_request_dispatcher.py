@@ -0,0 +1,74 @@
+# tests/test_request_dispatcher.py
+
+import time
+
+import pytest
+
+from utils.request_dispatcher import OrderedDispatcher, TokenBucket
+
+
+def test_results_come_back_in_submission_order():
+    # Earlier requests take longest, so they finish last
+    def slow_first(n):
+        time.sleep(0.01 * (5 - n))
+        return n * 10
+
+    dispatcher = OrderedDispatcher(max_in_flight=5, requests_per_second=None)
+    results = list(dispatcher.map(slow_first, ((n, n) for n in range(5))))
+    assert results == [(n, n * 10, None) for n in range(5)]
+
+
+def test_errors_are_returned_with_their_item_and_do_not_stop_the_rest():
+    def fail_on_two(n):
+        if n == 2:
+            raise ValueError("bad frame")
+        return n
+
+    dispatcher = OrderedDispatcher(max_in_flight=2, requests_per_second=None)
+    results = list(dispatcher.map(fail_on_two, ((n, n) for n in range(4))))
+    assert [item for item, _, _ in results] == [0, 1, 2, 3]
+    assert [result for _, result, _ in results] == [0, 1, None, 3]
+    assert [error is None for _, _, error in results] == [True, True, False, True]
+    assert isinstance(results[2][2], ValueError)
+
+
+def test_none_payloads_pass_through_in_order():
+    dispatcher = OrderedDispatcher(max_in_flight=2, requests_per_second=None)
+    items = [("a", 1), ("skip", None), ("b", 2)]
+    assert list(dispatcher.map(lambda n: n + 1, items)) == [
+        ("a", 2, None), ("skip", None, None), ("b", 3, None)]
+
+
+def test_max_pending_bounds_items_read_ahead_of_a_slow_request():
+    consumed = []
+
+    def items():
+        yield 0, "slow"
+        for n in range(1, 21):
+            consumed.append(n)
+            yield n, None
+
+    def call(payload):
+        time.sleep(0.2)
+        return payload
+
+    dispatcher = OrderedDispatcher(max_in_flight=4, requests_per_second=None)
+    read_ahead = []
+    for index, _ in enumerate(dispatcher.map(call, items(), max_pending=3)):
+        read_ahead.append(len(consumed) + 1 - index)
+    assert len(read_ahead) == 21
+    assert max(read_ahead) <= 4
+
+
+def test_token_bucket_spaces_requests():
+    bucket = TokenBucket(20)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    # The first token is available at once, the other four 50 ms apart
+    assert time.monotonic() - start >= 0.19
+
+
+def test_token_bucket_rejects_non_positive_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(0)
@@ -0,0 +1,48 @@
+# tests/test_sharded_video.py
+
+import numpy as np
+
+from backend.sharded_video import stitch_tracks
+from backend.track_log import TrackLog, TRACK_DTYPE
+
+
+def _segment(tracks, labels=("car", "person")):
+    """tracks: list of (object_id, label code, [(frame, x, y), ...]) in segment-local frames."""
+    rows = np.array([(frame, object_id, code, x, y, 20, 20, 0.9)
+                     for object_id, code, points in tracks for frame, x, y in points], dtype=TRACK_DTYPE)
+    return TrackLog(rows[np.argsort(rows["frame"], kind="stable")], list(labels))
+
+
+def test_tracks_crossing_a_boundary_keep_one_id():
+    first = _segment([(0, 0, [(0, 100, 100), (90, 110, 100)]),
+                      (1, 1, [(0, 400, 300), (90, 400, 310)])])
+    # Local ids restart in the second segment and are listed in another order
+    second = _segment([(0, 1, [(0, 400, 315), (50, 400, 330)]),
+                       (1, 0, [(0, 118, 100), (50, 150, 100)]),
+                       (2, 0, [(0, 600, 50)])])
+    stitched = stitch_tracks([first, second], [0, 100], frame_size=None, frame_interval=10)
+
+    assert stitched.labels == ["car", "person"]
+    assert stitched.rows["frame"].tolist() == [0, 0, 90, 90, 100, 100, 100, 150, 150]
+    assert stitched.by_label("car").by_frames(100).rows["x"].tolist() == [118, 600, 150]
+    assert stitched.by_id(0).rows["x"].tolist() == [100, 110, 118, 150]
+    assert stitched.by_id(1).rows["y"].tolist() == [300, 310, 315, 330]
+    assert stitched.object_ids() == [0, 1, 2]
+
+
+def test_tracks_are_not_joined_across_labels_distance_or_time():
+    first = _segment([(0, 0, [(95, 100, 100)]),
+                      (1, 0, [(95, 300, 100)]),
+                      (2, 0, [(40, 500, 100)])])
+    second = _segment([(0, 1, [(0, 100, 100)]),  # other label
+                       (1, 0, [(0, 380, 100)]),  # 80 px away, past the gate
+                       (2, 0, [(0, 500, 100)])])  # 60 frames after the track ended
+    stitched = stitch_tracks([first, second], [0, 100], frame_size=None, frame_interval=10)
+    assert stitched.object_ids() == list(range(6))
+
+
+def test_empty_segments_are_skipped():
+    empty = TrackLog(np.zeros(0, dtype=TRACK_DTYPE), ["car"])
+    stitched = stitch_tracks([empty, _segment([(0, 0, [(0, 10, 10)])])], [0, 100], frame_size=None)
+    assert stitched.rows["frame"].tolist() == [100]
+    assert stitch_tracks([empty], [0], frame_size=None).rows.shape == (0,)
@@ -0,0 +1,99 @@
+# tests/test_stream_processor.py
+
+import asyncio
+
+import cv2
+import numpy as np
+import pytest
+
+from backend import stream_processor
+from backend.stream_processor import StreamProcessor
+from backend.track_log import TrackLog
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = str(tmp_path / "recording.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 25, (64, 48))
+    for i in range(30):
+        frame = np.zeros((48, 64, 3), np.uint8)
+        frame[10:20, i:i + 10] = 255
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def _car(image_bytes):
+    return [{"object": "car", "confidence": 0.9, "rectangle": {"x": 10, "y": 10, "w": 10, "h": 10}}]
+
+
+def _processor(video, **kwargs):
+    kwargs.setdefault("detector", _car)
+    kwargs.setdefault("realtime", False)
+    kwargs.setdefault("latency_budget", 5.0)
+    return StreamProcessor(video, requests_per_second=None, inference_max_edge=None, **kwargs)
+
+
+def test_updates_come_in_capture_order_and_every_frame_is_accounted_for(video, tmp_path):
+    log_path = str(tmp_path / "tracks.npz")
+    processor = _processor(video, log_path=log_path)
+
+    updates = list(processor)
+
+    frame_ids = [update.frame_id for update in updates]
+    assert frame_ids and frame_ids == sorted(set(frame_ids))
+    assert all(update.error is None and update.lag >= 0 for update in updates)
+    assert [info["label"] for info in updates[0].tracked.values()] == ["car"]
+
+    report = processor.stats.report()
+    assert report["frames_captured"] == 30
+    assert report["frames_analyzed"] == len(updates)
+    assert report["frames_analyzed"] + report["frames_dropped"] + report["frames_stale"] == 30
+    assert len(TrackLog.load(log_path)) == len(updates)
+
+
+def test_frames_older_than_the_latency_budget_are_not_analyzed(video):
+    calls = []
+    processor = _processor(video, latency_budget=0, detector=lambda image_bytes: calls.append(1) or [])
+
+    assert list(processor) == []
+    assert calls == []
+    assert processor.stats.frames_stale > 0
+
+
+def test_detector_errors_are_yielded_and_counted(video):
+    def failing(image_bytes):
+        raise RuntimeError("Azure unavailable")
+
+    processor = _processor(video, detector=failing)
+    updates = list(processor)
+
+    assert updates and all(isinstance(update.error, RuntimeError) for update in updates)
+    assert all(update.tracked == {} for update in updates)
+    assert processor.stats.errors == len(updates)
+
+
+def test_a_failed_output_ends_the_stream_with_its_error(video, tmp_path, monkeypatch):
+    def broken_writer(*args, **kwargs):
+        raise OSError("ffmpeg is broken")
+
+    monkeypatch.setattr(stream_processor, "open_video_writer", broken_writer)
+    processor = _processor(video, hls_path=str(tmp_path / "live" / "stream.m3u8"))
+
+    with pytest.raises(OSError, match="ffmpeg is broken"):
+        list(processor)
+    processor.close()
+    assert processor.stats.errors >= 1
+
+
+def test_async_iteration_yields_the_same_updates(video):
+    async def collect():
+        return [update.frame_id async for update in _processor(video)]
+
+    frame_ids = asyncio.run(collect())
+    assert frame_ids and frame_ids == sorted(frame_ids)
+
+
+def test_unopenable_sources_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        StreamProcessor(str(tmp_path / "missing.mp4"), detector=_car)
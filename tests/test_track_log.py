@@ -0,0 +1,65 @@
+# tests/test_track_log.py
+
+import numpy as np
+import pytest
+
+from backend.track_log import TrackLog, TrackLogWriter
+
+ROWS = [
+    # frame, object_id, label, bbox, confidence
+    (0, 0, "car", (10, 20, 40, 30), 0.9),
+    (0, 1, "person", (200, 50, 20, 60), None),
+    (10, 0, "car", (30, 20, 40, 30), 0.8),
+    (10, 2, "car", (400, 300, 40, 30), 0.7),
+    (20, 1, "person", (210, 55, 20, 60), 0.6),
+]
+
+
+@pytest.fixture
+def track_log(tmp_path):
+    path = str(tmp_path / "log.npz")
+    # A small chunk size makes the writer spool to disk several times
+    with TrackLogWriter(path, chunk_rows=2) as writer:
+        for row in ROWS:
+            writer.add(*row)
+    return TrackLog.load(path)
+
+
+def test_round_trip_keeps_rows_and_labels(track_log, tmp_path):
+    assert len(track_log) == len(ROWS)
+    assert track_log.labels == ["car", "person"]
+    assert track_log.rows["frame"].tolist() == [row[0] for row in ROWS]
+    assert [track_log.label_of(code) for code in track_log.rows["label"]] == [row[2] for row in ROWS]
+    assert np.isnan(track_log.rows["confidence"][1])
+    assert not list(tmp_path.glob("*.rows"))  # spool removed
+
+    copy = TrackLog.load(track_log.save(str(tmp_path / "copy.npz")))
+    assert copy.rows.tobytes() == track_log.rows.tobytes()
+    assert copy.labels == track_log.labels
+
+
+def test_queries_chain(track_log):
+    assert track_log.by_label("car").object_ids() == [0, 2]
+    assert len(track_log.by_label("bicycle")) == 0
+    assert track_log.by_frames(10, 20).rows["frame"].tolist() == [10, 10]
+    assert track_log.by_frames(start=10).by_label("person").rows["frame"].tolist() == [20]
+    assert track_log.by_id(0).rows["x"].tolist() == [10, 30]
+
+
+def test_trajectories_are_in_order_of_first_appearance(track_log):
+    trajectories = track_log.trajectories()
+    assert list(trajectories) == [("car", 0), ("person", 1), ("car", 2)]
+    frames, centroids = trajectories[("person", 1)]
+    assert frames.tolist() == [0, 20]
+    assert centroids.tolist() == [[210, 80], [220, 85]]
+    assert TrackLog(track_log.rows[:0], track_log.labels).trajectories() == {}
+
+
+def test_csv_export(track_log, tmp_path):
+    lines = track_log.to_csv().splitlines()
+    assert lines[0] == "frame,object_id,label,x,y,w,h,confidence"
+    assert lines[1] == "0,0,car,10,20,40,30,0.9"
+    assert lines[2] == "0,1,person,200,50,20,60,"  # no confidence reported
+    path = tmp_path / "log.csv"
+    track_log.to_csv(str(path))
+    assert path.read_text().splitlines() == lines
@@ -0,0 +1,55 @@
+# tests/test_tracker.py
+
+from backend.tracker import CentroidTracker
+
+
+def _car(x, y=200):
+    return {"label": "car", "x": x, "y": y, "w": 40, "h": 30}
+
+
+def test_kalman_keeps_id_of_fast_object_between_sparse_detections():
+    # 60 px per 10-frame gap is past the 50 px gate before any velocity is known
+    tracker = CentroidTracker(motion_model="kalman", frame_size=(640, 480), reference_gap=10)
+    ids = set()
+    for step in range(6):
+        ids.update(tracker.update([_car(20 + 60 * step)], frame_gap=10))
+    assert ids == {0}
+
+
+def test_assignment_is_optimal_not_greedy():
+    tracker = CentroidTracker(max_distance=50)
+    tracker.update([_car(100), _car(140)])
+    # Greedy nearest-first would pair track 1 with the left car (15 px) and
+    # leave track 0 too far (65 px) from the right one
+    tracked = tracker.update([_car(125), _car(165)])
+    assert {object_id: info["bbox"][0] for object_id, info in tracked.items()} == {0: 125, 1: 165}
+
+
+def test_detections_only_match_tracks_with_the_same_label():
+    tracker = CentroidTracker(max_distance=50)
+    tracker.update([_car(100)])
+    tracked = tracker.update([{"label": "person", "x": 102, "y": 200, "w": 40, "h": 30}])
+    assert list(tracked) == [1]
+    assert tracker.labels == {0: "car", 1: "person"}
+
+
+def test_unmatched_tracks_age_out_after_max_disappeared():
+    tracker = CentroidTracker(max_distance=50, max_disappeared=2)
+    tracker.update([_car(100)])
+    tracker.update([])
+    tracker.update([])
+    assert len(tracker) == 1
+    # Seen again before retirement: keeps its id and its age resets
+    assert list(tracker.update([_car(105)])) == [0]
+
+    for _ in range(3):
+        tracker.update([])
+    assert len(tracker) == 0
+    assert list(tracker.update([_car(105)])) == [1]
+
+
+def test_gate_scales_with_frame_gap():
+    tracker = CentroidTracker(max_distance=50, reference_gap=10)
+    tracker.update([_car(100)], frame_gap=10)
+    # 80 px is past the 50 px gate for one reference gap but within it for two
+    assert list(tracker.update([_car(180)], frame_gap=20)) == [0]
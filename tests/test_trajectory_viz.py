@@ -0,0 +1,51 @@
+# tests/test_trajectory_viz.py
+
+import numpy as np
+
+from backend.track_log import TrackLog, TRACK_DTYPE
+from backend.trajectory_viz import simplify, _track_budgets, build_trajectory_figure, MIN_POINTS_PER_TRACK
+
+
+def _log(lengths):
+    rows = np.zeros(sum(lengths), dtype=TRACK_DTYPE)
+    rows["object_id"] = np.repeat(np.arange(len(lengths)), lengths)
+    rows["frame"] = np.concatenate([np.arange(n) for n in lengths])
+    rows["x"] = np.random.default_rng(0).integers(0, 600, len(rows))
+    rows["y"] = rows["frame"]
+    order = np.argsort(rows["frame"], kind="stable")
+    return TrackLog(rows[order], ["car"])
+
+
+def test_simplify_keeps_short_tracks_whole():
+    assert simplify([(0, 0), (1, 1), (2, 0)], 5).tolist() == [0, 1, 2]
+
+
+def test_simplify_keeps_endpoints_and_the_sharpest_corner():
+    # Straight out along x, then a right angle at index 5
+    points = [(x, 0) for x in range(6)] + [(5, y) for y in range(1, 6)]
+    assert simplify(points, 3).tolist() == [0, 5, 10]
+    kept = simplify(points, 6)
+    assert len(kept) == 6 and kept[0] == 0 and kept[-1] == 10
+
+
+def test_budgets_fit_and_share_by_length():
+    lengths = np.array([1000, 100, 5])
+    budgets = _track_budgets(lengths, 200)
+    assert budgets.sum() <= 200
+    assert budgets[2] == 5  # shorter than the floor: drawn whole
+    assert budgets[0] > budgets[1] >= MIN_POINTS_PER_TRACK
+    assert _track_budgets(lengths, 10000).tolist() == lengths.tolist()
+
+
+def test_budgets_drop_shortest_tracks_when_floors_overflow():
+    lengths = np.array([20, 50, 9, 30])
+    budgets = _track_budgets(lengths, 3 * MIN_POINTS_PER_TRACK)
+    assert budgets.tolist() == [MIN_POINTS_PER_TRACK, MIN_POINTS_PER_TRACK, 0, MIN_POINTS_PER_TRACK]
+
+
+def test_figure_stays_within_point_budget():
+    lengths = [500] * 10 + [3] * 100
+    for budget in (50, 400, 5000):
+        _, drawn, total = build_trajectory_figure(_log(lengths), point_budget=budget)
+        assert total == sum(lengths)
+        assert 0 < drawn <= budget
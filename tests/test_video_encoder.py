@@ -0,0 +1,69 @@
+# tests/test_video_encoder.py
+
+import shutil
+
+import cv2
+import numpy as np
+import pytest
+
+from backend import video_encoder
+from backend.video_encoder import (open_video_writer, FFmpegVideoWriter, OpenCVVideoWriter, VideoEncodeError)
+
+needs_ffmpeg = pytest.mark.skipif(not shutil.which("ffmpeg"), reason="ffmpeg not installed")
+
+
+def _frames(count, width=64, height=48):
+    for i in range(count):
+        frame = np.zeros((height, width, 3), np.uint8)
+        frame[:, : (i * 4) % width] = 255
+        yield frame
+
+
+@needs_ffmpeg
+def test_one_ffmpeg_pass_writes_every_output_at_the_source_frame_rate(tmp_path):
+    outputs = {"mp4": str(tmp_path / "out.mp4"), "webm": str(tmp_path / "out.webm")}
+    writer = open_video_writer(outputs, 64, 48, 30000 / 1001, preset="realtime")
+    assert isinstance(writer, FFmpegVideoWriter)
+    for frame in _frames(30):
+        writer.write(frame)
+    writer.release()
+
+    assert writer.outputs == outputs
+    assert writer.encode_seconds > 0
+    cap = cv2.VideoCapture(outputs["mp4"])
+    assert cap.get(cv2.CAP_PROP_FPS) == pytest.approx(29.97, abs=0.01)
+    assert int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) == 30
+    cap.release()
+
+
+@needs_ffmpeg
+def test_ffmpeg_failure_raises_with_its_stderr(tmp_path):
+    writer = FFmpegVideoWriter({"mp4": str(tmp_path / "missing" / "out.mp4")}, 64, 48, 25)
+    with pytest.raises(VideoEncodeError) as error:
+        for frame in _frames(200):
+            writer.write(frame)
+        writer.release()
+    assert "ffmpeg exited with" in str(error.value)
+    assert "missing" in str(error.value)  # quoted from ffmpeg's stderr
+    assert writer.outputs == {}
+    writer.release()  # a second release is a no-op
+
+
+def test_invalid_outputs_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        open_video_writer({}, 64, 48, 25)
+    with pytest.raises(ValueError):
+        FFmpegVideoWriter({"avi": str(tmp_path / "out.avi")}, 64, 48, 25)
+    with pytest.raises(ValueError):
+        FFmpegVideoWriter({"mp4": str(tmp_path / "out.mp4")}, 64, 48, 25, preset="slowest")
+
+
+def test_without_ffmpeg_an_mp4_is_written_with_opencv(tmp_path, monkeypatch):
+    monkeypatch.setattr(video_encoder.shutil, "which", lambda name: None)
+    writer = open_video_writer({"webm": str(tmp_path / "out.webm")}, 64, 48, 25)
+    assert isinstance(writer, OpenCVVideoWriter)
+    for frame in _frames(5):
+        writer.write(frame)
+    writer.release()
+    assert writer.outputs == {"mp4": str(tmp_path / "out.mp4")}
+    assert (tmp_path / "out.mp4").stat().st_size > 0
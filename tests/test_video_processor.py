@@ -0,0 +1,94 @@
+# tests/test_video_processor.py
+
+import cv2
+import numpy as np
+import pytest
+
+from backend import video_processor
+from backend.detectors import HybridDetector
+from backend.video_processor import process_video
+from utils.azure_client import CircuitOpenError
+from utils.metrics import metrics
+from utils.workspace import WorkspaceManager, QuotaExceededError
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = str(tmp_path / "input.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 25, (64, 48))
+    for i in range(20):
+        frame = np.zeros((48, 64, 3), np.uint8)
+        frame[10:20, i:i + 10] = 255
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    return WorkspaceManager(root=str(tmp_path / "workspaces"), reap_interval=0).workspace()
+
+
+def test_empty_outputs_are_rejected_up_front(video, workspace):
+    with pytest.raises(ValueError):
+        process_video(video, outputs=(), workspace=workspace)
+
+
+def test_writer_is_released_when_processing_fails(video, workspace, monkeypatch):
+    writers = []
+    open_video_writer = video_processor.open_video_writer
+
+    def open_writer(*args, **kwargs):
+        writers.append(open_video_writer(*args, **kwargs))
+        return writers[-1]
+
+    monkeypatch.setattr(video_processor, "open_video_writer", open_writer)
+
+    # Objects without a rectangle make the tracking step fail on the first sampled frame
+    with pytest.raises(KeyError):
+        process_video(video, frame_interval=5, outputs=("mp4",), visualization=None,
+                      detector=lambda image_bytes: [{"object": "car"}], workspace=workspace)
+    assert len(writers) == 1
+    process = getattr(writers[0], "_process", None)
+    assert process is None or process.poll() is not None
+
+
+def test_hybrid_detection_runs_locally_on_every_frame(video, workspace):
+    local_calls = []
+    remote_calls = []
+    detector = HybridDetector(lambda image_bytes: local_calls.append(image_bytes) or [],
+                              lambda image_bytes: remote_calls.append(image_bytes) or [],
+                              keyframe_interval=5)
+
+    process_video(video, frame_interval=10, outputs=("mp4",), visualization=None, detector=detector,
+                  workspace=workspace)
+
+    assert len(local_calls) == 20
+    assert len(remote_calls) == 4
+
+
+def test_quota_is_checked_again_once_the_video_is_written(video, tmp_path):
+    # Empty at admission, over quota as soon as the annotated video exists
+    workspace = WorkspaceManager(root=str(tmp_path / "small"), reap_interval=0,
+                                 workspace_quota_bytes=100).workspace()
+
+    with pytest.raises(QuotaExceededError):
+        process_video(video, outputs=("mp4",), visualization=None, detector=lambda image_bytes: [],
+                      workspace=workspace)
+    assert workspace.refcount == 0
+
+
+def test_frames_rejected_by_the_breaker_are_counted_and_logged(video, workspace, monkeypatch, caplog, capsys):
+    def detector(image_bytes):
+        raise CircuitOpenError("Azure circuit is open")
+
+    monkeypatch.setattr(metrics, "enabled", True)
+    metrics.reset()
+    with caplog.at_level("INFO", logger="backend.video_processor"):
+        process_video(video, frame_interval=5, outputs=("mp4",), visualization=None, detector=detector,
+                      workspace=workspace)
+
+    assert metrics.summary()["circuit_open_frames_total"] == 4
+    assert any("circuit breaker was open for 4 sampled frames" in record.getMessage()
+               for record in caplog.records)
+    assert capsys.readouterr().out == ""
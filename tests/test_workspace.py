@@ -0,0 +1,78 @@
+# tests/test_workspace.py
+
+import os
+import time
+
+import pytest
+
+from utils.workspace import WorkspaceManager, QuotaExceededError
+
+
+def _manager(tmp_path, **kwargs):
+    # No background reaper: the tests call reap() themselves
+    return WorkspaceManager(root=str(tmp_path), reap_interval=0, **kwargs)
+
+
+def _fill(workspace, size, idle_for):
+    with open(workspace.new_path(".bin"), "wb") as f:
+        f.write(b"x" * size)
+    workspace.last_used = time.time() - idle_for
+    return workspace
+
+
+def test_reap_removes_workspaces_idle_past_max_age(tmp_path):
+    manager = _manager(tmp_path, max_age=60, max_total_bytes=None)
+    old = _fill(manager.workspace("old"), 100, idle_for=120)
+    fresh = _fill(manager.workspace("fresh"), 100, idle_for=10)
+
+    assert manager.reap() == (1, 100)
+    assert not os.path.exists(old.path)
+    assert os.path.exists(fresh.path)
+    assert manager._reaper is None
+    assert (manager.reaped_workspaces, manager.reaped_bytes) == (1, 100)
+
+
+def test_reap_skips_workspaces_in_use(tmp_path):
+    manager = _manager(tmp_path, max_age=60, max_total_bytes=None)
+    busy = _fill(manager.workspace("busy"), 100, idle_for=120)
+    with busy.in_use():
+        busy.last_used = time.time() - 120
+        assert manager.reap() == (0, 0)
+    assert os.path.exists(busy.path)
+
+
+def test_reap_removes_least_recently_used_until_under_total(tmp_path):
+    manager = _manager(tmp_path, max_age=None, max_total_bytes=250)
+    oldest = _fill(manager.workspace("oldest"), 100, idle_for=30)
+    middle = _fill(manager.workspace("middle"), 100, idle_for=20)
+    busy = _fill(manager.workspace("busy"), 100, idle_for=40)
+    newest = _fill(manager.workspace("newest"), 100, idle_for=10)
+
+    # In-use bytes count towards the total but are never reclaimed
+    with busy.in_use():
+        assert manager.reap() == (2, 200)
+    assert not os.path.exists(oldest.path) and not os.path.exists(middle.path)
+    assert os.path.exists(busy.path) and os.path.exists(newest.path)
+
+
+def test_reap_collects_directories_left_by_earlier_processes(tmp_path):
+    manager = _manager(tmp_path, max_age=60, max_total_bytes=None)
+    leftover = tmp_path / "session-leftover"
+    leftover.mkdir()
+    (leftover / "upload.mp4").write_bytes(b"x" * 50)
+    stale = time.time() - 600
+    os.utime(leftover, (stale, stale))
+
+    assert manager.reap() == (1, 50)
+    assert not leftover.exists()
+
+
+def test_quota_and_temporary_workspaces(tmp_path):
+    manager = _manager(tmp_path, workspace_quota_bytes=150)
+    with manager.temporary() as workspace:
+        _fill(workspace, 100, idle_for=0)
+        workspace.check_quota(50)
+        with pytest.raises(QuotaExceededError):
+            workspace.check_quota(51)
+    assert not os.path.exists(workspace.path)
+    assert manager.stats()["workspaces"] == 0
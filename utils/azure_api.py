@@ -1,28 +1,20 @@
 # utils/azure_api.py
 
 import cv2
-import os
-from azure.cognitiveservices.vision.computervision import ComputerVisionClient
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from azure.cognitiveservices.vision.computervision.models import VisualFeatureTypes
-from msrest.authentication import CognitiveServicesCredentials
 from difflib import get_close_matches
-from io import BytesIO
+from utils.detection_cache import detection_cache
+from utils.ocr_jobs import OCRJobManager
+from utils.azure_client import azure_client
 
-# Load environment variables
-# load_dotenv()
-
-AZURE_ENDPOINT = "https://4382-computer-vision.cognitiveservices.azure.com/"
-AZURE_KEY = "CkVzy8Fy4OhsyBt6SAEUl8DuAE8kSZqL6PQtOM6D6VPL6hZigttFJQQJ99BDACYeBjFXJ3w3AAAFACOGXp9x"
-
-if not AZURE_ENDPOINT or not AZURE_KEY:
-    raise ValueError("Missing AZURE_ENDPOINT or AZURE_KEY.")
-
-# Authenticate SDK client
-computervision_client = ComputerVisionClient(
-    AZURE_ENDPOINT,
-    CognitiveServicesCredentials(AZURE_KEY)
-)
+# Endpoint and key come from AZURE_ENDPOINT / AZURE_KEY (see utils.azure_client),
+# e.g. pointing at the local mock in benchmarks/mock_azure.py. The one OCR job
+# manager of the process, also used by backend.text_processor
+ocr_manager = OCRJobManager(azure_client)
 
+@detection_cache.cached("objects")
 def analyze_image(image_bytes):
     """
     Analyzes an image using Azure Computer Vision Client SDK to detect objects.
@@ -30,14 +22,13 @@ def analyze_image(image_bytes):
     Returns:
         List of dicts with object name and bounding rectangle.
     """
-    image_stream = BytesIO(image_bytes)
-    analysis = computervision_client.analyze_image_in_stream(
-        image=image_stream,
-        visual_features=[VisualFeatureTypes.objects]
-    )
+    analysis = azure_client.analyze(image_bytes, [VisualFeatureTypes.objects])
+    return _objects_from_analysis(analysis)
 
+
+def _objects_from_analysis(analysis):
     result = []
-    for obj in analysis.objects:
+    for obj in analysis.objects or []:
         result.append({
             "object": obj.object_property,
             "confidence": obj.confidence,
@@ -48,7 +39,6 @@ def analyze_image(image_bytes):
                 "h": int(obj.rectangle.h)
             }
         })
-
     return result
 # utils/azure_api.py
 
@@ -56,29 +46,8 @@ def extract_text(image_bytes):
     """
     Performs OCR using Azure Read API v3.2 and returns detected text lines.
     """
-    image_stream = BytesIO(image_bytes)
-
-    # Step 1: Submit image for OCR
-    poller = computervision_client.read_in_stream(image=image_stream, raw=True)
-
-    # Step 2: Extract Operation-Location to get operation ID
-    operation_location = poller.headers["Operation-Location"]
-    operation_id = operation_location.split("/")[-1]
-
-    # Step 3: Poll for result using operation ID
-    result = computervision_client.get_read_result(operation_id)
-
-    while result.status not in ['succeeded', 'failed']:
-        result = computervision_client.get_read_result(operation_id)
-
-    # Step 4: Extract text lines if succeeded
-    lines = []
-    if result.status == 'succeeded':
-        for page in result.analyze_result.read_results:
-            for line in page.lines:
-                lines.append(line.text)
-
-    return lines
+    result = ocr_manager.read(image_bytes)
+    return result.texts()
 
 
 from difflib import get_close_matches
@@ -90,13 +59,90 @@ def correct_ocr_text(lines, vocabulary, threshold=0.8):
         corrected.append(match[0] if match else word)
     return corrected
 
+@detection_cache.cached("tags")
 def analyze_tags(image_bytes):
-    image_stream = BytesIO(image_bytes)
-    analysis = computervision_client.analyze_image_in_stream(
-        image=image_stream,
-        visual_features=["Tags"]
-    )
+    analysis = azure_client.analyze(image_bytes, ["Tags"])
     tags = []
     for tag in analysis.tags:
         tags.append(f"{tag.name} ({tag.confidence * 100:.1f}%)")
     return tags
+
+
+# Features that can be requested together in one analyze call. "read" is the
+# separate Read (OCR) job, which analyze_features runs alongside it.
+VISUAL_FEATURES = {
+    "objects": VisualFeatureTypes.objects,
+    "tags": VisualFeatureTypes.tags,
+    "description": VisualFeatureTypes.description,
+    "categories": VisualFeatureTypes.categories,
+}
+
+
+@dataclass
+class ImageAnalysis:
+    """
+    Combined result of analyze_features. Lists for features that were not
+    requested stay empty.
+    """
+    features: tuple = ()
+    objects: list = field(default_factory=list)      # {"object", "confidence", "rectangle"}
+    tags: list = field(default_factory=list)         # {"name", "confidence"}
+    captions: list = field(default_factory=list)     # {"text", "confidence"}
+    categories: list = field(default_factory=list)   # {"name", "score"}
+    text: list = field(default_factory=list)         # OCR lines
+    uploaded_bytes: int = 0
+
+    def object_labels(self):
+        return [f"{obj['object']} ({obj['confidence'] * 100:.1f}%)" for obj in self.objects]
+
+    def tag_labels(self):
+        return [f"{tag['name']} ({tag['confidence'] * 100:.1f}%)" for tag in self.tags]
+
+
+def _analyze_visual_features(image_bytes, features):
+    analysis = azure_client.analyze(image_bytes, [VISUAL_FEATURES[name] for name in features])
+
+    result = {}
+    if "objects" in features:
+        result["objects"] = _objects_from_analysis(analysis)
+    if "tags" in features:
+        result["tags"] = [{"name": tag.name, "confidence": tag.confidence}
+                          for tag in analysis.tags or []]
+    if "description" in features and analysis.description:
+        result["captions"] = [{"text": caption.text, "confidence": caption.confidence}
+                              for caption in analysis.description.captions or []]
+    if "categories" in features:
+        result["categories"] = [{"name": category.name, "score": category.score}
+                                for category in analysis.categories or []]
+    return result
+
+
+def analyze_features(image_bytes, features=("objects", "tags"), read_image_bytes=None):
+    """
+    Requests every visual feature in `features` with a single
+    analyze_image_in_stream call. If "read" is included, the OCR job is
+    submitted at the same time on a second thread, using `read_image_bytes`
+    when given (e.g. the full-resolution original of a downscaled image).
+
+    Returns:
+        ImageAnalysis
+    """
+    features = tuple(sorted(set(features)))
+    unknown = set(features) - set(VISUAL_FEATURES) - {"read"}
+    if unknown:
+        raise ValueError(f"Unsupported features: {', '.join(sorted(unknown))}")
+    visual = tuple(name for name in features if name != "read")
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        ocr_future = None
+        if "read" in features:
+            ocr_future = pool.submit(extract_text, read_image_bytes or image_bytes)
+        result = {}
+        if visual:
+            result = detection_cache.get_or_compute(
+                image_bytes, "analyze:" + ",".join(visual),
+                lambda: _analyze_visual_features(image_bytes, visual)
+            )
+        text = ocr_future.result() if ocr_future is not None else []
+
+    return ImageAnalysis(features=features, text=text, **result)
@@ -0,0 +1,311 @@
+# utils/azure_client.py
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from io import BytesIO
+
+import requests
+from azure.cognitiveservices.vision.computervision import ComputerVisionClient
+from dotenv import load_dotenv
+from msrest.authentication import CognitiveServicesCredentials
+from msrest.exceptions import HttpOperationError, ClientRequestError
+
+from utils.metrics import metrics, instrument_client
+from utils.request_dispatcher import TokenBucket, DEFAULT_REQUESTS_PER_SECOND
+
+load_dotenv()
+
+# Status codes worth retrying: throttling, timeouts and server-side failures
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling Azure while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a failing service. After `failure_threshold` consecutive
+    failed calls the circuit opens and allow() refuses calls; after
+    `reset_timeout` seconds one probe call is let through (half-open), and
+    its outcome closes the circuit again or re-opens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._probing = False
+
+    def release(self):
+        """Ends a probe call without counting its outcome either way."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    metrics.counter("azure_circuit_opened_total")
+                    print(f"Azure circuit opened after {self._failures} failures; "
+                          f"retrying in {self.reset_timeout:.0f}s")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+def _upload(image_bytes):
+    # Called on every attempt, so retried and hedged uploads are counted too
+    metrics.counter("bytes_uploaded_total", len(image_bytes))
+    return BytesIO(image_bytes)
+
+
+def _status(error):
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    value = response.headers.get("Retry-After") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class AzureClient:
+    """
+    The Computer Vision client shared by every module.
+
+    All requests go through one keep-alive connection pool holding
+    `pool_size` connections. Every attempt, retries and hedged duplicates
+    included, first takes a token from the client's rate limiter
+    (`requests_per_second` for the whole process; see limit_rate() and
+    rate_limited()). It is the only request rate limit, so callers don't
+    add their own.
+    Throttled (429), timed-out and 5xx responses and connection errors are
+    retried up to `max_retries` times, waiting as long as a Retry-After
+    header asks (at most `max_backoff` seconds) or else a jittered
+    exponential backoff starting at `backoff` seconds. With `hedge_after`
+    set, an analyze call still unanswered after that many seconds is sent a
+    second time and the first answer wins. A CircuitBreaker fails calls
+    fast with CircuitOpenError while Azure keeps failing, so callers can
+    fall back (e.g. to tracker predictions). Each call counts once towards
+    the breaker, after its retries are used up; throttling means the
+    service is up, so calls that end throttled (429) don't count against it.
+
+    The SDK client is created on first use, so importing this module needs
+    no credentials.
+    """
+
+    def __init__(self, endpoint, key, pool_size=16, timeout=30, max_retries=4, backoff=0.5,
+                 max_backoff=20.0, hedge_after=None, breaker=None,
+                 requests_per_second=DEFAULT_REQUESTS_PER_SECOND):
+        self.endpoint = endpoint
+        self.key = key
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker()
+        self.rate_limiter = None
+        self.limit_rate(requests_per_second)
+        self._client = None
+        self._adapter = None
+        self._hedge_pool = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """
+        AZURE_ENDPOINT and AZURE_KEY (environment or .env) are required on
+        first use. VISION_AZURE_POOL_SIZE, VISION_AZURE_TIMEOUT,
+        VISION_AZURE_RETRIES, VISION_AZURE_HEDGE_AFTER (seconds; unset
+        disables hedging), VISION_AZURE_BREAKER_FAILURES,
+        VISION_AZURE_BREAKER_RESET and VISION_AZURE_TPS (0 disables the
+        rate limit) tune the rest.
+        """
+        hedge_after = os.getenv("VISION_AZURE_HEDGE_AFTER")
+        return cls(
+            os.getenv("AZURE_ENDPOINT"),
+            os.getenv("AZURE_KEY"),
+            pool_size=int(os.getenv("VISION_AZURE_POOL_SIZE", "16")),
+            timeout=float(os.getenv("VISION_AZURE_TIMEOUT", "30")),
+            max_retries=int(os.getenv("VISION_AZURE_RETRIES", "4")),
+            hedge_after=float(hedge_after) if hedge_after else None,
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv("VISION_AZURE_BREAKER_FAILURES", "5")),
+                reset_timeout=float(os.getenv("VISION_AZURE_BREAKER_RESET", "30"))),
+            requests_per_second=float(os.getenv("VISION_AZURE_TPS", str(DEFAULT_REQUESTS_PER_SECOND))),
+        )
+
+    def limit_rate(self, requests_per_second):
+        """Sets the process-wide request rate; None or 0 removes the limit."""
+        self.rate_limiter = TokenBucket(requests_per_second) if requests_per_second else None
+
+    @contextmanager
+    def rate_limited(self, requests_per_second):
+        """
+        Applies `requests_per_second` to every call made while the block
+        runs and restores the previous limit on exit. None keeps the
+        current limit. The limit is process-wide, so the calls of other
+        threads are held to it too.
+        """
+        previous = self.rate_limiter
+        if requests_per_second:
+            self.limit_rate(requests_per_second)
+        try:
+            yield self
+        finally:
+            self.rate_limiter = previous
+
+    def _acquire(self):
+        rate_limiter = self.rate_limiter
+        if rate_limiter is not None:
+            start = time.perf_counter()
+            rate_limiter.acquire()
+            metrics.observe("rate_limit_wait_seconds", time.perf_counter() - start)
+
+    @property
+    def client(self):
+        """The configured ComputerVisionClient."""
+        with self._lock:
+            if self._client is None:
+                self._client = self._create_client()
+            return self._client
+
+    def _create_client(self):
+        if not self.endpoint or not self.key:
+            raise ValueError("Missing AZURE_ENDPOINT or AZURE_KEY.")
+        client = ComputerVisionClient(self.endpoint, CognitiveServicesCredentials(self.key))
+        config = client.config
+        config.connection.timeout = self.timeout
+        # Retries happen in call(), where Retry-After and the breaker are honoured
+        config.retry_policy.retries = 0
+        config.retry_policy.policy.status_forcelist = []
+        config.keep_alive = True
+        self._adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size,
+                                                      max_retries=0)
+        config.session_configuration_callback = self._configure_session
+
+        instrument_client(client)
+        return client
+
+    def _configure_session(self, session, global_config, local_config, **kwargs):
+        # msrest keeps a session per thread; they all share one pooled adapter
+        if session.adapters.get("https://") is not self._adapter:
+            session.mount("https://", self._adapter)
+            session.mount("http://", self._adapter)
+        return kwargs
+
+    def _hedged(self, operation):
+        with self._lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=self.pool_size)
+        futures = [self._hedge_pool.submit(operation, self.client)]
+        done, _ = wait(futures, timeout=self.hedge_after)
+        if not done:
+            self._acquire()
+            metrics.counter("azure_hedged_total")
+            futures.append(self._hedge_pool.submit(operation, self.client))
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+        return futures[0].result()
+
+    def call(self, operation, hedge=False):
+        """
+        Runs `operation(client)` with retries and circuit breaking. The
+        operation is called again on every attempt, so it must rebuild any
+        request stream it sends. The breaker is asked once per call and told
+        its final outcome once; retries stop early if other calls open it.
+        Returns: the operation's result
+        Raises: CircuitOpenError, or the last error once retries run out
+        """
+        if not self.breaker.allow():
+            metrics.counter("azure_circuit_rejected_total")
+            raise CircuitOpenError("Azure is unavailable; circuit breaker is open.")
+        # Unless the call ends with an answer from Azure or a failure that
+        # counts, it says nothing about the service
+        outcome = self.breaker.release
+        try:
+            client = self.client
+            for attempt in range(self.max_retries + 1):
+                if attempt and self.breaker.state == "open":
+                    metrics.counter("azure_circuit_rejected_total")
+                    raise CircuitOpenError("Azure is unavailable; circuit breaker is open.")
+                self._acquire()
+                try:
+                    if hedge and self.hedge_after:
+                        result = self._hedged(operation)
+                    else:
+                        result = operation(client)
+                except (HttpOperationError, ClientRequestError) as e:
+                    status = _status(e)
+                    if isinstance(e, HttpOperationError) and status not in RETRYABLE_STATUS:
+                        # The service answered; the request itself was bad
+                        outcome = self.breaker.record_success
+                        raise
+                    if attempt == self.max_retries:
+                        # Ending throttled doesn't count: Azure is up, we're just over quota
+                        if status != 429:
+                            outcome = self.breaker.record_failure
+                        raise
+                    delay = _retry_after(e)
+                    if delay is None:
+                        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+                    delay = min(delay, self.max_backoff)
+                    metrics.counter("azure_retries_total", status=status or "connection")
+                    time.sleep(delay)
+                    continue
+                outcome = self.breaker.record_success
+                return result
+        finally:
+            outcome()
+
+    def analyze(self, image_bytes, visual_features):
+        """Returns: the SDK ImageAnalysis for `visual_features`."""
+        return self.call(lambda client: client.analyze_image_in_stream(
+            image=_upload(image_bytes), visual_features=visual_features), hedge=True)
+
+    def submit_read(self, image_bytes):
+        """Returns: the raw Read submission; its Operation-Location header names the job."""
+        return self.call(lambda client: client.read_in_stream(image=_upload(image_bytes), raw=True))
+
+    def get_read_result(self, operation_id):
+        return self.call(lambda client: client.get_read_result(operation_id, raw=True))
+
+
+# Process-wide client
+azure_client = AzureClient.from_env()
@@ -0,0 +1,194 @@
+# utils/detection_cache.py
+
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+
+class DetectionCache:
+    """
+    Content-addressed cache for Azure responses.
+
+    Entries are keyed by a SHA-256 of the feature set plus the image bytes.
+    Lookups go to an in-memory LRU first and then, if `cache_dir` is set, to
+    a SQLite file that survives restarts. Both tiers honour `ttl` (seconds);
+    the disk tier is trimmed to `max_disk_bytes` by least-recent access.
+    Values must be JSON-serialisable.
+    """
+
+    def __init__(self, max_entries=256, cache_dir=None, ttl=7 * 24 * 3600,
+                 max_disk_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(cache_dir, "detections.sqlite3"),
+                                       check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT, size INTEGER, stored_at REAL, accessed_at REAL)"
+            )
+            self._db.commit()
+
+    @classmethod
+    def from_env(cls):
+        """
+        VISION_CACHE_ENTRIES, VISION_CACHE_DIR, VISION_CACHE_TTL and
+        VISION_CACHE_MAX_MB configure the cache; VISION_CACHE_ENTRIES=0
+        together with no VISION_CACHE_DIR disables it.
+        """
+        return cls(
+            max_entries=int(os.getenv("VISION_CACHE_ENTRIES", "256")),
+            cache_dir=os.getenv("VISION_CACHE_DIR") or None,
+            ttl=float(os.getenv("VISION_CACHE_TTL", str(7 * 24 * 3600))),
+            max_disk_bytes=int(float(os.getenv("VISION_CACHE_MAX_MB", "256")) * 1024 * 1024),
+        )
+
+    @staticmethod
+    def make_key(image_bytes, features):
+        digest = hashlib.sha256()
+        digest.update(features.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(image_bytes)
+        return digest.hexdigest()
+
+    def _expired(self, stored_at, now):
+        return self.ttl is not None and now - stored_at > self.ttl
+
+    def get(self, key):
+        """
+        Returns: (found, value)
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    return True, copy.deepcopy(entry[1])
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, stored_at FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    if not self._expired(row[1], now):
+                        self._db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        value = json.loads(row[0])
+                        self._remember(key, row[1], value)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return True, copy.deepcopy(value)
+                    self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, copy.deepcopy(value))
+            if self._db is not None:
+                encoded = json.dumps(value)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, stored_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, encoded, len(encoded), now, now),
+                )
+                self._evict_disk(now)
+                self._db.commit()
+
+    def _remember(self, key, stored_at, value):
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, now):
+        if self.ttl is not None:
+            self._db.execute("DELETE FROM entries WHERE stored_at < ?", (now - self.ttl,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        for key, size in self._db.execute(
+            "SELECT key, size FROM entries ORDER BY accessed_at ASC"
+        ).fetchall():
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_disk_bytes:
+                break
+
+    def get_or_compute(self, image_bytes, features, compute):
+        key = self.make_key(image_bytes, features)
+        found, value = self.get(key)
+        if found:
+            return value
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def cached(self, features):
+        """
+        Decorator for functions whose first argument is the image bytes.
+        Exceptions are not cached.
+        """
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(image_bytes, *args, **kwargs):
+                return self.get_or_compute(image_bytes, features,
+                                           lambda: fn(image_bytes, *args, **kwargs))
+            wrapper.uncached = fn
+            return wrapper
+        return decorator
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM entries")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
+            if self._db is not None:
+                count, size = self._db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+                ).fetchone()
+                stats["disk_entries"] = count
+                stats["disk_bytes"] = size
+            return stats
+
+
+# Shared by every Azure call in the process
+detection_cache = DetectionCache.from_env()
@@ -0,0 +1,90 @@
+# utils/media_ingest.py
+
+import hashlib
+import os
+
+import numpy as np
+
+from utils.workspace import workspaces, QuotaExceededError, MB
+
+# Uploads are copied to disk in pieces this size, so ingest memory stays
+# bounded however large the file is.
+CHUNK_SIZE = 8 * 1024 * 1024
+
+
+class SpooledMedia:
+    """
+    An upload written to disk once. Consumers get the path, a file handle
+    or a read-only memory map instead of a copy of the bytes.
+    """
+
+    def __init__(self, path, name, size, sha256):
+        self.path = path
+        self.name = name
+        self.size = size
+        self.sha256 = sha256
+
+    @property
+    def suffix(self):
+        return os.path.splitext(self.path)[1]
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def open(self):
+        return open(self.path, "rb")
+
+    def memmap(self):
+        """
+        Returns: read-only uint8 np.memmap over the file; pages are loaded
+        on access and can be dropped again by the OS.
+        """
+        return np.memmap(self.path, dtype=np.uint8, mode="r")
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def spool_upload(uploaded_file, workspace=None, chunk_size=CHUNK_SIZE):
+    """
+    Copies an uploaded file (anything with read() and a `name`) into
+    `workspace` (a new one by default) in `chunk_size` pieces, hashing it on
+    the way. Raises QuotaExceededError, leaving nothing behind, if the copy
+    would take the workspace over its quota.
+
+    Returns:
+        SpooledMedia for the copy on disk.
+    """
+    workspace = workspace or workspaces.workspace(prefix="upload")
+    name = getattr(uploaded_file, "name", "upload")
+    path = workspace.new_path(suffix=os.path.splitext(name)[1].lower(), prefix="upload_")
+    digest = hashlib.sha256()
+    size = 0
+    used = workspace.size_bytes() if workspace.quota_bytes is not None else 0
+
+    if hasattr(uploaded_file, "seek"):
+        uploaded_file.seek(0)
+    try:
+        with open(path, "wb") as out:
+            while True:
+                chunk = uploaded_file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if workspace.quota_bytes is not None and used + size > workspace.quota_bytes:
+                    raise QuotaExceededError(
+                        f"Upload {name} does not fit in the {workspace.quota_bytes / MB:.0f} MB "
+                        f"quota of workspace {workspace.name}")
+                out.write(chunk)
+                digest.update(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    finally:
+        if hasattr(uploaded_file, "seek"):
+            uploaded_file.seek(0)
+
+    return SpooledMedia(path, name, size, digest.hexdigest())
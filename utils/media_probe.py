@@ -0,0 +1,208 @@
+# utils/media_probe.py
+
+import json
+import os
+import shutil
+import subprocess
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import cv2
+from PIL import Image
+
+# Thumbnails are taken this far into the video, past fade-ins and black
+# leader frames.
+THUMBNAIL_POSITION = 0.1
+PROBE_CACHE_ENTRIES = 32
+
+
+@dataclass
+class MediaInfo:
+    path: str
+    media_type: str  # "image", "video" or "unknown"
+    width: int = 0  # as stored, before rotation
+    height: int = 0
+    fps: float = 0.0
+    frame_count: int = 0
+    duration: float = 0.0  # seconds
+    codec: str = ""
+    rotation: int = 0  # degrees clockwise to display upright
+    source: str = ""  # "ffprobe", "opencv" or "pil"
+
+    @property
+    def display_size(self):
+        if self.rotation % 180:
+            return self.height, self.width
+        return self.width, self.height
+
+    def summary(self):
+        width, height = self.display_size
+        if self.media_type != "video":
+            return f"{width}x{height} {self.codec}".strip()
+        return f"{width}x{height}, {self.fps:.2f} fps, {self.duration:.1f}s, {self.codec or 'unknown codec'}"
+
+
+def sniff_media_type(header):
+    """
+    Classifies a file from its first bytes (16 are enough).
+    Returns: "image", "video" or "unknown"
+    """
+    if header.startswith((b"\xff\xd8\xff", b"\x89PNG\r\n\x1a\n", b"GIF87a", b"GIF89a", b"BM",
+                          b"II*\x00", b"MM\x00*")):
+        return "image"
+    if header[:4] == b"RIFF":
+        return {b"WEBP": "image", b"AVI ": "video"}.get(header[8:12], "unknown")
+    if header[4:8] == b"ftyp":
+        # HEIF/AVIF stills share the ISO container with MP4 and MOV
+        if header[8:12] in (b"heic", b"heix", b"mif1", b"msf1", b"avif"):
+            return "image"
+        return "video"
+    if header[4:8] in (b"moov", b"mdat", b"wide", b"free"):
+        return "video"  # older QuickTime files without an ftyp box
+    if header.startswith(b"\x1a\x45\xdf\xa3"):
+        return "video"  # Matroska / WebM
+    return "unknown"
+
+
+def sniff_file(path):
+    with open(path, "rb") as f:
+        return sniff_media_type(f.read(16))
+
+
+def _ratio(value):
+    try:
+        num, _, den = value.partition("/")
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def _probe_ffprobe(path):
+    command = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=codec_name,width,height,avg_frame_rate,r_frame_rate,nb_frames,duration"
+                         ":stream_tags=rotate:stream_side_data=rotation:format=duration",
+        "-of", "json", path,
+    ]
+    output = subprocess.run(command, capture_output=True, check=True, timeout=30).stdout
+    data = json.loads(output)
+    streams = data.get("streams") or []
+    if not streams:
+        return None
+    stream = streams[0]
+
+    fps = _ratio(stream.get("avg_frame_rate", "0/0")) or _ratio(stream.get("r_frame_rate", "0/0"))
+    duration = float(stream.get("duration") or data.get("format", {}).get("duration") or 0.0)
+    frame_count = int(stream.get("nb_frames") or round(duration * fps))
+    rotation = int(float(stream.get("tags", {}).get("rotate", 0)))
+    for side_data in stream.get("side_data_list", []):
+        if "rotation" in side_data:
+            # Display matrix rotation is counter-clockwise
+            rotation = -int(float(side_data["rotation"]))
+    return MediaInfo(path, "video", int(stream.get("width", 0)), int(stream.get("height", 0)),
+                     fps, frame_count, duration, stream.get("codec_name", ""), rotation % 360, "ffprobe")
+
+
+def _probe_opencv(path):
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            return None
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        fourcc = int(cap.get(cv2.CAP_PROP_FOURCC) or 0)
+        codec = "".join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00 ")
+        rotation = int(cap.get(getattr(cv2, "CAP_PROP_ORIENTATION_META", -1)) or 0)
+        return MediaInfo(path, "video", int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                         int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), fps, frame_count,
+                         frame_count / fps if fps else 0.0, codec.lower(), rotation % 360, "opencv")
+    finally:
+        cap.release()
+
+
+def _probe_image(path):
+    # Image.open only parses the header; pixels are never decoded here
+    with Image.open(path) as image:
+        return MediaInfo(path, "image", image.width, image.height,
+                         codec=(image.format or "").lower(), source="pil")
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cached(key, compute):
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    value = compute()
+    with _cache_lock:
+        _cache[key] = value
+        while len(_cache) > PROBE_CACHE_ENTRIES:
+            _cache.popitem(last=False)
+    return value
+
+
+def _file_key(path):
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+
+def probe_media(path):
+    """
+    Reads container metadata without decoding the stream: ffprobe when it
+    is installed, otherwise OpenCV (videos) or PIL (images). Results are
+    cached per file.
+
+    Returns:
+        MediaInfo; media_type is "unknown" if nothing could read the file.
+    """
+    def compute():
+        media_type = sniff_file(path)
+        try:
+            if media_type == "image":
+                return _probe_image(path)
+            info = None
+            if shutil.which("ffprobe"):
+                try:
+                    info = _probe_ffprobe(path)
+                except (subprocess.SubprocessError, ValueError, OSError) as e:
+                    print(f"ffprobe failed, falling back to OpenCV: {e}")
+            return info or _probe_opencv(path) or MediaInfo(path, "unknown")
+        except Exception as e:
+            print(f"Failed to probe {path}: {e}")
+            return MediaInfo(path, "unknown")
+
+    return _cached(("probe",) + _file_key(path), compute)
+
+
+def extract_thumbnail(path, position=THUMBNAIL_POSITION, info=None):
+    """
+    Seeks `position` (0-1) of the way into a video and decodes one frame,
+    falling back to the first frame if the seek fails. Cached per file.
+
+    Returns:
+        (PIL thumbnail image, JPEG bytes for analysis), or (None, None)
+    """
+    def compute():
+        media = info or probe_media(path)
+        cap = cv2.VideoCapture(path)
+        try:
+            success, frame = False, None
+            if media.duration and position > 0:
+                cap.set(cv2.CAP_PROP_POS_MSEC, media.duration * position * 1000)
+                success, frame = cap.read()
+            if not success:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                success, frame = cap.read()
+        finally:
+            cap.release()
+        if not success:
+            return None, None
+
+        _, encoded = cv2.imencode(".jpg", frame)
+        return Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)), encoded.tobytes()
+
+    return _cached(("thumbnail", position) + _file_key(path), compute)
@@ -1,8 +1,16 @@
 import cv2
 import numpy as np
-from PIL import Image, UnidentifiedImageError
 import mimetypes
-from io import BytesIO
+import os
+import threading
+
+from utils.media_probe import sniff_media_type, extract_thumbnail
+from utils.workspace import workspaces
+
+# Long edge and JPEG quality used for frames sent to Azure. Object detection
+# gains nothing from 4K input, and the service rejects images over 4 MB.
+DEFAULT_INFERENCE_MAX_EDGE = 1024
+DEFAULT_JPEG_QUALITY = 85
 
 
 def detect_media_type(uploaded_file):
@@ -19,40 +27,97 @@ def detect_media_type(uploaded_file):
         elif mime_type.startswith("video"):
             return "video"
 
-    # Fallback: try to open as image
-    try:
-        image = Image.open(BytesIO(uploaded_file.getvalue()))
-        image.verify()
-        return "image"
-    except UnidentifiedImageError:
-        return "video"  # assume video if PIL fails
-    except Exception:
-        return "unknown"
+    # Fallback: sniff the magic bytes instead of decoding the whole file
+    position = uploaded_file.tell()
+    header = uploaded_file.read(16)
+    uploaded_file.seek(position)
+    return sniff_media_type(header)
 
 def extract_video_thumbnail(file_bytes):
     """
-    Extracts the first frame of a video and returns:
+    Extracts a representative frame of a video and returns:
     - PIL thumbnail image
     - Encoded JPEG bytes for analysis
+
+    `file_bytes` may also be the path of a video already on disk, which is
+    read in place; see utils.media_probe.extract_thumbnail.
+    """
+    if isinstance(file_bytes, (str, os.PathLike)):
+        return extract_thumbnail(os.fspath(file_bytes))
+
+    with workspaces.temporary(prefix="thumbnail") as workspace:
+        path = workspace.new_path(suffix=".mp4")
+        with open(path, "wb") as f:
+            f.write(file_bytes)
+        return extract_thumbnail(path)
+
+
+def encode_for_inference(frame, max_edge=DEFAULT_INFERENCE_MAX_EDGE, jpeg_quality=DEFAULT_JPEG_QUALITY):
+    """
+    Downscales a BGR frame so its long edge is at most `max_edge` (None keeps
+    full resolution) and JPEG-encodes it at `jpeg_quality`.
+
+    Returns:
+        (jpeg_bytes, scale) where multiplying inference coordinates by
+        `scale` maps them back onto the original frame.
+    """
+    height, width = frame.shape[:2]
+    scale = 1.0
+    if max_edge and max(width, height) > max_edge:
+        factor = max_edge / max(width, height)
+        frame = cv2.resize(frame, (max(1, round(width * factor)), max(1, round(height * factor))),
+                           interpolation=cv2.INTER_AREA)
+        scale = 1.0 / factor
+
+    _, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, int(jpeg_quality)])
+    return encoded.tobytes(), scale
+
+
+def rescale_objects(objects, scale):
+    """
+    Maps the rectangles of analyze_image results back to original coordinates.
     """
-    import tempfile
+    if scale == 1.0:
+        return objects
+    rescaled = []
+    for obj in objects:
+        rect = obj["rectangle"]
+        rescaled.append(dict(obj, rectangle={
+            "x": int(round(rect["x"] * scale)),
+            "y": int(round(rect["y"] * scale)),
+            "w": int(round(rect["w"] * scale)),
+            "h": int(round(rect["h"] * scale))
+        }))
+    return rescaled
 
-    nparr = np.frombuffer(file_bytes, np.uint8)
-    temp_path = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4").name
 
-    with open(temp_path, "wb") as f:
-        f.write(nparr)
+class UploadStats:
+    """
+    Thread-safe tally of the bytes sent to Azure.
+    """
 
-    cap = cv2.VideoCapture(temp_path)
-    success, frame = cap.read()
-    cap.release()
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.uploads = 0
+        self.total_bytes = 0
+        self.max_bytes = 0
 
-    if not success:
-        return None, None
+    def record(self, size):
+        with self._lock:
+            self.uploads += 1
+            self.total_bytes += size
+            self.max_bytes = max(self.max_bytes, size)
 
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    thumbnail = Image.fromarray(frame_rgb)
+    def report(self):
+        with self._lock:
+            return {
+                "uploads": self.uploads,
+                "total_bytes": self.total_bytes,
+                "mean_bytes": self.total_bytes / self.uploads if self.uploads else 0,
+                "max_bytes": self.max_bytes,
+            }
 
-    # Encode to bytes for Azure analysis
-    _, encoded = cv2.imencode(".jpg", frame_rgb)
-    return thumbnail, encoded.tobytes()
+    def summary(self):
+        report = self.report()
+        return (f"Uploaded {report['uploads']} images, {report['total_bytes'] / 1e6:.2f} MB "
+                f"({report['mean_bytes'] / 1e3:.0f} KB mean, {report['max_bytes'] / 1e3:.0f} KB max)")
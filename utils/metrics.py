@@ -0,0 +1,235 @@
+# utils/metrics.py
+
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+# Histogram upper bounds in seconds, as in the Prometheus client defaults
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+_NOOP = nullcontext()
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+class Metrics:
+    """
+    In-process counters and latency histograms.
+
+    counter() adds to a monotonically increasing total, observe() records a
+    duration into a histogram, and span() times a block into one. Series are
+    identified by name plus keyword labels. When `enabled` is False every
+    call returns right after checking the flag.
+    """
+
+    def __init__(self, enabled=True, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}  # key -> [bucket counts..., sum, count]
+
+    @classmethod
+    def from_env(cls):
+        """
+        VISION_METRICS=0 disables collection.
+        """
+        return cls(enabled=os.getenv("VISION_METRICS", "1") != "0")
+
+    def counter(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[i] += 1
+                    break
+            histogram[-2] += seconds
+            histogram[-1] += 1
+
+    def span(self, name, **labels):
+        """
+        Context manager timing its block into the `name` histogram.
+        """
+        if not self.enabled:
+            return _NOOP
+        return self._span(name, labels)
+
+    @contextmanager
+    def _span(self, name, labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        """
+        Returns: {"counters": [(name, labels, value)], "histograms":
+        [(name, labels, bucket counts, sum, count)]}, picklable and
+        accepted by merge().
+        """
+        with self._lock:
+            return {
+                "counters": [(name, dict(labels), value) for (name, labels), value in self._counters.items()],
+                "histograms": [(name, dict(labels), list(h[:-2]), h[-2], h[-1])
+                               for (name, labels), h in self._histograms.items()],
+            }
+
+    def merge(self, snapshot):
+        """Adds another process's snapshot (e.g. a job worker's) into this one."""
+        if not self.enabled:
+            return
+        with self._lock:
+            for name, labels, value in snapshot["counters"]:
+                key = _key(name, labels)
+                self._counters[key] = self._counters.get(key, 0) + value
+            for name, labels, counts, total, count in snapshot["histograms"]:
+                key = _key(name, labels)
+                histogram = self._histograms.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+                for i, n in enumerate(counts):
+                    histogram[i] += n
+                histogram[-2] += total
+                histogram[-1] += count
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def summary(self):
+        """
+        Returns: dict of series -> counter value, or for histograms
+        {"count", "sum_s", "mean_ms"}; series are "name{label=value,...}".
+        """
+        def series(name, labels):
+            return name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else "")
+
+        with self._lock:
+            result = {series(*key): value for key, value in self._counters.items()}
+            for key, h in self._histograms.items():
+                result[series(*key)] = {"count": h[-1], "sum_s": round(h[-2], 6),
+                                        "mean_ms": round(1000 * h[-2] / h[-1], 3) if h[-1] else 0.0}
+            return result
+
+    def to_prometheus(self):
+        """
+        Returns: the metrics in the Prometheus text exposition format.
+        """
+        def labels_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{str(v)}"' for k, v in pairs) + "}"
+
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{labels_text(labels)} {value}")
+        for (name, labels), h in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, n in zip(self.buckets, h[:-2]):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{labels_text(labels, [('le', le)])} {cumulative}")
+            lines.append(f"{name}_sum{labels_text(labels)} {h[-2]}")
+            lines.append(f"{name}_count{labels_text(labels)} {h[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        body = self.server.metrics.to_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def serve_metrics(port=None, registry=None):
+    """
+    Serves the registry for Prometheus scraping on a background thread, at
+    most once per process. `port` defaults to VISION_METRICS_PORT; nothing
+    is started if neither is set.
+    Returns: the HTTP server, or None
+    """
+    global _server
+    port = port or os.getenv("VISION_METRICS_PORT")
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer(("0.0.0.0", int(port)), _MetricsHandler)
+            _server.daemon_threads = True
+            _server.metrics = registry or metrics
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+        return _server
+
+
+def _endpoint_name(url):
+    path = urlparse(url).path
+    if "/read/analyzeResults/" in path:
+        return "read_result"
+    if path.endswith("/read/analyze"):
+        return "read"
+    return path.rsplit("/", 1)[-1] or "unknown"
+
+
+def instrument_client(client, registry=None):
+    """
+    Adds a response hook to an Azure SDK (msrest) client recording, per
+    endpoint, request latency, status counts, errors and 429 throttles.
+    """
+    registry = registry or metrics
+
+    def hook(response, *args, **kwargs):
+        if not registry.enabled:
+            return
+        endpoint = _endpoint_name(response.url)
+        registry.observe("azure_request_seconds", response.elapsed.total_seconds(), endpoint=endpoint)
+        registry.counter("azure_requests_total", endpoint=endpoint, status=response.status_code)
+        if response.status_code == 429:
+            registry.counter("azure_throttled_total", endpoint=endpoint)
+        elif response.status_code >= 400:
+            registry.counter("azure_errors_total", endpoint=endpoint)
+
+    client.config.hooks.append(hook)
+    return client
+
+
+# Process-wide registry
+metrics = Metrics.from_env()
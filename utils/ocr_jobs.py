@@ -0,0 +1,154 @@
+# utils/ocr_jobs.py
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+
+from utils.detection_cache import detection_cache
+from utils.metrics import metrics
+
+
+@dataclass
+class OCRLine:
+    text: str
+    polygon: list  # [(x, y), ...] corners in image coordinates
+
+
+@dataclass
+class OCRResult:
+    status: str
+    lines: list = field(default_factory=list)  # OCRLine
+
+    @property
+    def succeeded(self):
+        return self.status == "succeeded"
+
+    def texts(self):
+        return [line.text for line in self.lines]
+
+    def to_json(self):
+        return {"status": self.status,
+                "lines": [{"text": line.text, "polygon": line.polygon} for line in self.lines]}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(status=data["status"],
+                   lines=[OCRLine(line["text"], [tuple(p) for p in line["polygon"]])
+                          for line in data["lines"]])
+
+
+class OCRJobManager:
+    """
+    Submits Azure Read jobs and polls them with exponential backoff.
+
+    Each image is submitted once; polling starts after `initial_delay` and
+    doubles up to `max_delay`, or waits as long as a `Retry-After` header
+    asks. Many jobs can be run concurrently with read_many/run_many, bounded
+    by `max_concurrency`. Successful results, text plus polygons, are cached
+    by image content. `client` is a utils.azure_client.AzureClient, which
+    retries submissions and polls that fail transiently.
+    """
+
+    def __init__(self, client, initial_delay=0.25, max_delay=4.0, backoff=2.0, timeout=60.0,
+                 max_concurrency=8, cache=detection_cache):
+        self.client = client
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+
+    @staticmethod
+    def _retry_after(headers):
+        value = headers.get("Retry-After") if headers is not None else None
+        try:
+            return float(value) if value is not None else None
+        except ValueError:
+            return None
+
+    async def run(self, image_bytes):
+        """
+        Returns: OCRResult for one image. Submission errors propagate.
+        """
+        key = self.cache.make_key(image_bytes, "read-lines") if self.cache else None
+        if key:
+            found, cached = self.cache.get(key)
+            if found:
+                return OCRResult.from_json(cached)
+
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        submitted = await loop.run_in_executor(None, self.client.submit_read, image_bytes)
+        operation_id = submitted.headers["Operation-Location"].split("/")[-1]
+
+        delay = self._retry_after(submitted.headers) or self.initial_delay
+        deadline = time.monotonic() + self.timeout
+        while True:
+            await asyncio.sleep(delay)
+            raw = await loop.run_in_executor(None, self.client.get_read_result, operation_id)
+            result = raw.output
+            status = str(result.status).lower().split(".")[-1]
+            if status in ("succeeded", "failed"):
+                break
+            if time.monotonic() + delay > deadline:
+                status = "timeout"
+                break
+            delay = self._retry_after(raw.response.headers) or min(delay * self.backoff, self.max_delay)
+
+        metrics.observe("ocr_job_seconds", time.perf_counter() - started, status=status)
+        ocr = OCRResult(status=status)
+        if status == "succeeded":
+            for page in result.analyze_result.read_results:
+                for line in page.lines:
+                    points = line.bounding_box
+                    polygon = [(int(points[i]), int(points[i + 1])) for i in range(0, len(points), 2)]
+                    ocr.lines.append(OCRLine(line.text, polygon))
+            if key:
+                self.cache.put(key, ocr.to_json())
+        return ocr
+
+    async def run_many(self, images):
+        """
+        Returns: list of OCRResult (or the exception raised for that image),
+        in input order.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def bounded(image_bytes):
+            async with semaphore:
+                return await self.run(image_bytes)
+
+        return await asyncio.gather(*(bounded(image) for image in images), return_exceptions=True)
+
+    def read(self, image_bytes):
+        """Synchronous wrapper around run()."""
+        return _run_sync(self.run(image_bytes))
+
+    def read_many(self, images):
+        """Synchronous wrapper around run_many()."""
+        return _run_sync(self.run_many(list(images)))
+
+
+def _run_sync(coroutine):
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    # Called from inside a running event loop: run on a helper thread instead
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = asyncio.run(coroutine)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
@@ -0,0 +1,112 @@
+# utils/request_dispatcher.py
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.metrics import metrics
+
+# The Standard (S1) Computer Vision tier allows 10 transactions per second.
+DEFAULT_REQUESTS_PER_SECOND = 10.0
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    `rate` tokens are added per second up to `capacity`; `acquire()` blocks
+    until a token is available. The default capacity of 1 spaces requests
+    evenly instead of allowing bursts above the tier's TPS.
+    """
+
+    def __init__(self, rate, capacity=1):
+        if rate <= 0:
+            raise ValueError("rate must be positive.")
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class OrderedDispatcher:
+    """
+    Runs requests on a thread pool with at most `max_in_flight` outstanding
+    and hands the results back in submission order.
+    """
+
+    def __init__(self, max_in_flight=4, requests_per_second=DEFAULT_REQUESTS_PER_SECOND):
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.rate_limiter = TokenBucket(requests_per_second) if requests_per_second else None
+
+    def _call(self, fn, payload):
+        if self.rate_limiter is not None:
+            start = time.perf_counter()
+            self.rate_limiter.acquire()
+            metrics.observe("rate_limit_wait_seconds", time.perf_counter() - start)
+        return fn(payload)
+
+    def map(self, fn, items, max_pending=None):
+        """
+        items: iterable of (item, payload) pairs. `fn(payload)` is dispatched
+        for every payload that is not None; None payloads pass straight through.
+        max_pending: if set, at most this many items (dispatched or not) are
+        held waiting for an earlier request; the next item isn't read until
+        the oldest is handed back.
+        Yields: (item, result, error) in input order. Exactly one of result and
+        error is set for dispatched items; both are None for pass-through items.
+        """
+        pending = deque()
+        in_flight = 0
+
+        def resolve(entry):
+            item, future = entry
+            if future is None:
+                return item, None, None
+            try:
+                return item, future.result(), None
+            except Exception as e:
+                return item, None, e
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            for item, payload in items:
+                # Block on the oldest request while too many items are waiting behind it
+                while max_pending and len(pending) >= max_pending:
+                    entry = pending.popleft()
+                    if entry[1] is not None:
+                        in_flight -= 1
+                    yield resolve(entry)
+                if payload is not None:
+                    # Block on the oldest requests until there is room for another
+                    while in_flight >= self.max_in_flight:
+                        entry = pending.popleft()
+                        if entry[1] is not None:
+                            in_flight -= 1
+                        yield resolve(entry)
+                    future = pool.submit(self._call, fn, payload)
+                    in_flight += 1
+                else:
+                    future = None
+                pending.append((item, future))
+
+                while pending and (pending[0][1] is None or pending[0][1].done()):
+                    entry = pending.popleft()
+                    if entry[1] is not None:
+                        in_flight -= 1
+                    yield resolve(entry)
+
+            while pending:
+                yield resolve(pending.popleft())
@@ -0,0 +1,305 @@
+# utils/workspace.py
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+MB = 1024 * 1024
+
+
+class QuotaExceededError(RuntimeError):
+    pass
+
+
+def _disk_usage(path):
+    """
+    Returns: (bytes, files) under `path`.
+    """
+    total = files = 0
+    for directory, _, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.path.getsize(os.path.join(directory, name))
+                files += 1
+            except OSError:
+                pass  # removed while walking
+    return total, files
+
+
+class Workspace:
+    """
+    A directory owning the temporary artifacts of one session or job.
+
+    Files are created with new_path(); `quota_bytes` caps the directory's
+    size. While a workspace is acquired (see in_use()) the reaper leaves it
+    alone, and the last release marks the time it became idle.
+    """
+
+    def __init__(self, manager, name, path, quota_bytes=None):
+        self.manager = manager
+        self.name = name
+        self.path = path
+        self.quota_bytes = quota_bytes
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.refcount = 0
+
+    def new_path(self, suffix="", prefix="tmp"):
+        """
+        Returns: a fresh, unused file path inside the workspace.
+        """
+        return os.path.join(self.path, f"{prefix}{uuid.uuid4().hex[:12]}{suffix}")
+
+    def size_bytes(self):
+        return _disk_usage(self.path)[0]
+
+    def check_quota(self, extra_bytes=0):
+        """
+        Raises QuotaExceededError if the workspace plus `extra_bytes` would
+        exceed its quota.
+        """
+        if self.quota_bytes is None:
+            return
+        used = self.size_bytes()
+        if used + extra_bytes > self.quota_bytes:
+            raise QuotaExceededError(
+                f"Workspace {self.name} would hold {(used + extra_bytes) / MB:.1f} MB, "
+                f"over its {self.quota_bytes / MB:.0f} MB quota")
+
+    def touch(self):
+        with self.manager._lock:
+            self.last_used = time.time()
+
+    def acquire(self):
+        with self.manager._lock:
+            self.refcount += 1
+            self.last_used = time.time()
+        return self
+
+    def release(self):
+        with self.manager._lock:
+            self.refcount = max(0, self.refcount - 1)
+            self.last_used = time.time()
+
+    @contextmanager
+    def in_use(self):
+        self.acquire()
+        try:
+            yield self
+        finally:
+            self.release()
+
+    def clear(self):
+        """Deletes the workspace's files but keeps the workspace."""
+        for name in os.listdir(self.path):
+            target = os.path.join(self.path, name)
+            if os.path.isdir(target):
+                shutil.rmtree(target, ignore_errors=True)
+            else:
+                try:
+                    os.remove(target)
+                except FileNotFoundError:
+                    pass
+
+    def remove(self):
+        self.manager.remove(self.name)
+
+
+class WorkspaceManager:
+    """
+    Creates workspaces under `root` and garbage-collects them.
+
+    A background reaper, started with the first workspace, runs every
+    `reap_interval` seconds. It deletes workspaces idle for longer than
+    `max_age`, then the least recently used idle ones until the total is
+    under `max_total_bytes`. Directories left behind by earlier processes
+    are treated as idle since their last modification.
+    """
+
+    def __init__(self, root=None, max_age=6 * 3600, max_total_bytes=5 * 1024 * MB,
+                 workspace_quota_bytes=2 * 1024 * MB, reap_interval=300):
+        self.root = root or os.path.join(tempfile.gettempdir(), "vision_workspaces")
+        self.max_age = max_age
+        self.max_total_bytes = max_total_bytes
+        self.workspace_quota_bytes = workspace_quota_bytes
+        self.reap_interval = reap_interval
+        self._workspaces = {}
+        self._lock = threading.RLock()
+        self._reaper = None
+        self._stop = threading.Event()
+        self.reaped_workspaces = 0
+        self.reaped_bytes = 0
+        self._stats = None
+        self._stats_at = 0.0
+
+    @classmethod
+    def from_env(cls):
+        """
+        VISION_WORKSPACE_ROOT, VISION_WORKSPACE_MAX_AGE (seconds),
+        VISION_WORKSPACE_MAX_MB (all workspaces), VISION_WORKSPACE_QUOTA_MB
+        (each workspace) and VISION_WORKSPACE_REAP_INTERVAL (seconds)
+        configure the manager.
+        """
+        return cls(
+            root=os.getenv("VISION_WORKSPACE_ROOT") or None,
+            max_age=float(os.getenv("VISION_WORKSPACE_MAX_AGE", str(6 * 3600))),
+            max_total_bytes=int(float(os.getenv("VISION_WORKSPACE_MAX_MB", "5120")) * MB),
+            workspace_quota_bytes=int(float(os.getenv("VISION_WORKSPACE_QUOTA_MB", "2048")) * MB),
+            reap_interval=float(os.getenv("VISION_WORKSPACE_REAP_INTERVAL", "300")),
+        )
+
+    def workspace(self, name=None, prefix="job"):
+        """
+        Returns the workspace called `name`, creating it if needed; without
+        a name a new uniquely named one is created.
+        """
+        name = name or f"{prefix}-{uuid.uuid4().hex[:12]}"
+        with self._lock:
+            workspace = self._workspaces.get(name)
+            if workspace is None or not os.path.isdir(workspace.path):
+                path = os.path.join(self.root, name)
+                os.makedirs(path, exist_ok=True)
+                workspace = Workspace(self, name, path, self.workspace_quota_bytes)
+                self._workspaces[name] = workspace
+            self._start_reaper()
+            return workspace
+
+    @contextmanager
+    def temporary(self, prefix="scratch"):
+        """
+        Yields a workspace that is deleted on exit.
+        """
+        workspace = self.workspace(prefix=prefix)
+        try:
+            with workspace.in_use():
+                yield workspace
+        finally:
+            self.remove(workspace.name)
+
+    def remove(self, name, force=False):
+        """
+        Deletes a workspace and its files, unless it is still in use.
+        Returns: bytes freed
+        """
+        with self._lock:
+            workspace = self._workspaces.get(name)
+            if workspace is not None and workspace.refcount and not force:
+                return 0
+            self._workspaces.pop(name, None)
+            path = os.path.join(self.root, name)
+        freed = _disk_usage(path)[0]
+        shutil.rmtree(path, ignore_errors=True)
+        return freed
+
+    def _idle_entries(self):
+        """
+        Returns: list of (last_used, name, bytes) for every idle directory
+        under root, registered or not.
+        """
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not os.path.isdir(path):
+                continue
+            with self._lock:
+                workspace = self._workspaces.get(name)
+                if workspace is not None and workspace.refcount:
+                    continue
+                last_used = workspace.last_used if workspace is not None else None
+            if last_used is None:
+                try:
+                    last_used = os.path.getmtime(path)
+                except OSError:
+                    continue
+            entries.append((last_used, name, _disk_usage(path)[0]))
+        return entries
+
+    def reap(self):
+        """
+        Applies the age and size policies once.
+        Returns: (workspaces removed, bytes freed)
+        """
+        now = time.time()
+        removed = freed = 0
+        entries = sorted(self._idle_entries())
+        in_use_bytes = self.stats()["bytes_in_use"]
+        total = in_use_bytes + sum(size for _, _, size in entries)
+
+        for last_used, name, size in entries:
+            too_old = self.max_age is not None and now - last_used > self.max_age
+            too_big = self.max_total_bytes is not None and total > self.max_total_bytes
+            if not (too_old or too_big):
+                continue
+            with self._lock:
+                workspace = self._workspaces.get(name)
+                if workspace is not None and (workspace.refcount or workspace.last_used != last_used):
+                    continue  # picked up again since the scan
+                freed += self.remove(name)
+            removed += 1
+            total -= size
+
+        with self._lock:
+            self.reaped_workspaces += removed
+            self.reaped_bytes += freed
+        return removed, freed
+
+    def _start_reaper(self):
+        if self._reaper is not None or not self.reap_interval:
+            return
+        self._reaper = threading.Thread(target=self._reap_loop, name="workspace-reaper", daemon=True)
+        self._reaper.start()
+
+    def _reap_loop(self):
+        while not self._stop.wait(self.reap_interval):
+            try:
+                self.reap()
+            except Exception as e:
+                print(f"Workspace reaper failed: {e}")
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self, max_age=None):
+        """
+        Scans every workspace's size, or with `max_age` reuses a scan (the
+        reaper's or an earlier call's) made less than that many seconds ago.
+        Returns:
+            dict with "workspaces", "in_use", "bytes_on_disk", "bytes_in_use",
+            "files", "reaped_workspaces" and "reaped_bytes"
+        """
+        with self._lock:
+            if max_age is not None and self._stats is not None and time.time() - self._stats_at < max_age:
+                return dict(self._stats, reaped_workspaces=self.reaped_workspaces,
+                            reaped_bytes=self.reaped_bytes)
+            busy = {name for name, workspace in self._workspaces.items() if workspace.refcount}
+            registered = len(self._workspaces)
+        total = files = in_use = 0
+        if os.path.isdir(self.root):
+            for name in os.listdir(self.root):
+                size, count = _disk_usage(os.path.join(self.root, name))
+                total += size
+                files += count
+                if name in busy:
+                    in_use += size
+        stats = {
+            "workspaces": registered,
+            "in_use": len(busy),
+            "bytes_on_disk": total,
+            "bytes_in_use": in_use,
+            "files": files,
+            "reaped_workspaces": self.reaped_workspaces,
+            "reaped_bytes": self.reaped_bytes,
+        }
+        with self._lock:
+            self._stats, self._stats_at = stats, time.time()
+        return stats
+
+
+# Shared by every part of the app that writes temporary artifacts
+workspaces = WorkspaceManager.from_env()